@@ -1,7 +1,11 @@
-import boto3
-from botocore.config import Config
 from typing import Tuple, Optional
 
+from lazy_imports import lazy_import
+
+# boto3/botocore son de los imports más pesados del runtime y el flujo QA no
+# los usa: se cargan recién cuando se crea un cliente
+boto3 = lazy_import("boto3")
+
 
 def make_boto_clients(region: str) -> Tuple[Optional[object], Optional[object]]:
     """
@@ -16,7 +20,12 @@ def make_boto_clients(region: str) -> Tuple[Optional[object], Optional[object]]:
     Returns:
         Tuple con (cloudwatch_client, lambda_client)
     """
+    if boto3 is None:
+        return None, None
+    
     try:
+        from botocore.config import Config
+        
         cfg = Config(
             region_name=region,
             read_timeout=25,
@@ -40,4 +49,6 @@ def make_boto_clients(region: str) -> Tuple[Optional[object], Optional[object]]:
 
 def is_aws_environment() -> bool:
     """Verifica si estamos en un entorno AWS (Lambda)"""
+    if boto3 is None:
+        return False
     return bool(boto3.Session().get_credentials())
@@ -0,0 +1,164 @@
+import math
+import re
+from typing import Any, Dict, List, Tuple
+
+
+# Separador de páginas del extractor de texto ("Página 3")
+_PAGE_MARKER_RE = re.compile(r"p[áa]gina\s+(\d{1,4})", re.IGNORECASE)
+# Numeración de página: "3", "- 3 -", "Pág. 3", "Página 3 de 10", "3/10"
+_PAGE_NUMBER_RE = re.compile(
+    r"(?:(?P<prefix>p[áa]g(?:ina|\.)?)\s*)?-?\s*(?P<n>\d{1,4})\s*-?(?P<total>\s*(?:de|/)\s*\d{1,4})?",
+    re.IGNORECASE,
+)
+# Pie que agrega el extractor al final de cada página
+_EXTRACTOR_FOOTER_RE = re.compile(r"-{2,}\s*caracteres extra[íi]dos:\s*\d+", re.IGNORECASE)
+_WORD_CHAR_RE = re.compile(r"\w")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Páginas cortas (hasta 2 * edge_lines líneas): solo se miran las primeras/últimas 2 líneas
+_SHORT_PAGE_EDGE_LINES = 2
+
+# Largo máximo de cada línea citada en la auditoría
+_AUDIT_SAMPLE_CHARS = 80
+_AUDIT_MAX_LINES = 10
+
+
+def _is_page_number(line: str, page: int, page_total: int) -> bool:
+    """
+    Línea que solo numera la página.
+    
+    Un número suelto cuenta si coincide con la página; "N de M" / "N/M" solo
+    si N <= M <= páginas del documento (no "10 de 2024" ni una fracción).
+    """
+    match = _PAGE_NUMBER_RE.fullmatch(line)
+    if not match:
+        return False
+    n = int(match.group("n"))
+    if match.group("total"):
+        total = int(re.sub(r"\D", "", match.group("total")))
+        return 1 <= n <= total <= page_total
+    return bool(match.group("prefix")) or n == page
+
+
+def _split_pages(lines: List[str]) -> List[Tuple[int, List[int]]]:
+    """
+    Agrupa las líneas no vacías por página usando los marcadores del extractor.
+    
+    Returns:
+        Lista de (número de página, índices de líneas); el texto antes del
+        primer marcador es la página 0
+    """
+    pages = []
+    number, current = 0, []
+    for i, line in enumerate(lines):
+        match = _PAGE_MARKER_RE.fullmatch(line)
+        if match:
+            pages.append((number, current))
+            number, current = int(match.group(1)), []
+        elif line:
+            current.append(i)
+    pages.append((number, current))
+    return [page for page in pages if page[1]]
+
+
+def _edges(indices: List[int], width: int) -> List[int]:
+    """Primeras y últimas `width` líneas de la página (todas si es más corta)"""
+    return indices if len(indices) <= 2 * width else indices[:width] + indices[-width:]
+
+
+def strip_page_boilerplate(text: str, edge_lines: int = 6, min_page_ratio: float = 0.5,
+                           min_pages: int = 3) -> Tuple[str, Dict[str, Any]]:
+    """
+    Quita encabezados y pies de página repetidos de un contrato OCR.
+    
+    Espera texto ya pasado por normalize_for_prompt (líneas sin espacios en
+    los bordes). Solo mira las primeras y últimas `edge_lines` líneas no
+    vacías de cada página (en páginas de hasta 2 * `edge_lines` líneas, solo
+    las primeras y últimas 2, sin contar la numeración):
+    
+    - numeración de página y el pie "--- Caracteres extraídos" del extractor
+      se eliminan;
+    - una línea idéntica (sin distinguir mayúsculas) que aparece en el borde
+      de al menos `min_page_ratio` de las páginas (y de `min_pages`) es un
+      encabezado/pie/sello de firma: se conserva su primera aparición y se
+      eliminan las demás. Líneas que solo difieren en números (p.ej.
+      "CLÁUSULA 3: ... 30 días") son distintas y no se colapsan.
+    
+    Las líneas del cuerpo de la página nunca se tocan, aunque se repitan, y
+    los marcadores "Página N" se conservan como referencia. Sin marcadores de
+    página el texto se devuelve sin cambios. Todo el proceso es lineal.
+    
+    Returns:
+        Tuple con (texto, auditoría {pages, page_numbers_removed,
+        repeated_lines_removed, lines_removed, chars_before, chars_after, repeated})
+    """
+    lines = text.split("\n") if text else []
+    pages = _split_pages(lines)
+    audit = {
+        "pages": len(pages),
+        "page_numbers_removed": 0,
+        "repeated_lines_removed": 0,
+        "lines_removed": 0,
+        "chars_before": len(text or ""),
+        "chars_after": len(text or ""),
+        "repeated": [],
+    }
+    if len(pages) < 2:
+        return text or "", audit
+    
+    # Una pasada por los bordes: numeración a eliminar y páginas en que aparece cada línea
+    drop = set()
+    edge_keys: Dict[int, str] = {}
+    page_count: Dict[str, int] = {}
+    last_page: Dict[str, int] = {}
+    page_total = max(number for number, _ in pages)
+    for position, (number, indices) in enumerate(pages):
+        short = len(indices) <= 2 * edge_lines
+        width = _SHORT_PAGE_EDGE_LINES if short else edge_lines
+        candidates = []
+        for i in _edges(indices, width):
+            line = lines[i]
+            if _is_page_number(line, number, page_total) or _EXTRACTOR_FOOTER_RE.fullmatch(line):
+                drop.add(i)
+            else:
+                candidates.append(i)
+        if short:
+            # En una página corta casi todo está "en el borde": el cuerpo no cuenta
+            candidates = _edges([i for i in indices if i not in drop], width)
+        for i in candidates:
+            line = lines[i]
+            if len(_WORD_CHAR_RE.findall(line)) < 3:
+                continue
+            key = line.casefold()
+            edge_keys[i] = key
+            if last_page.get(key) != position:
+                last_page[key] = position
+                page_count[key] = page_count.get(key, 0) + 1
+    
+    threshold = max(min_pages, math.ceil(min_page_ratio * len(pages)))
+    repeated = {key for key, count in page_count.items() if count >= threshold}
+    
+    kept: List[str] = []
+    first_seen: Dict[str, str] = {}
+    removed: Dict[str, int] = {}
+    for i, line in enumerate(lines):
+        if i in drop:
+            audit["page_numbers_removed"] += 1
+            continue
+        key = edge_keys.get(i)
+        if key in repeated:
+            if key in first_seen:
+                removed[key] = removed.get(key, 0) + 1
+                continue
+            first_seen[key] = line
+        kept.append(line)
+    
+    cleaned = _BLANK_LINES_RE.sub("\n\n", "\n".join(kept)).strip()
+    audit["repeated_lines_removed"] = sum(removed.values())
+    audit["lines_removed"] = audit["page_numbers_removed"] + audit["repeated_lines_removed"]
+    audit["chars_after"] = len(cleaned)
+    audit["repeated"] = [
+        {"line": first_seen[key][:_AUDIT_SAMPLE_CHARS], "pages": page_count[key], "removed": count}
+        for key, count in sorted(removed.items(), key=lambda item: -item[1])[:_AUDIT_MAX_LINES]
+    ]
+    return cleaned, audit
@@ -1,9 +1,81 @@
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+import hashlib
+import json
 import os
+import threading
+import time
 
+from deadline import Deadline, TIMEOUT_PREFIX
 from .env import load_env_openai_key
 from .http import HTTPClient
 from .openai_service import OpenAIConfig, OpenAIService
+from .single_flight import SingleFlight
+
+
+# Servicios OpenAI reutilizados entre invocaciones warm, por configuración
+_SERVICE_CACHE: Dict[Tuple[Any, ...], OpenAIService] = {}
+_SERVICE_STATS = {"builds": 0, "hits": 0, "build_ms": 0.0}
+_SERVICE_LOCK = threading.Lock()
+_MAX_CACHED_SERVICES = 8
+
+# Llamadas idénticas concurrentes (mismo contrato, preguntas y modelo) comparten una sola llamada
+_QA_FLIGHTS = SingleFlight()
+
+
+def _get_qa_service(api_key: str, cfg: OpenAIConfig) -> Tuple[Tuple[Any, ...], OpenAIService]:
+    """
+    Retorna el OpenAIService cacheado para la configuración (lo crea si no existe).
+    
+    La API key forma parte de la clave: si se rota, el servicio se reconstruye.
+    """
+    key = (api_key, cfg.model, cfg.timeout, cfg.max_output_tokens, cfg.fallback_model, cfg.min_attempt_time, id(cfg.log))
+    with _SERVICE_LOCK:
+        service = _SERVICE_CACHE.get(key)
+        if service is not None:
+            _SERVICE_STATS["hits"] += 1
+            return key, service
+        
+        start = time.perf_counter()
+        http = HTTPClient(api_key=api_key, timeout=cfg.timeout)
+        service = OpenAIService(http, cfg)
+        if len(_SERVICE_CACHE) >= _MAX_CACHED_SERVICES:
+            _SERVICE_CACHE.clear()
+        _SERVICE_CACHE[key] = service
+        _SERVICE_STATS["builds"] += 1
+        _SERVICE_STATS["build_ms"] += (time.perf_counter() - start) * 1000
+    
+    if cfg.log:
+        cfg.log.event("ai.service_built", model=cfg.model, timeout=cfg.timeout)
+    return key, service
+
+
+def _drop_qa_service(key: Tuple[Any, ...]) -> None:
+    with _SERVICE_LOCK:
+        _SERVICE_CACHE.pop(key, None)
+
+
+def get_qa_service_cache_info() -> Dict[str, Any]:
+    """Estadísticas de la cache de servicios OpenAI (construcciones vs reutilizaciones)"""
+    with _SERVICE_LOCK:
+        return {
+            "cached": len(_SERVICE_CACHE),
+            "builds": _SERVICE_STATS["builds"],
+            "hits": _SERVICE_STATS["hits"],
+            "build_ms": round(_SERVICE_STATS["build_ms"], 2),
+        }
+
+
+def get_single_flight_info() -> Dict[str, int]:
+    """Llamadas QA ejecutadas vs ahorradas por coalescencia de requests idénticos"""
+    return _QA_FLIGHTS.stats()
+
+
+def _flight_key(texto_contrato: str, preguntas: List[str], incluir_razonamiento: bool, model: str) -> str:
+    """Hash del contrato, las preguntas y el modelo (lo que determina la respuesta)"""
+    digest = hashlib.sha256(texto_contrato.encode("utf-8"))
+    digest.update(json.dumps([preguntas, incluir_razonamiento, model], ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
 
 
 def generate_qa_responses(
@@ -13,6 +85,7 @@ def generate_qa_responses(
     incluir_razonamiento: bool = False,
     model: str = "gpt-4o-mini",
     timeout: int = 60,
+    deadline: Optional[Deadline] = None,
     log=None,
 ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
     """
@@ -23,12 +96,71 @@ def generate_qa_responses(
         preguntas: Lista de preguntas a responder
         incluir_razonamiento: Si incluir campo razonamiento
         model: Modelo de OpenAI a usar
-        timeout: Timeout para la llamada
+        timeout: Timeout máximo por llamada
+        deadline: Presupuesto del request (recorta el timeout de cada llamada)
         log: Logger para eventos
         
     Returns:
         Tuple con (respuestas_normalizadas, error_message)
+    
+    Si ya hay una llamada idéntica en curso en el contenedor, se espera su
+    resultado (hasta el deadline) en lugar de hacer otra llamada a OpenAI.
+    Un error de deadline del líder depende de su presupuesto, no del
+    request: si al seguidor aún le alcanza para un intento, llama por su cuenta.
     """
+    key = _flight_key(texto_contrato, preguntas, incluir_razonamiento, model)
+    
+    def call() -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        return _generate_qa_responses(
+            texto_contrato=texto_contrato,
+            preguntas=preguntas,
+            incluir_razonamiento=incluir_razonamiento,
+            model=model,
+            timeout=timeout,
+            deadline=deadline,
+            log=log,
+        )
+    
+    try:
+        (resultados, error), shared = _QA_FLIGHTS.do(
+            key, call, timeout=deadline.remaining() if deadline is not None else None
+        )
+    except TimeoutError:
+        if log:
+            log.event("ai.single_flight_timeout", key=key[:12])
+        return None, f"{TIMEOUT_PREFIX} waiting for an identical in-flight request"
+    
+    if shared and (error or "").startswith(TIMEOUT_PREFIX) and _can_attempt(deadline):
+        if log:
+            log.event("ai.single_flight_retry", key=key[:12], error=error,
+                      budget_s=round(deadline.remaining(), 2) if deadline is not None else None)
+        return call()
+    
+    if shared and log:
+        log.event("ai.single_flight_shared", key=key[:12], questions_count=len(preguntas), **_QA_FLIGHTS.stats())
+    return resultados, error
+
+
+def _min_attempt_time() -> float:
+    return float(os.environ.get("OPENAI_MIN_ATTEMPT_TIME", "5"))
+
+
+def _can_attempt(deadline: Optional[Deadline]) -> bool:
+    """Indica si queda presupuesto para un intento propio contra OpenAI"""
+    return deadline is None or deadline.can_fit(_min_attempt_time())
+
+
+def _generate_qa_responses(
+    *,
+    texto_contrato: str,
+    preguntas: List[str],
+    incluir_razonamiento: bool,
+    model: str,
+    timeout: int,
+    deadline: Optional[Deadline],
+    log,
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """Llamada real a OpenAI (sin coalescencia)"""
     # Verificar API key
     api_key = load_env_openai_key()
     if not api_key:
@@ -42,16 +174,216 @@ def generate_qa_responses(
         timeout=timeout,
         max_output_tokens=int(os.environ.get("OPENAI_MAX_OUTPUT_TOKENS", "4096")),
         fallback_model=os.environ.get("OPENAI_FALLBACK_MODEL", "gpt-3.5-turbo"),
+        min_attempt_time=_min_attempt_time(),
         log=log,
     )
     
-    # Crear cliente HTTP y servicio
-    http = HTTPClient(api_key=api_key, timeout=cfg.timeout)
-    service = OpenAIService(http, cfg)
+    # Reutilizar cliente HTTP y servicio del contenedor
+    key, service = _get_qa_service(api_key, cfg)
     
     # Ejecutar QA
-    return service.run_qa(
+    resultados, error = service.run_qa(
+        texto_contrato=texto_contrato,
+        preguntas=preguntas,
+        incluir_razonamiento=incluir_razonamiento,
+        deadline=deadline,
+    )
+    
+    # Una excepción inesperada puede dejar el servicio en mal estado: reconstruir en el próximo uso
+    if resultados is None and (error or "").startswith("Exception:"):
+        _drop_qa_service(key)
+    
+    return resultados, error
+
+
+def split_shards(preguntas: List[str], shard_size: int) -> List[Tuple[int, List[str]]]:
+    """
+    Divide las preguntas en shards consecutivos.
+    
+    Returns:
+        Lista de (offset, preguntas_del_shard); offset es el número de preguntas previas
+    """
+    shard_size = max(1, shard_size)
+    return [(i, preguntas[i:i + shard_size]) for i in range(0, len(preguntas), shard_size)]
+
+
+def _run_shards(
+    *,
+    texto_contrato: str,
+    preguntas: List[str],
+    incluir_razonamiento: bool,
+    model: str,
+    timeout: int,
+    shard_size: int,
+    max_workers: int,
+    on_shard: Optional[Callable[[List[Dict[str, Any]]], None]],
+    deadline: Optional[Deadline],
+    stop_at_deadline: bool,
+    log,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Ejecuta los shards en paralelo.
+    
+    Con `stop_at_deadline` se deja de esperar cuando el deadline vence: los
+    shards que no empezaron se cancelan y los que siguen corriendo se
+    abandonan (sus llamadas ya tienen el timeout recortado al deadline).
+    
+    Returns:
+        Tuple con (respuestas completadas, shards sin respuesta). Cada shard
+        sin respuesta es un dict con offset, preguntas, estado
+        ("pendiente" | "timeout" | "error") y error.
+    """
+    shards = split_shards(preguntas, shard_size)
+    resultados: List[Dict[str, Any]] = []
+    fallidos: List[Dict[str, Any]] = []
+    
+    def run_shard(shard: List[str]):
+        return generate_qa_responses(
+            texto_contrato=texto_contrato,
+            preguntas=shard,
+            incluir_razonamiento=incluir_razonamiento,
+            model=model,
+            timeout=timeout,
+            deadline=deadline,
+            log=log,
+        )
+    
+    wait_timeout = deadline.remaining() if (stop_at_deadline and deadline is not None) else None
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shards))), thread_name_prefix="qa-shard")
+    futures = {pool.submit(run_shard, shard): (offset, shard) for offset, shard in shards}
+    abandoned = False
+    try:
+        for future in as_completed(futures, timeout=wait_timeout):
+            offset, shard = futures.pop(future)
+            try:
+                shard_resultados, error = future.result()
+            except Exception as e:
+                shard_resultados, error = None, f"Exception: {str(e)}"
+            
+            if shard_resultados is None:
+                estado = "timeout" if (error or "").startswith(TIMEOUT_PREFIX) else "error"
+                fallidos.append({"offset": offset, "preguntas": shard, "estado": estado,
+                                 "error": error or "Failed to generate responses"})
+                if log:
+                    log.event("qa.shard_failed", offset=offset, size=len(shard), error=error)
+                continue
+            
+            for resultado in shard_resultados:
+                resultado["pregunta_orden"] += offset
+            resultados.extend(shard_resultados)
+            if log:
+                log.event("qa.shard_done", offset=offset, size=len(shard), completed=len(resultados), total=len(preguntas))
+            
+            if on_shard is not None:
+                try:
+                    on_shard(shard_resultados)
+                except Exception as e:
+                    if log:
+                        log.event("qa.shard_callback_error", offset=offset, error=str(e))
+    
+    except FuturesTimeout:
+        # Deadline vencido: lo que no terminó queda pendiente
+        abandoned = True
+        for future, (offset, shard) in futures.items():
+            estado = "pendiente" if future.cancel() else "timeout"
+            fallidos.append({"offset": offset, "preguntas": shard, "estado": estado,
+                             "error": f"{TIMEOUT_PREFIX} before shard finished"})
+        if log:
+            log.event("qa.shards_abandoned", pending_shards=len(futures), completed=len(resultados), total=len(preguntas))
+    
+    finally:
+        pool.shutdown(wait=not abandoned)
+    
+    resultados.sort(key=lambda r: r["pregunta_orden"])
+    fallidos.sort(key=lambda f: f["offset"])
+    return resultados, fallidos
+
+
+def generate_qa_responses_sharded(
+    *,
+    texto_contrato: str,
+    preguntas: List[str],
+    incluir_razonamiento: bool = False,
+    model: str = "gpt-4o-mini",
+    timeout: int = 60,
+    shard_size: int = 10,
+    max_workers: int = 4,
+    on_shard: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    deadline: Optional[Deadline] = None,
+    log=None,
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Genera respuestas de QA dividiendo las preguntas en shards paralelos.
+    
+    Cada shard es una llamada independiente a generate_qa_responses (con el
+    contrato completo). `on_shard` recibe las respuestas de cada shard apenas
+    termina, ya con `pregunta_orden` global; se invoca siempre desde el hilo
+    que llama a esta función, un shard a la vez.
+    
+    Returns:
+        Tuple con (respuestas ordenadas por pregunta_orden, error_message).
+        Si algún shard falla se retorna el primer error.
+    """
+    resultados, fallidos = _run_shards(
         texto_contrato=texto_contrato,
         preguntas=preguntas,
-        incluir_razonamiento=incluir_razonamiento
+        incluir_razonamiento=incluir_razonamiento,
+        model=model,
+        timeout=timeout,
+        shard_size=shard_size,
+        max_workers=max_workers,
+        on_shard=on_shard,
+        deadline=deadline,
+        stop_at_deadline=False,
+        log=log,
     )
+    if fallidos:
+        return None, fallidos[0]["error"]
+    return resultados, None
+
+
+def generate_qa_responses_partial(
+    *,
+    texto_contrato: str,
+    preguntas: List[str],
+    incluir_razonamiento: bool = False,
+    model: str = "gpt-4o-mini",
+    timeout: int = 60,
+    shard_size: int = 10,
+    max_workers: int = 4,
+    on_shard: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    deadline: Optional[Deadline] = None,
+    log=None,
+) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]], Optional[str]]:
+    """
+    Como generate_qa_responses_sharded, pero al vencer el deadline (o si
+    falla un shard) retorna lo que ya terminó en lugar de fallar completo.
+    
+    Returns:
+        Tuple con (respuestas completadas, preguntas pendientes, error_message).
+        Cada pendiente es {pregunta_orden, pregunta, estado, error}. Las
+        respuestas son None (con el primer error) solo si no terminó ninguna.
+    """
+    resultados, fallidos = _run_shards(
+        texto_contrato=texto_contrato,
+        preguntas=preguntas,
+        incluir_razonamiento=incluir_razonamiento,
+        model=model,
+        timeout=timeout,
+        shard_size=shard_size,
+        max_workers=max_workers,
+        on_shard=on_shard,
+        deadline=deadline,
+        stop_at_deadline=True,
+        log=log,
+    )
+    
+    pendientes = [
+        {"pregunta_orden": fallido["offset"] + i + 1, "pregunta": pregunta,
+         "estado": fallido["estado"], "error": fallido["error"]}
+        for fallido in fallidos
+        for i, pregunta in enumerate(fallido["preguntas"])
+    ]
+    if not resultados and fallidos:
+        return None, pendientes, fallidos[0]["error"]
+    return resultados, pendientes, None
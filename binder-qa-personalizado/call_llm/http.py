@@ -16,11 +16,17 @@ class HTTPClient:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}",
         }
+        # SSLContext creado una vez por cliente (el cliente se reutiliza entre invocaciones)
+        self._ssl_ctx: Optional[ssl.SSLContext] = None
     
-    def post(self, url: str, body: Dict[str, Any]) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+    def post(self, url: str, body: Dict[str, Any],
+             timeout: Optional[float] = None) -> Tuple[Optional[int], Optional[str], Optional[str]]:
         """
         Realiza POST request a OpenAI API.
         
+        Args:
+            timeout: Timeout de esta llamada (None = timeout del cliente)
+        
         Returns:
             Tuple con (status_code, response_body, error_message)
         """
@@ -28,10 +34,12 @@ class HTTPClient:
         req = Request(url, data=data, headers=self._headers, method="POST")
         
         # Configurar SSL context
-        ctx = ssl.create_default_context()
+        if self._ssl_ctx is None:
+            self._ssl_ctx = ssl.create_default_context()
+        ctx = self._ssl_ctx
         
         try:
-            with urlopen(req, timeout=self.timeout, context=ctx) as resp:
+            with urlopen(req, timeout=self.timeout if timeout is None else timeout, context=ctx) as resp:
                 raw = resp.read().decode("utf-8", errors="replace")
                 return resp.getcode(), raw, None
                 
@@ -6,6 +6,7 @@ import json
 from .http import HTTPClient
 from .qa_parser import qa_parser
 from .prompt import format_qa_prompt
+from deadline import Deadline, TIMEOUT_PREFIX
 
 
 @dataclass
@@ -15,6 +16,7 @@ class OpenAIConfig:
     timeout: int = 60
     max_output_tokens: int = 4096
     fallback_model: str = "gpt-3.5-turbo"
+    min_attempt_time: float = 5.0
     log: Any = None
 
 
@@ -54,13 +56,20 @@ class OpenAIService:
             "temperature": 0.1,  # Baja temperatura para respuestas consistentes
         }
     
-    def _call_chat(self, prompt: str, model: Optional[str] = None) -> Tuple[Optional[int], Optional[str], Optional[str]]:
-        """Llama a OpenAI Chat API"""
+    def _call_chat(self, prompt: str, model: Optional[str] = None,
+                   deadline: Optional[Deadline] = None) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+        """Llama a OpenAI Chat API con timeout recortado al presupuesto restante"""
         body = self._build_chat_body(prompt, model)
-        return self.http.post(self.CHAT_URL, body)
+        timeout = self.cfg.timeout if deadline is None else deadline.timeout_for(self.cfg.timeout)
+        return self.http.post(self.CHAT_URL, body, timeout=timeout)
+    
+    def _has_budget(self, deadline: Optional[Deadline]) -> bool:
+        """Indica si queda tiempo para un intento útil contra la API"""
+        return deadline is None or deadline.can_fit(self.cfg.min_attempt_time)
     
     def run_qa(self, texto_contrato: str, preguntas: List[str], 
-               incluir_razonamiento: bool = False) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+               incluir_razonamiento: bool = False,
+               deadline: Optional[Deadline] = None) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
         """
         Ejecuta QA sobre un contrato con múltiples preguntas.
         
@@ -68,6 +77,8 @@ class OpenAIService:
             texto_contrato: Texto del contrato
             preguntas: Lista de preguntas
             incluir_razonamiento: Si incluir razonamiento en respuestas
+            deadline: Presupuesto del request; cada llamada usa como timeout lo
+                que queda, y el fallback solo se intenta si aún cabe
             
         Returns:
             Tuple con (respuestas_normalizadas, error_message)
@@ -82,9 +93,13 @@ class OpenAIService:
                 self._log("ai.text_trimmed", original_len=len(prompt), trimmed_len=len(safe_text))
             
             # Intentar con modelo principal
+            if not self._has_budget(deadline):
+                self._log("ai.deadline_exceeded", stage="primary", remaining_s=round(deadline.remaining(), 2))
+                return None, f"{TIMEOUT_PREFIX} before OpenAI call ({deadline.remaining():.1f}s left)"
+            
             self._log("ai.qa_start", model=self.cfg.model, questions_count=len(preguntas))
             
-            status, raw_response, error = self._call_chat(safe_text)
+            status, raw_response, error = self._call_chat(safe_text, deadline=deadline)
             
             if status and 200 <= status < 300 and raw_response:
                 # Parsear respuesta
@@ -101,11 +116,14 @@ class OpenAIService:
                 else:
                     self._log("ai.parse_error", err=parse_error or "Unknown parse error")
             
-            # Si falló, intentar con modelo de fallback
-            if self.cfg.fallback_model and self.cfg.fallback_model != self.cfg.model:
+            # Si falló, intentar con modelo de fallback (solo si el presupuesto lo permite)
+            fallback_enabled = self.cfg.fallback_model and self.cfg.fallback_model != self.cfg.model
+            if fallback_enabled and not self._has_budget(deadline):
+                self._log("ai.fallback_skipped", reason="deadline", remaining_s=round(deadline.remaining(), 2))
+            elif fallback_enabled:
                 self._log("ai.fallback_attempt", fallback_model=self.cfg.fallback_model)
                 
-                status2, raw_response2, error2 = self._call_chat(safe_text, self.cfg.fallback_model)
+                status2, raw_response2, error2 = self._call_chat(safe_text, self.cfg.fallback_model, deadline=deadline)
                 
                 if status2 and 200 <= status2 < 300 and raw_response2:
                     parsed_data2, parse_error2 = qa_parser.parse_any(raw_response2)
@@ -123,6 +141,8 @@ class OpenAIService:
             # Si todo falló, retornar error
             error_msg = error or "Unknown API error"
             self._log("ai.qa_failed", err=error_msg, status=status or 0)
+            if not self._has_budget(deadline):
+                return None, f"{TIMEOUT_PREFIX} during OpenAI call: {error_msg}"
             return None, f"OpenAI API error: {error_msg}"
             
         except Exception as e:
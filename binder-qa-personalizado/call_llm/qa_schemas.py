@@ -11,6 +11,16 @@ def qa_input_schema() -> Dict[str, Any]:
                 "minLength": 1,
                 "description": "Texto completo del contrato a analizar"
             },
+            "contrato_url": {
+                "type": "string",
+                "format": "uri",
+                "description": "URL desde la que se descarga el contrato (en lugar de texto_contrato)"
+            },
+            "contrato_hash": {
+                "type": "string",
+                "pattern": "^[0-9a-f]{64}$",
+                "description": "SHA-256 de un contrato ya enviado (metadatos.contrato.hash)"
+            },
             "reference_id": {
                 "type": "string",
                 "minLength": 1,
@@ -24,10 +34,50 @@ def qa_input_schema() -> Dict[str, Any]:
                         "format": "uri",
                         "description": "URL opcional para webhook"
                     },
+                    "webhook_urls": {
+                        "type": "array",
+                        "items": {
+                            "type": "string",
+                            "format": "uri"
+                        },
+                        "minItems": 1,
+                        "maxItems": 5,
+                        "description": "Varios endpoints que reciben el mismo resultado (entrega concurrente)"
+                    },
+                    "webhook_mode": {
+                        "type": "string",
+                        "enum": ["final", "progressive"],
+                        "description": "progressive: un webhook por respuesta apenas está lista y un evento final"
+                    },
+                    "async_job": {
+                        "type": "boolean",
+                        "description": "Responder 202 de inmediato y procesar en segundo plano"
+                    },
+                    "webhook_claim_check": {
+                        "type": "boolean",
+                        "description": "Enviar un webhook liviano (resumen, sha256, fetch_url) en lugar del resultado completo"
+                    },
+                    "webhook_gzip": {
+                        "type": "boolean",
+                        "description": "Enviar el webhook con Content-Encoding: gzip"
+                    },
                     "incluir_razonamiento": {
                         "type": "boolean",
                         "description": "Si incluir campo razonamiento en respuestas"
                     },
+                    "resultados_parciales": {
+                        "type": "boolean",
+                        "description": "Al vencer el presupuesto, responder con las preguntas terminadas y listar las pendientes"
+                    },
+                    "continuar_pendientes": {
+                        "type": "boolean",
+                        "description": "Procesar las preguntas pendientes como job asíncrono (requiere resultados_parciales)"
+                    },
+                    "pregunta_ordenes": {
+                        "type": "array",
+                        "items": {"type": "integer", "minimum": 1},
+                        "description": "Uso interno (continuaciones): pregunta_orden original de cada pregunta"
+                    },
                     "preguntas": {
                         "type": "array",
                         "items": {
@@ -44,7 +94,12 @@ def qa_input_schema() -> Dict[str, Any]:
                 "additionalProperties": False
             }
         },
-        "required": ["texto_contrato", "reference_id", "qa"],
+        "required": ["reference_id", "qa"],
+        "oneOf": [
+            {"required": ["texto_contrato"]},
+            {"required": ["contrato_url"]},
+            {"required": ["contrato_hash"]}
+        ],
         "additionalProperties": False
     }
 
@@ -96,6 +151,25 @@ def qa_output_schema() -> Dict[str, Any]:
                 },
                 "description": "Resultados de las preguntas procesadas"
             },
+            "preguntas_pendientes": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "pregunta_orden": {"type": "integer", "minimum": 1},
+                        "pregunta": {"type": "string"},
+                        "estado": {
+                            "type": "string",
+                            "enum": ["pendiente", "timeout", "error"],
+                            "description": "pendiente: no alcanzó a empezar; timeout: seguía en curso al vencer el presupuesto"
+                        },
+                        "error": {"type": "string"}
+                    },
+                    "required": ["pregunta_orden", "pregunta", "estado"],
+                    "additionalProperties": False
+                },
+                "description": "Preguntas sin respuesta cuando metadatos.completo es false"
+            },
             "metadatos": {
                 "type": "object",
                 "properties": {
@@ -110,12 +184,95 @@ def qa_output_schema() -> Dict[str, Any]:
                     },
                     "modo": {
                         "type": "string",
-                        "enum": ["sync"],
+                        "enum": ["sync", "async", "batch", "progressive"],
                         "description": "Modo de ejecución"
                     },
                     "webhook_disparado": {
                         "type": "boolean",
                         "description": "Si se disparó webhook"
+                    },
+                    "webhook_lote_item": {
+                        "type": "string",
+                        "description": "ID del ítem encolado cuando WEBHOOK_BATCH_MODE está activo"
+                    },
+                    "resultado_url": {
+                        "type": "string",
+                        "description": "URL de recuperación del resultado guardado (claim-check)"
+                    },
+                    "reutilizado": {
+                        "type": "boolean",
+                        "description": "Resultado guardado de un request previo con el mismo reference_id y body"
+                    },
+                    "completo": {
+                        "type": "boolean",
+                        "description": "false si hay preguntas_pendientes (resultado parcial)"
+                    },
+                    "contrato": {
+                        "type": "object",
+                        "properties": {
+                            "hash": {"type": "string", "description": "SHA-256 del contrato normalizado (usable como contrato_hash)"},
+                            "origen": {"type": "string", "enum": ["texto", "url", "hash"]},
+                            "cache": {"type": "string", "enum": ["memoria", "almacen", "sin_cache"]},
+                            "normalizacion": {
+                                "type": "object",
+                                "properties": {
+                                    "caracteres_antes": {"type": "integer", "minimum": 0},
+                                    "caracteres_despues": {"type": "integer", "minimum": 0},
+                                    "tokens_estimados_antes": {"type": "integer", "minimum": 0},
+                                    "tokens_estimados_despues": {"type": "integer", "minimum": 0},
+                                    "boilerplate": {
+                                        "type": "object",
+                                        "properties": {
+                                            "paginas": {"type": "integer", "minimum": 0},
+                                            "numeros_pagina_eliminados": {"type": "integer", "minimum": 0},
+                                            "lineas_repetidas_eliminadas": {"type": "integer", "minimum": 0},
+                                            "caracteres_eliminados": {"type": "integer", "minimum": 0}
+                                        },
+                                        "additionalProperties": False,
+                                        "description": "Numeración de página y encabezados/pies repetidos eliminados"
+                                    }
+                                },
+                                "additionalProperties": False,
+                                "description": "Tamaño del contrato antes y después de normalizarlo para el prompt"
+                            }
+                        },
+                        "additionalProperties": False,
+                        "description": "Contrato usado y de dónde se obtuvo"
+                    },
+                    "continuacion": {
+                        "type": "object",
+                        "properties": {
+                            "reference_id": {"type": ["string", "null"]},
+                            "estado": {"type": ["string", "null"]},
+                            "status_url": {"type": ["string", "null"]},
+                            "error": {"type": "string"}
+                        },
+                        "additionalProperties": False,
+                        "description": "Job que procesa las preguntas pendientes (qa.continuar_pendientes)"
+                    },
+                    "webhook_eventos": {
+                        "type": "integer",
+                        "minimum": 0,
+                        "description": "Eventos enviados en modo progresivo (respuestas + completado)"
+                    },
+                    "webhooks": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "url": {"type": "string"},
+                                "estado": {
+                                    "type": "string",
+                                    "enum": ["entregado", "diferido", "fallido", "despachado", "encolado"]
+                                },
+                                "error": {"type": ["string", "null"]},
+                                "latencia_ms": {"type": "integer", "minimum": 0},
+                                "item_id": {"type": "string"}
+                            },
+                            "required": ["url", "estado"],
+                            "additionalProperties": False
+                        },
+                        "description": "Resultado de entrega por endpoint (webhook_disparado es el agregado)"
                     }
                 },
                 "required": ["modelo", "latencia_ms", "modo", "webhook_disparado"],
@@ -145,7 +302,7 @@ def qa_error_schema() -> Dict[str, Any]:
                 "properties": {
                     "codigo": {
                         "type": "string",
-                        "enum": ["BAD_REQUEST", "TIMEOUT", "MODEL_ERROR", "WEBHOOK_ERROR"],
+                        "enum": ["BAD_REQUEST", "TIMEOUT", "MODEL_ERROR", "WEBHOOK_ERROR", "NOT_FOUND", "CONFLICT", "FETCH_ERROR", "UNAVAILABLE"],
                         "description": "Código de error específico"
                     },
                     "detalle": {
@@ -0,0 +1,80 @@
+import copy
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class _Flight:
+    """Llamada en curso compartida por los requests con la misma clave"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas idénticas concurrentes (patrón single-flight).
+    
+    La primera llamada con una clave ejecuta la función; las que llegan
+    mientras sigue en curso esperan y reciben una copia profunda del mismo
+    resultado (o la misma excepción), por lo que cada llamador puede mutar
+    su resultado sin afectar a los demás. No es una cache: al terminar la
+    llamada la clave se libera.
+    """
+    
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._shared = 0
+    
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Ejecuta `fn` o se une a la ejecución en curso con la misma clave.
+        
+        Args:
+            timeout: Espera máxima de un llamador que se une (None = sin límite)
+        
+        Returns:
+            Tuple con (resultado, compartido); compartido es True si el
+            resultado vino de la llamada de otro
+        
+        Raises:
+            TimeoutError: si la llamada en curso no terminó dentro de `timeout`
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self._executed += 1
+        
+        if leader:
+            try:
+                result = fn()
+                # Copia tomada antes de retornar: el llamador original puede mutar su resultado
+                flight.result = copy.deepcopy(result)
+                return result, False
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+        
+        if not flight.done.wait(timeout):
+            raise TimeoutError(f"In-flight call did not finish within {timeout:.1f}s")
+        if flight.error is not None:
+            raise flight.error
+        
+        with self._lock:
+            self._shared += 1
+        return copy.deepcopy(flight.result), True
+    
+    def stats(self) -> Dict[str, int]:
+        """Llamadas ejecutadas, llamadas ahorradas (compartidas) y llamadas en curso"""
+        with self._lock:
+            return {"executed": self._executed, "saved": self._shared, "in_flight": len(self._flights)}
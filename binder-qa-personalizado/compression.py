@@ -0,0 +1,95 @@
+import gzip
+import zlib
+from typing import Dict, Any, Tuple
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Indica si el header Accept-Encoding del cliente admite gzip.
+    
+    Respeta q=0 (rechazo explícito) y el comodín "*".
+    """
+    if not accept_encoding:
+        return False
+    
+    wildcard = False
+    for item in accept_encoding.split(","):
+        parts = [p.strip() for p in item.split(";")]
+        coding = parts[0].lower()
+        q = 1.0
+        for param in parts[1:]:
+            if param.lower().startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        
+        if coding in ("gzip", "x-gzip"):
+            return q > 0
+        if coding == "*":
+            wildcard = q > 0
+    
+    return wildcard
+
+
+def maybe_gzip(data: bytes, min_bytes: int = 1024, level: int = 6) -> Tuple[bytes, bool]:
+    """
+    Comprime con gzip si el payload supera el umbral y la compresión reduce el tamaño.
+    
+    Returns:
+        Tuple con (datos, comprimido)
+    """
+    if len(data) < min_bytes:
+        return data, False
+    
+    compressed = gzip.compress(data, compresslevel=level, mtime=0)
+    if len(compressed) >= len(data):
+        return data, False
+    
+    return compressed, True
+
+
+class DecompressionLimitError(ValueError):
+    """El contenido descomprimido supera el máximo permitido"""
+
+
+def gunzip_bounded(data: bytes, max_bytes: int, chunk_size: int = 64 * 1024) -> bytes:
+    """
+    Descomprime gzip sin superar `max_bytes` (protección contra zip bombs).
+    
+    Descomprime por bloques de `chunk_size` y se detiene apenas la salida
+    supera el máximo, sin llegar a materializar el contenido completo.
+    
+    Raises:
+        DecompressionLimitError: si el contenido descomprimido supera `max_bytes`
+        ValueError: si los datos no son gzip válido o están truncados
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    parts = []
+    size = 0
+    pending = data
+    try:
+        while not decompressor.eof:
+            chunk = decompressor.decompress(pending, chunk_size)
+            pending = decompressor.unconsumed_tail
+            if not chunk and not pending:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise DecompressionLimitError(f"Decompressed body exceeds {max_bytes} bytes")
+            parts.append(chunk)
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip data: {str(e)}")
+    
+    if not decompressor.eof:
+        raise ValueError("Invalid gzip data: truncated stream")
+    return b"".join(parts)
+
+
+def compression_stats(bytes_before: int, bytes_after: int) -> Dict[str, Any]:
+    """Métricas de tamaño antes/después para verificar el ahorro de ancho de banda"""
+    return {
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "ratio": round(bytes_after / bytes_before, 3) if bytes_before else 1.0,
+    }
@@ -11,11 +11,20 @@ class QAConfig:
     max_preguntas: int = int(os.environ.get("QA_MAX_PREGUNTAS", "50"))
     max_chars_pregunta: int = int(os.environ.get("QA_MAX_CHARS_PREGUNTA", "300"))
     min_chars_contrato: int = int(os.environ.get("QA_MIN_CHARS_CONTRATO", "100"))
+    max_webhook_targets: int = int(os.environ.get("QA_MAX_WEBHOOK_TARGETS", "5"))
+    
+    # Shards de preguntas (modo webhook progresivo)
+    qa_shard_size: int = int(os.environ.get("QA_SHARD_SIZE", "10"))
+    qa_shard_workers: int = int(os.environ.get("QA_SHARD_WORKERS", "4"))
+    # Retornar respuestas parciales al vencer el deadline (default de qa.resultados_parciales)
+    qa_partial_results: bool = os.environ.get("QA_PARTIAL_RESULTS", "false").lower() == "true"
     
     # Timeouts
     openai_timeout: int = int(os.environ.get("OPENAI_TIMEOUT", "60"))
     webhook_timeout: int = int(os.environ.get("WEBHOOK_TIMEOUT", "30"))
     max_total_timeout: int = int(os.environ.get("MAX_TOTAL_TIMEOUT", "120"))
+    deadline_reserve_seconds: float = float(os.environ.get("DEADLINE_RESERVE_SECONDS", "1.5"))
+    openai_min_attempt_time: float = float(os.environ.get("OPENAI_MIN_ATTEMPT_TIME", "5"))
     
     # OpenAI
     default_model: str = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
@@ -26,11 +35,95 @@ class QAConfig:
     webhook_retry_attempts: int = int(os.environ.get("WEBHOOK_RETRY_ATTEMPTS", "3"))
     webhook_backoff_base: float = float(os.environ.get("WEBHOOK_BACKOFF_BASE", "1.5"))
     webhook_async_mode: bool = os.environ.get("WEBHOOK_ASYNC_MODE", "false").lower() == "true"
+    webhook_backoff_max: float = float(os.environ.get("WEBHOOK_BACKOFF_MAX", "10"))
+    webhook_min_attempt_time: float = float(os.environ.get("WEBHOOK_MIN_ATTEMPT_TIME", "2"))
+    webhook_deferred_dir: str = os.environ.get("WEBHOOK_DEFERRED_DIR", "/tmp/qa-webhook-deferred")
+    
+    # Circuit breaker por host de webhook
+    webhook_breaker_failures: int = int(os.environ.get("WEBHOOK_BREAKER_FAILURES", "5"))
+    webhook_breaker_open_seconds: float = float(os.environ.get("WEBHOOK_BREAKER_OPEN_SECONDS", "30"))
+    webhook_breaker_window: int = int(os.environ.get("WEBHOOK_BREAKER_WINDOW", "50"))
+    webhook_breaker_min_success_rate: float = float(os.environ.get("WEBHOOK_BREAKER_MIN_SUCCESS_RATE", "0.5"))
+    
+    # Claim-check: webhook liviano con URL al resultado guardado
+    webhook_claim_check_min_bytes: int = int(os.environ.get("WEBHOOK_CLAIM_CHECK_MIN_BYTES", "0"))
+    result_store_path: str = os.environ.get("RESULT_STORE_PATH", "/tmp/qa-results.sqlite3")
+    result_ttl_seconds: int = int(os.environ.get("RESULT_TTL_SECONDS", "86400"))
+    results_base_url: str = os.environ.get("RESULTS_BASE_URL", "")
+    
+    # Contratos por referencia (contrato_url / contrato_hash) con cache por hash de contenido
+    contract_store_path: str = os.environ.get("CONTRACT_STORE_PATH", "/tmp/qa-contracts.sqlite3")
+    contract_ttl_seconds: int = int(os.environ.get("CONTRACT_TTL_SECONDS", "86400"))
+    contract_cache_entries: int = int(os.environ.get("CONTRACT_CACHE_ENTRIES", "32"))
+    contract_cache_max_bytes: int = int(os.environ.get("CONTRACT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    contract_url_ttl_seconds: int = int(os.environ.get("CONTRACT_URL_TTL_SECONDS", "300"))
+    contract_max_bytes: int = int(os.environ.get("CONTRACT_MAX_BYTES", str(5 * 1024 * 1024)))
+    contract_fetch_timeout: float = float(os.environ.get("CONTRACT_FETCH_TIMEOUT", "10"))
+    contract_url_allowed_domains: Tuple[str, ...] = tuple(
+        domain.strip() for domain in os.environ.get("CONTRACT_URL_ALLOWED_DOMAINS", "").split(",")
+        if domain.strip()
+    )
+    # Encabezados, pies y sellos de firma repetidos en cada página se quitan antes del prompt
+    contract_strip_boilerplate: bool = os.environ.get("CONTRACT_STRIP_BOILERPLATE", "true").lower() == "true"
+    contract_boilerplate_edge_lines: int = int(os.environ.get("CONTRACT_BOILERPLATE_EDGE_LINES", "6"))
+    contract_boilerplate_min_page_ratio: float = float(os.environ.get("CONTRACT_BOILERPLATE_MIN_PAGE_RATIO", "0.5"))
+    
+    # Jobs asíncronos (qa.async_job: 202 + procesamiento en segundo plano)
+    job_store_backend: str = os.environ.get("JOB_STORE_BACKEND", "sqlite")
+    job_store_path: str = os.environ.get("JOB_STORE_PATH", "/tmp/qa-jobs.sqlite3")
+    job_ttl_seconds: int = int(os.environ.get("JOB_TTL_SECONDS", "86400"))
+    job_retry_after: int = int(os.environ.get("JOB_RETRY_AFTER", "5"))
+    # Procesos worker locales simultáneos (fuera de Lambda)
+    job_local_workers: int = int(os.environ.get("JOB_LOCAL_WORKERS", "4"))
+    
+    # Lotes de cola SQS: mensajes procesados en paralelo por invocación
+    queue_workers: int = int(os.environ.get("QUEUE_WORKERS", "4"))
+    
+    # Idempotencia por reference_id (reintentos no repiten el análisis)
+    idempotency_enabled: bool = os.environ.get("IDEMPOTENCY_ENABLED", "true").lower() == "true"
+    idempotency_store_path: str = os.environ.get("IDEMPOTENCY_STORE_PATH", "/tmp/qa-idempotency.sqlite3")
+    idempotency_ttl_seconds: int = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    idempotency_wait_seconds: float = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "0"))
+    
+    # Agrupación de webhooks por endpoint (opcional)
+    webhook_batch_mode: bool = os.environ.get("WEBHOOK_BATCH_MODE", "false").lower() == "true"
+    webhook_batch_window_ms: int = int(os.environ.get("WEBHOOK_BATCH_WINDOW_MS", "500"))
+    webhook_batch_max_items: int = int(os.environ.get("WEBHOOK_BATCH_MAX_ITEMS", "25"))
+    webhook_batch_unsupported_hosts: Tuple[str, ...] = tuple(
+        host.strip() for host in os.environ.get("WEBHOOK_BATCH_UNSUPPORTED_HOSTS", "").split(",")
+        if host.strip()
+    )
+    
+    # Pool de conexiones webhook (keep-alive por host)
+    webhook_pool_max_idle: int = int(os.environ.get("WEBHOOK_POOL_MAX_IDLE", "4"))
+    webhook_max_concurrent_per_host: int = int(os.environ.get("WEBHOOK_MAX_CONCURRENT_PER_HOST", "8"))
+    webhook_keepalive_idle: float = float(os.environ.get("WEBHOOK_KEEPALIVE_IDLE", "30"))
+    dns_cache_ttl: float = float(os.environ.get("DNS_CACHE_TTL", "60"))
+    
+    # Compresión gzip (respuestas HTTP y webhooks opt-in)
+    compression_min_bytes: int = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+    compression_level: int = int(os.environ.get("COMPRESSION_LEVEL", "6"))
+    webhook_gzip_hosts: Tuple[str, ...] = tuple(
+        host.strip() for host in os.environ.get("WEBHOOK_GZIP_HOSTS", "").split(",")
+        if host.strip()
+    )
+    # Tamaño máximo de un body de request gzip una vez descomprimido
+    request_max_decompressed_bytes: int = int(os.environ.get("REQUEST_MAX_DECOMPRESSED_BYTES", str(10 * 1024 * 1024)))
     
     # AWS
     region: str = os.environ.get("AWS_REGION", "us-east-1")
     log_level: str = os.environ.get("LOG_LEVEL", "INFO")
     
+    # Modo servidor (server.py)
+    server_host: str = os.environ.get("SERVER_HOST", "0.0.0.0")
+    server_port: int = int(os.environ.get("SERVER_PORT", "8080"))
+    server_workers: int = int(os.environ.get("SERVER_WORKERS", "16"))
+    server_max_pending: int = int(os.environ.get("SERVER_MAX_PENDING", "64"))
+    server_keepalive_seconds: float = float(os.environ.get("SERVER_KEEPALIVE_SECONDS", "2"))
+    server_read_timeout: float = float(os.environ.get("SERVER_READ_TIMEOUT", "15"))
+    server_drain_seconds: float = float(os.environ.get("SERVER_DRAIN_SECONDS", "30"))
+    server_max_body_bytes: int = int(os.environ.get("SERVER_MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+    
     # CORS
     allowed_origin: str = os.environ.get("ALLOWED_ORIGIN", "*")
     
@@ -0,0 +1,381 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from boilerplate import strip_page_boilerplate
+from call_llm.single_flight import SingleFlight
+from utils import BlockedAddressError, download_file, estimate_tokens, normalize_for_prompt
+
+
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_contract_hash(value: Any) -> bool:
+    """SHA-256 en hexadecimal (minúsculas)"""
+    return isinstance(value, str) and bool(_HASH_RE.match(value))
+
+
+def normalize_contract(texto: str) -> str:
+    """Forma canónica del contrato: la que se hashea, se guarda y se envía al modelo"""
+    return texto.lstrip("\ufeff").replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def contract_hash(texto_normalizado: str) -> str:
+    """SHA-256 del contrato normalizado (UTF-8)"""
+    return hashlib.sha256(texto_normalizado.encode("utf-8")).hexdigest()
+
+
+def decode_contract(data: bytes) -> str:
+    """Decodifica un contrato descargado (UTF-8, con o sin BOM; si no, Windows-1252)"""
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1252", errors="replace")
+
+
+class ContractCache:
+    """
+    Cache en memoria LRU + TTL de contratos normalizados (y sus derivados).
+    
+    Acotada por cantidad de entradas y por bytes totales; al superar
+    cualquiera de los dos límites se descartan las entradas menos usadas.
+    Vive en el contenedor warm y se comparte entre requests.
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+    
+    def put(self, key: str, value: Any, ttl_seconds: Optional[float] = None, size: Optional[int] = None) -> None:
+        """Guarda un valor; `size` (bytes) es obligatorio si el valor no es un string"""
+        if size is None:
+            size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evicted += 1
+    
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self._hits,
+                    "misses": self._misses, "evicted": self._evicted}
+
+
+class ContractStore:
+    """
+    Almacén de contratos normalizados direccionado por contenido (SHA-256).
+    
+    Es el sustituto local de un bucket de objetos (SQLite con TTL, igual
+    que ResultStore): permite referenciar un contrato por `contrato_hash`
+    desde otro contenedor o después de un reinicio. Guardar un contrato ya
+    presente solo renueva su expiración.
+    """
+    
+    # Intervalo mínimo entre barridos de expirados
+    EVICT_INTERVAL = 60.0
+    
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS contracts ("
+                " sha256 TEXT PRIMARY KEY, texto TEXT, bytes INTEGER, origen TEXT,"
+                " created_at REAL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS contracts_expires ON contracts (expires_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0)
+    
+    def put(self, sha256: str, texto: str, origen: str) -> None:
+        """Guarda un contrato normalizado (o renueva su expiración si ya existe)"""
+        self._maybe_evict()
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE contracts SET expires_at = ? WHERE sha256 = ?", (now + self.ttl_seconds, sha256)
+            ).rowcount
+            if not updated:
+                conn.execute(
+                    "INSERT INTO contracts (sha256, texto, bytes, origen, created_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (sha256, texto, len(texto.encode("utf-8")), origen, now, now + self.ttl_seconds),
+                )
+    
+    def info(self, sha256: str) -> Optional[Tuple[int, float]]:
+        """Tamaño y expiración de un contrato vigente, sin leer su texto"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT bytes, expires_at FROM contracts WHERE sha256 = ? AND expires_at > ?", (sha256, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+    
+    def get(self, sha256: str) -> Optional[str]:
+        """Contrato vigente con ese hash, o None si no existe o expiró"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT texto, expires_at FROM contracts WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                conn.execute("DELETE FROM contracts WHERE sha256 = ?", (sha256,))
+                return None
+        return row[0]
+    
+    def evict_expired(self) -> int:
+        """Elimina los contratos expirados y retorna cuántos se borraron"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute("DELETE FROM contracts WHERE expires_at <= ?", (time.time(),))
+            self._last_evict = time.monotonic()
+            return cursor.rowcount
+    
+    def _maybe_evict(self) -> None:
+        if time.monotonic() - self._last_evict >= self.EVICT_INTERVAL:
+            self.evict_expired()
+
+
+class ContractResolver:
+    """
+    Obtiene el texto del contrato de un request: inline (`texto_contrato`),
+    por URL (`contrato_url`) o por hash de un contrato ya enviado
+    (`contrato_hash`).
+    
+    El contrato se normaliza una sola vez y queda en la cache en memoria y
+    en el ContractStore bajo su hash; una URL ya descargada se resuelve a
+    su hash sin volver a descargarla mientras no expire. Descargas
+    concurrentes de la misma URL comparten una sola transferencia.
+    
+    El hash se calcula sobre la forma canónica (normalize_contract), que
+    un cliente puede reproducir; el texto que va al prompt pasa además por
+    normalize_for_prompt y strip_page_boilerplate (encabezados, pies y sellos
+    de firma repetidos en cada página), calculado una vez por hash.
+    """
+    
+    def __init__(self, config, logger, store: ContractStore, cache: ContractCache):
+        self.config = config
+        self.logger = logger
+        self.store = store
+        self.cache = cache
+        self._downloads = SingleFlight()
+        self._stats_lock = threading.Lock()
+        self._stats = {"by_hash": 0, "url_reuses": 0, "bytes_avoided": 0, "downloads": 0,
+                       "bytes_downloaded": 0, "checks": 0, "checks_hit": 0}
+    
+    def _count(self, **increments: int) -> None:
+        with self._stats_lock:
+            for key, value in increments.items():
+                self._stats[key] += value
+    
+    def stats(self) -> Dict[str, int]:
+        """Contadores de reutilización: requests por hash, URLs sin descargar y bytes evitados"""
+        with self._stats_lock:
+            return dict(self._stats)
+    
+    def check(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """
+        Indica si el servicio ya tiene el contrato con ese hash (sin cargarlo).
+        
+        Returns:
+            {"bytes", "expira" (epoch o None), "cache"} o None si no está
+        """
+        texto = self.cache.get(sha256)
+        if texto is not None:
+            found = {"bytes": len(texto.encode("utf-8")), "expira": None, "cache": "memoria"}
+        else:
+            try:
+                info = self.store.info(sha256)
+            except Exception as e:
+                self.logger.event("contract.store_error", hash=sha256, error=str(e))
+                info = None
+            found = {"bytes": info[0], "expira": info[1], "cache": "almacen"} if info else None
+        
+        self._count(checks=1, checks_hit=1 if found else 0)
+        return found
+    
+    def resolve(self, body: Dict[str, Any], deadline) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, str]]]:
+        """
+        Resuelve el contrato de un request ya validado.
+        
+        Returns:
+            Tuple con ({"texto" (listo para el prompt), "hash", "origen", "cache",
+            "normalizacion"}, None) o (None, {"codigo", "detalle"}) si no se pudo obtener
+        """
+        if isinstance(body.get("texto_contrato"), str):
+            contrato, error = self._from_text(body["texto_contrato"], "texto"), None
+        elif body.get("contrato_hash") is not None:
+            contrato, error = self._from_hash(body["contrato_hash"])
+            if contrato is not None:
+                # El cliente no reenvió el texto: bytes de upload evitados
+                avoided = len(contrato["texto"].encode("utf-8"))
+                self._count(by_hash=1, bytes_avoided=avoided)
+                self.logger.event("contract.by_hash", hash=contrato["hash"], cache=contrato["cache"],
+                                  bytes_avoided=avoided)
+        else:
+            contrato, error = self._from_url(body["contrato_url"], deadline)
+        
+        if contrato is not None:
+            self._prepare(contrato)
+        return contrato, error
+    
+    def _prepare(self, contrato: Dict[str, Any]) -> None:
+        """Reemplaza el texto por su versión para el prompt (normalizada una vez por hash)"""
+        key = f"prompt:{contrato['hash']}"
+        prepared = self.cache.get(key)
+        if prepared is None:
+            start = time.perf_counter()
+            texto, stats = normalize_for_prompt(contrato["texto"])
+            if self.config.contract_strip_boilerplate:
+                texto, audit = strip_page_boilerplate(
+                    texto,
+                    edge_lines=self.config.contract_boilerplate_edge_lines,
+                    min_page_ratio=self.config.contract_boilerplate_min_page_ratio,
+                )
+                stats = dict(stats, chars_after=len(texto), tokens_after=estimate_tokens(texto), boilerplate=audit)
+                if audit["lines_removed"]:
+                    self.logger.event("contract.boilerplate", hash=contrato["hash"], **audit)
+            self.logger.event("contract.normalized", hash=contrato["hash"],
+                              ms=round((time.perf_counter() - start) * 1000, 2),
+                              **{k: v for k, v in stats.items() if k != "boilerplate"})
+            prepared = (texto, stats)
+            self.cache.put(key, prepared, size=len(texto.encode("utf-8")))
+        
+        contrato["texto"] = prepared[0]
+        contrato["normalizacion"] = dict(prepared[1])
+    
+    def _from_text(self, texto: str, origen: str) -> Dict[str, Any]:
+        normalizado = normalize_contract(texto)
+        sha256 = contract_hash(normalizado)
+        if self.cache.get(sha256) is not None:
+            return {"texto": normalizado, "hash": sha256, "origen": origen, "cache": "memoria"}
+        
+        self.cache.put(sha256, normalizado)
+        try:
+            self.store.put(sha256, normalizado, origen)
+        except Exception as e:
+            # Sin almacén el request sigue; solo no se podrá referenciar por hash
+            self.logger.event("contract.store_error", hash=sha256, error=str(e))
+        return {"texto": normalizado, "hash": sha256, "origen": origen, "cache": "sin_cache"}
+    
+    def _from_hash(self, sha256: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, str]]]:
+        texto = self.cache.get(sha256)
+        if texto is not None:
+            return {"texto": texto, "hash": sha256, "origen": "hash", "cache": "memoria"}, None
+        
+        try:
+            texto = self.store.get(sha256)
+        except Exception as e:
+            self.logger.event("contract.store_error", hash=sha256, error=str(e))
+            texto = None
+        if texto is None:
+            return None, {"codigo": "NOT_FOUND", "detalle": "contrato_hash not found or expired; send texto_contrato"}
+        
+        self.cache.put(sha256, texto)
+        return {"texto": texto, "hash": sha256, "origen": "hash", "cache": "almacen"}, None
+    
+    def _from_url(self, url: str, deadline) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, str]]]:
+        url_key = f"url:{url}"
+        sha256 = self.cache.get(url_key)
+        if sha256 is not None:
+            contrato, _ = self._from_hash(sha256)
+            if contrato is not None:
+                contrato["origen"] = "url"
+                self._count(url_reuses=1, bytes_avoided=len(contrato["texto"].encode("utf-8")))
+                return contrato, None
+        
+        start = time.perf_counter()
+        try:
+            data, shared = self._downloads.do(
+                url,
+                lambda: download_file(
+                    url,
+                    timeout=deadline.timeout_for(self.config.contract_fetch_timeout),
+                    max_bytes=self.config.contract_max_bytes,
+                    public_only=True,
+                    # Tope de la descarga completa: CONTRACT_FETCH_TIMEOUT o lo que quede del request
+                    max_seconds=deadline.timeout_for(self.config.contract_fetch_timeout),
+                ),
+                timeout=deadline.remaining(),
+            )
+        except BlockedAddressError as e:
+            self.logger.event("contract.url_blocked", url=url, error=str(e))
+            return None, {"codigo": "BAD_REQUEST", "detalle": f"Invalid contrato_url: {str(e)}"}
+        except Exception as e:
+            self.logger.event("contract.fetch_failed", url=url, error=str(e),
+                              ms=int((time.perf_counter() - start) * 1000))
+            return None, {"codigo": "FETCH_ERROR", "detalle": f"Could not fetch contrato_url: {str(e)}"}
+        
+        if not shared:
+            self._count(downloads=1, bytes_downloaded=len(data))
+        contrato = self._from_text(decode_contract(data), "url")
+        self.cache.put(url_key, contrato["hash"], ttl_seconds=self.config.contract_url_ttl_seconds)
+        self.logger.event("contract.fetched", url=url, hash=contrato["hash"], bytes=len(data), shared=shared,
+                          ms=int((time.perf_counter() - start) * 1000))
+        return contrato, None
+
+
+_SHARED_RESOLVER: Optional[ContractResolver] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_contract_resolver(config, logger) -> ContractResolver:
+    """Resolver de contratos compartido por el contenedor (cache en memoria + almacén)"""
+    global _SHARED_RESOLVER
+    if _SHARED_RESOLVER is None:
+        with _SHARED_LOCK:
+            if _SHARED_RESOLVER is None:
+                _SHARED_RESOLVER = ContractResolver(
+                    config,
+                    logger,
+                    ContractStore(config.contract_store_path, config.contract_ttl_seconds),
+                    ContractCache(config.contract_cache_entries, config.contract_cache_max_bytes,
+                                  config.contract_ttl_seconds),
+                )
+    return _SHARED_RESOLVER
+
+
+def get_contract_stats() -> Dict[str, int]:
+    """Contadores del resolver compartido (vacío si aún no se creó)"""
+    return _SHARED_RESOLVER.stats() if _SHARED_RESOLVER is not None else {}
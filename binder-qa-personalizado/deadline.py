@@ -0,0 +1,58 @@
+import time
+from typing import Optional
+
+
+# Prefijo de los errores por presupuesto agotado (se reportan como TIMEOUT)
+TIMEOUT_PREFIX = "Deadline exceeded"
+
+
+class Deadline:
+    """
+    Presupuesto de tiempo absoluto para un request.
+    
+    Se crea una vez y cada etapa consulta el tiempo restante para derivar
+    su propio timeout, en lugar de usar timeouts fijos que sumados pueden
+    exceder el límite total.
+    """
+    
+    def __init__(self, seconds: float):
+        self.budget = max(0.0, float(seconds))
+        self._expires_at = time.monotonic() + self.budget
+    
+    def remaining(self) -> float:
+        """Segundos restantes (nunca negativo)"""
+        return max(0.0, self._expires_at - time.monotonic())
+    
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+    
+    def timeout_for(self, cap: float, reserve: float = 0.0) -> float:
+        """Timeout para una etapa: el menor entre su máximo propio y lo que queda del presupuesto"""
+        return max(0.0, min(float(cap), self.remaining() - reserve))
+    
+    def can_fit(self, seconds: float, reserve: float = 0.0) -> bool:
+        """Indica si una operación de `seconds` termina antes del deadline"""
+        return self.remaining() - reserve >= seconds
+
+
+def deadline_or_default(deadline: Optional[Deadline], seconds: float) -> Deadline:
+    """Retorna el deadline recibido o uno nuevo con el presupuesto por defecto"""
+    return deadline if deadline is not None else Deadline(seconds)
+
+
+def deadline_from_context(context, max_seconds: float, reserve: float = 0.0) -> Deadline:
+    """
+    Deadline del request a partir del tiempo restante de la invocación Lambda.
+    
+    Descuenta `reserve` para alcanzar a construir y retornar la respuesta
+    antes de que Lambda corte la ejecución, y nunca supera `max_seconds`.
+    Sin contexto Lambda (ejecución local) el presupuesto es `max_seconds`.
+    """
+    seconds = float(max_seconds)
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    if callable(get_remaining):
+        try:
+            seconds = min(seconds, get_remaining() / 1000.0 - reserve)
+        except Exception:
+            pass
+    return Deadline(seconds)
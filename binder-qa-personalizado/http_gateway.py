@@ -1,7 +1,12 @@
-from typing import Any, Dict, Tuple, Optional
+from typing import Any, Dict, Tuple, Optional, Union
+from time import perf_counter
 import json
 import base64
 
+from compression import DecompressionLimitError, accepts_gzip, gunzip_bounded, maybe_gzip, compression_stats
+from payload import JSONPayload, encode_json
+from streaming import NDJSON_CONTENT_TYPE
+
 
 _HTTP_HINT_KEYS = (
     "body",
@@ -12,30 +17,102 @@ _HTTP_HINT_KEYS = (
     "version",
 )
 
+# Invocación directa con el body comprimido: {"body_gzip": "<gzip en base64>"}
+DIRECT_GZIP_KEY = "body_gzip"
+
+_DEFAULT_MAX_DECOMPRESSED_BYTES = 10 * 1024 * 1024
+
+
+class BodyDecodeError(ValueError):
+    """Body de request que no se puede decodificar (gzip inválido o demasiado grande)"""
+    
+    def __init__(self, detalle: str, status: int = 400):
+        super().__init__(detalle)
+        self.status = status
 
-def parse_body(event: Any) -> Tuple[Dict[str, Any], bool]:
+
+def _content_encoding(headers: Any) -> str:
+    if not isinstance(headers, dict):
+        return ""
+    for key, value in headers.items():
+        if key.lower() == "content-encoding":
+            return (value or "").strip().lower()
+    return ""
+
+
+def _decode_json(raw: Union[str, bytes], gzipped: bool, max_decompressed_bytes: int,
+                 stats: Dict[str, Any]) -> Any:
+    """Descomprime (si corresponde) y parsea directo desde bytes, registrando tamaños y tiempos"""
+    start = perf_counter()
+    stats["body_encoding"] = "gzip" if gzipped else "identity"
+    stats["body_wire_bytes"] = len(raw)
+    if gzipped:
+        try:
+            raw = gunzip_bounded(raw, max_decompressed_bytes)
+        except DecompressionLimitError as e:
+            raise BodyDecodeError(str(e), status=413)
+        except ValueError as e:
+            raise BodyDecodeError(str(e))
+    stats["body_bytes"] = len(raw)
+    
+    parsed_at = perf_counter()
+    # json.loads acepta bytes UTF-8: no hace falta decodificar a str antes
+    body = json.loads(raw)
+    stats["decode_ms"] = round((parsed_at - start) * 1000, 2)
+    stats["parse_ms"] = round((perf_counter() - parsed_at) * 1000, 2)
+    return body
+
+
+def parse_body(event: Any, max_decompressed_bytes: int = _DEFAULT_MAX_DECOMPRESSED_BYTES,
+               stats: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
     """
     Parsea el cuerpo del evento Lambda.
     
     Soporta API Gateway (REST/HTTP) e invocación directa, incluyendo cuerpos
-    codificados en base64 (isBase64Encoded=true).
+    codificados en base64 (isBase64Encoded=true) y comprimidos con gzip
+    (`Content-Encoding: gzip` en HTTP, clave `body_gzip` en invocación directa).
+    
+    Args:
+        max_decompressed_bytes: Máximo del body gzip una vez descomprimido
+        stats: Dict donde se registran encoding, tamaños y tiempos de decodificación/parseo
     
     Returns:
         Tuple con (body_parsed, is_http_request)
+    
+    Raises:
+        BodyDecodeError: gzip inválido (400) o que supera el máximo descomprimido (413)
     """
+    if stats is None:
+        stats = {}
+    
     if isinstance(event, str):
-        return json.loads(event), False
+        return _decode_json(event, False, max_decompressed_bytes, stats), False
     
     if isinstance(event, dict):
         if "body" in event:
             body = event.get("body")
-            if isinstance(body, str) and event.get("isBase64Encoded"):
+            if not isinstance(body, str):
+                return (body or {}), True
+            
+            gzipped = _content_encoding(event.get("headers")) == "gzip"
+            if event.get("isBase64Encoded"):
                 try:
-                    body = base64.b64decode(body).decode("utf-8")
+                    raw = base64.b64decode(body)
                 except Exception:
                     # Si no se puede decodificar, devolvemos cuerpo vacío
-                    body = "{}"
-            return (json.loads(body) if isinstance(body, str) else (body or {})), True
+                    raw, gzipped = b"{}", False
+            elif gzipped:
+                raise BodyDecodeError("gzip request body must be base64-encoded (isBase64Encoded)")
+            else:
+                raw = body
+            return _decode_json(raw, gzipped, max_decompressed_bytes, stats), True
+        
+        if isinstance(event.get(DIRECT_GZIP_KEY), str):
+            try:
+                raw = base64.b64decode(event[DIRECT_GZIP_KEY])
+            except Exception:
+                raise BodyDecodeError(f"{DIRECT_GZIP_KEY} must be base64-encoded gzip")
+            return _decode_json(raw, True, max_decompressed_bytes, stats), False
         
         return (event or {}), any(k in event for k in _HTTP_HINT_KEYS)
     
@@ -45,19 +122,31 @@ def parse_body(event: Any) -> Tuple[Dict[str, Any], bool]:
 class Responder:
     """Unifica respuestas HTTP/directas con headers opcionales + CORS"""
     
-    def __init__(self, is_http: bool, cors_origin: str = "*"):
+    def __init__(
+        self,
+        is_http: bool,
+        cors_origin: str = "*",
+        accept_encoding: str = "",
+        compression_min_bytes: int = 1024,
+        compression_level: int = 6,
+        log=None,
+    ):
         self.is_http = is_http
         self.cors_origin = cors_origin
+        self.gzip_ok = accepts_gzip(accept_encoding)
+        self.compression_min_bytes = compression_min_bytes
+        self.compression_level = compression_level
+        self.log = log
     
     def _base_headers(self) -> Dict[str, str]:
         return {
             "Content-Type": "application/json",
             "Access-Control-Allow-Origin": self.cors_origin,
-            "Access-Control-Allow-Headers": "Content-Type, Authorization",
-            "Access-Control-Allow-Methods": "OPTIONS,POST",
+            "Access-Control-Allow-Headers": "Content-Type, Content-Encoding, Authorization, If-None-Match",
+            "Access-Control-Allow-Methods": "OPTIONS,HEAD,GET,POST",
             "Access-Control-Max-Age": "600",
-            "Access-Control-Expose-Headers": "Retry-After",
-            "Vary": "Origin",
+            "Access-Control-Expose-Headers": "Retry-After, ETag, X-Contrato-Bytes",
+            "Vary": "Origin, Accept, Accept-Encoding",
         }
     
     def preflight(self) -> Dict[str, Any]:
@@ -72,26 +161,90 @@ class Responder:
             "body": "",
         }
     
+    def ndjson_headers(self) -> Dict[str, str]:
+        """Headers de una respuesta NDJSON (sin gzip: cada línea se envía apenas está lista)"""
+        hdrs = self._base_headers()
+        hdrs["Content-Type"] = NDJSON_CONTENT_TYPE
+        hdrs["Cache-Control"] = "no-cache"
+        return hdrs
+    
+    def ndjson(self, status: int, data: bytes) -> Dict[str, Any]:
+        """Respuesta NDJSON completa (modo sin streaming)"""
+        return {
+            "statusCode": status,
+            "headers": self.ndjson_headers(),
+            "isBase64Encoded": False,
+            "body": data.decode("utf-8"),
+        }
+    
+    def not_modified(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Respuesta 304 para requests condicionales (If-None-Match)"""
+        return self.empty(304, headers)
+    
+    def empty(self, status: int, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Respuesta sin cuerpo (304, HEAD)"""
+        hdrs = self._base_headers()
+        if headers:
+            hdrs.update(headers)
+        hdrs.pop("Content-Type", None)
+        
+        if not self.is_http:
+            return {"ok": status < 400, "status": status}
+        
+        return {
+            "statusCode": status,
+            "headers": hdrs,
+            "isBase64Encoded": False,
+            "body": "",
+        }
+    
     def respond(
         self,
         status: int,
-        body: Dict[str, Any],
+        body: Any,
         headers: Optional[Dict[str, str]] = None,
     ) -> Dict[str, Any]:
-        """Genera respuesta HTTP o directa según el contexto"""
+        """
+        Genera respuesta HTTP o directa según el contexto.
+        
+        `body` puede ser un dict, un JSONPayload o bytes JSON ya serializados.
+        """
         if self.is_http:
             hdrs = self._base_headers()
             if headers:
                 hdrs.update(headers)
             
+            # Un JSONPayload reutiliza el buffer ya serializado para el webhook
+            data = encode_json(body)
+            
+            # Negociar gzip según Accept-Encoding (API Gateway exige body en base64)
+            if self.gzip_ok:
+                if isinstance(body, JSONPayload):
+                    compressed, was_compressed = body.gzip_bytes(self.compression_min_bytes, self.compression_level)
+                else:
+                    compressed, was_compressed = maybe_gzip(data, self.compression_min_bytes, self.compression_level)
+                if was_compressed:
+                    hdrs["Content-Encoding"] = "gzip"
+                    if self.log:
+                        self.log.event("http.response_compressed", **compression_stats(len(data), len(compressed)))
+                    
+                    return {
+                        "statusCode": status,
+                        "headers": hdrs,
+                        "isBase64Encoded": True,
+                        "body": base64.b64encode(compressed).decode("ascii"),
+                    }
+            
             return {
                 "statusCode": status,
                 "headers": hdrs,
                 "isBase64Encoded": False,
-                "body": json.dumps(body, ensure_ascii=False),
+                "body": data.decode("utf-8"),
             }
         
         # Respuesta directa (no HTTP)
+        if isinstance(body, bytes):
+            body = json.loads(body)
         if status < 400:
             return body
         else:
@@ -0,0 +1,326 @@
+import socket
+import ssl
+import threading
+import time
+from dataclasses import dataclass, field
+from http.client import HTTPConnection, HTTPSConnection, RemoteDisconnected
+from typing import Dict, Any, Optional, Tuple, List
+from urllib.parse import urlparse
+
+
+# Errores que indican que una conexión keep-alive reutilizada fue cerrada por el servidor
+_STALE_CONNECTION_ERRORS = (RemoteDisconnected, BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
+_SSL_CONTEXT: Optional[ssl.SSLContext] = None
+_SSL_LOCK = threading.Lock()
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """Retorna un SSLContext compartido (cargar los certificados CA es costoso)"""
+    global _SSL_CONTEXT
+    if _SSL_CONTEXT is None:
+        with _SSL_LOCK:
+            if _SSL_CONTEXT is None:
+                _SSL_CONTEXT = ssl.create_default_context()
+    return _SSL_CONTEXT
+
+
+class PoolTimeout(Exception):
+    """No se obtuvo un slot de envío para el host dentro del timeout"""
+
+
+@dataclass
+class PooledResponse:
+    """Respuesta HTTP leída por completo, con tiempos por fase en milisegundos"""
+    status: int
+    reason: str
+    headers: Dict[str, str]
+    body: bytes
+    reused: bool = False
+    timings: Dict[str, int] = field(default_factory=dict)
+
+
+class DNSCache:
+    """Cache de resolución DNS con TTL"""
+    
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[Tuple[Any, ...]]]] = {}
+        self._lock = threading.Lock()
+    
+    def resolve(self, host: str, port: int) -> List[Tuple[Any, ...]]:
+        """Resuelve host:port usando la cache si la entrada no expiró"""
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, infos)
+        return infos
+    
+    def invalidate(self, host: str, port: int) -> None:
+        """Descarta la entrada (p.ej. tras un fallo de conexión)"""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+def _open_socket(dns: DNSCache, host: str, port: int, timeout: float) -> socket.socket:
+    """Abre un socket TCP probando cada dirección resuelta"""
+    last_error: Optional[Exception] = None
+    for family, socktype, proto, _, sockaddr in dns.resolve(host, port):
+        sock = None
+        try:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            last_error = e
+            if sock is not None:
+                sock.close()
+    
+    dns.invalidate(host, port)
+    raise last_error or OSError(f"Could not resolve {host}")
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """HTTPConnection que usa la cache DNS y mide el tiempo de conexión"""
+    
+    def __init__(self, host: str, port: int, timeout: float, dns: DNSCache):
+        super().__init__(host, port, timeout=timeout)
+        self._dns = dns
+        self.connect_ms = 0
+        self.tls_ms = 0
+    
+    def connect(self):
+        t0 = time.perf_counter()
+        self.sock = _open_socket(self._dns, self.host, self.port, self.timeout)
+        self.connect_ms = int((time.perf_counter() - t0) * 1000)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """HTTPSConnection que separa el tiempo de TCP connect del handshake TLS"""
+    
+    def __init__(self, host: str, port: int, timeout: float, dns: DNSCache, context: ssl.SSLContext):
+        super().__init__(host, port, timeout=timeout, context=context)
+        self._dns = dns
+        self._ssl_context = context
+        self.connect_ms = 0
+        self.tls_ms = 0
+    
+    def connect(self):
+        t0 = time.perf_counter()
+        raw = _open_socket(self._dns, self.host, self.port, self.timeout)
+        t1 = time.perf_counter()
+        try:
+            self.sock = self._ssl_context.wrap_socket(raw, server_hostname=self.host)
+        except Exception:
+            raw.close()
+            raise
+        t2 = time.perf_counter()
+        self.connect_ms = int((t1 - t0) * 1000)
+        self.tls_ms = int((t2 - t1) * 1000)
+
+
+class _HostPool:
+    """Conexiones keep-alive ociosas y límite de envíos concurrentes para un host"""
+    
+    def __init__(self, max_idle: int, max_concurrent: int):
+        self.max_idle = max_idle
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.idle: List[Tuple[float, HTTPConnection]] = []
+        self.lock = threading.Lock()
+
+
+class PooledHTTPTransport:
+    """
+    Transporte HTTP con pool de conexiones keep-alive por host.
+    
+    Reutiliza conexiones entre envíos al mismo host, comparte un único
+    SSLContext, cachea la resolución DNS con TTL y limita los envíos
+    concurrentes por host.
+    """
+    
+    def __init__(
+        self,
+        max_idle_per_host: int = 4,
+        max_concurrent_per_host: int = 8,
+        dns_ttl: float = 60.0,
+        idle_timeout: float = 30.0,
+    ):
+        self.max_idle_per_host = max_idle_per_host
+        self.max_concurrent_per_host = max_concurrent_per_host
+        self.idle_timeout = idle_timeout
+        self.dns = DNSCache(ttl=dns_ttl)
+        self._pools: Dict[Tuple[str, str, int], _HostPool] = {}
+        self._lock = threading.Lock()
+        self.closed = False
+    
+    def _pool_for(self, key: Tuple[str, str, int]) -> _HostPool:
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _HostPool(self.max_idle_per_host, self.max_concurrent_per_host)
+                self._pools[key] = pool
+            return pool
+    
+    def _new_connection(self, key: Tuple[str, str, int], timeout: float) -> HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            return _TimedHTTPSConnection(host, port, timeout, self.dns, get_ssl_context())
+        return _TimedHTTPConnection(host, port, timeout, self.dns)
+    
+    def _checkout(self, pool: _HostPool) -> Optional[HTTPConnection]:
+        """Toma la conexión ociosa más reciente que no haya expirado"""
+        now = time.monotonic()
+        with pool.lock:
+            while pool.idle:
+                last_used, conn = pool.idle.pop()
+                if now - last_used < self.idle_timeout and conn.sock is not None:
+                    return conn
+                conn.close()
+        return None
+    
+    def _checkin(self, pool: _HostPool, conn: HTTPConnection) -> None:
+        with pool.lock:
+            if len(pool.idle) < pool.max_idle:
+                pool.idle.append((time.monotonic(), conn))
+                return
+        conn.close()
+    
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30.0,
+    ) -> PooledResponse:
+        """
+        Envía un request y lee la respuesta completa.
+        
+        Raises:
+            PoolTimeout: Si el host ya tiene el máximo de envíos en curso
+            socket.timeout / OSError / http.client.HTTPException: errores de red
+            RuntimeError: Si el transporte ya se cerró
+        """
+        if self.closed:
+            raise RuntimeError("HTTP transport is closed")
+        parsed = urlparse(url)
+        scheme = (parsed.scheme or "http").lower()
+        host = parsed.hostname or ""
+        port = parsed.port or (443 if scheme == "https" else 80)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        
+        key = (scheme, host, port)
+        pool = self._pool_for(key)
+        
+        t_wait = time.perf_counter()
+        if not pool.slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No delivery slot available for {host}:{port}")
+        wait_ms = int((time.perf_counter() - t_wait) * 1000)
+        
+        try:
+            conn = self._checkout(pool)
+            reused = conn is not None
+            try:
+                return self._send(pool, key, conn, method, path, body, headers, timeout, wait_ms)
+            except _STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # El servidor cerró la conexión keep-alive: reintentar una vez con conexión nueva
+                return self._send(pool, key, None, method, path, body, headers, timeout, wait_ms)
+        finally:
+            pool.slots.release()
+    
+    def _send(self, pool, key, conn, method, path, body, headers, timeout, wait_ms) -> PooledResponse:
+        reused = conn is not None
+        if conn is None:
+            conn = self._new_connection(key, timeout)
+        else:
+            conn.timeout = timeout
+            conn.sock.settimeout(timeout)
+            conn.connect_ms = 0
+            conn.tls_ms = 0
+        
+        try:
+            if conn.sock is None:
+                conn.connect()
+            
+            t_send = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            t_headers = time.perf_counter()
+            data = resp.read()
+            t_done = time.perf_counter()
+        except Exception:
+            conn.close()
+            raise
+        
+        result = PooledResponse(
+            status=resp.status,
+            reason=resp.reason,
+            headers={k: v for k, v in resp.getheaders()},
+            body=data,
+            reused=reused,
+            timings={
+                "wait_ms": wait_ms,
+                "connect_ms": conn.connect_ms,
+                "tls_ms": conn.tls_ms,
+                "response_ms": int((t_headers - t_send) * 1000),
+                "read_ms": int((t_done - t_headers) * 1000),
+            },
+        )
+        
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(pool, conn)
+        
+        return result
+    
+    def close(self) -> None:
+        """Cierra todas las conexiones ociosas; el transporte deja de aceptar envíos"""
+        with self._lock:
+            self.closed = True
+            pools = list(self._pools.values())
+        for pool in pools:
+            with pool.lock:
+                idle, pool.idle = pool.idle, []
+            for _, conn in idle:
+                conn.close()
+
+
+_SHARED_TRANSPORT: Optional[PooledHTTPTransport] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_shared_transport(config=None) -> PooledHTTPTransport:
+    """
+    Retorna el transporte compartido por el contenedor.
+    
+    Se crea una sola vez; en invocaciones warm de Lambda las conexiones
+    keep-alive y la cache DNS se reutilizan. Si el transporte compartido se
+    cerró se crea uno nuevo.
+    """
+    global _SHARED_TRANSPORT
+    if _SHARED_TRANSPORT is None or _SHARED_TRANSPORT.closed:
+        with _SHARED_LOCK:
+            if _SHARED_TRANSPORT is None or _SHARED_TRANSPORT.closed:
+                if config is not None:
+                    _SHARED_TRANSPORT = PooledHTTPTransport(
+                        max_idle_per_host=config.webhook_pool_max_idle,
+                        max_concurrent_per_host=config.webhook_max_concurrent_per_host,
+                        dns_ttl=config.dns_cache_ttl,
+                        idle_timeout=config.webhook_keepalive_idle,
+                    )
+                else:
+                    _SHARED_TRANSPORT = PooledHTTPTransport()
+    return _SHARED_TRANSPORT
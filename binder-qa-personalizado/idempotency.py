@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+# Resultado de IdempotencyStore.begin
+CLAIMED = "claimed"
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+CONFLICT = "conflict"
+
+
+def request_hash(body: Dict[str, Any]) -> str:
+    """SHA-256 del body en forma canónica (independiente del orden de las claves)"""
+    canonical = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Registro de requests por reference_id para no repetir análisis.
+    
+    Cada reference_id se asocia al hash de su body. El primer request lo
+    reclama (estado "procesando"); los duplicados reciben el resultado
+    guardado, o el aviso de que sigue en curso, y un body distinto con el
+    mismo reference_id es un conflicto. Los resultados expiran tras
+    `ttl_seconds`; un reclamo en curso expira tras `lease_seconds` para que
+    un intento que murió sin liberar no bloquee los reintentos.
+    """
+    
+    # Intervalo mínimo entre barridos de expirados
+    EVICT_INTERVAL = 60.0
+    
+    def __init__(self, path: str, ttl_seconds: float, lease_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS requests ("
+                " reference_id TEXT PRIMARY KEY, body_hash TEXT, estado TEXT, result BLOB,"
+                " created_at REAL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS requests_expires ON requests (expires_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+    
+    def begin(self, reference_id: str, body_hash: str) -> Tuple[str, Optional[bytes]]:
+        """
+        Reclama el reference_id o informa el estado del intento previo.
+        
+        Returns:
+            Tuple con (CLAIMED | IN_PROGRESS | COMPLETED | CONFLICT, resultado
+            guardado si es COMPLETED)
+        """
+        self._maybe_evict()
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            # BEGIN IMMEDIATE: leer y reclamar es atómico también entre procesos
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT body_hash, estado, result, expires_at FROM requests WHERE reference_id = ?",
+                    (reference_id,),
+                ).fetchone()
+                
+                if row is None or row[3] <= now:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO requests (reference_id, body_hash, estado, result, created_at, expires_at)"
+                        " VALUES (?, ?, 'procesando', NULL, ?, ?)",
+                        (reference_id, body_hash, now, now + self.lease_seconds),
+                    )
+                    return CLAIMED, None
+                
+                if row[0] != body_hash:
+                    return CONFLICT, None
+                if row[1] == "completado":
+                    return COMPLETED, bytes(row[2])
+                return IN_PROGRESS, None
+            finally:
+                conn.execute("COMMIT")
+    
+    def complete(self, reference_id: str, result: bytes) -> None:
+        """Guarda el resultado del intento que reclamó el reference_id"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE requests SET estado = 'completado', result = ?, expires_at = ? WHERE reference_id = ?",
+                (sqlite3.Binary(result), now + self.ttl_seconds, reference_id),
+            )
+    
+    def release(self, reference_id: str) -> None:
+        """Libera un reclamo sin resultado (el próximo reintento vuelve a procesar)"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM requests WHERE reference_id = ? AND estado = 'procesando'", (reference_id,))
+    
+    def evict_expired(self) -> int:
+        """Elimina los registros expirados y retorna cuántos se borraron"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute("DELETE FROM requests WHERE expires_at <= ?", (time.time(),))
+            self._last_evict = time.monotonic()
+            return cursor.rowcount
+    
+    def _maybe_evict(self) -> None:
+        if time.monotonic() - self._last_evict >= self.EVICT_INTERVAL:
+            self.evict_expired()
+
+
+_SHARED_STORE: Optional[IdempotencyStore] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_idempotency_store(config) -> IdempotencyStore:
+    """Registro de idempotencia compartido por el contenedor"""
+    global _SHARED_STORE
+    if _SHARED_STORE is None:
+        with _SHARED_LOCK:
+            if _SHARED_STORE is None:
+                _SHARED_STORE = IdempotencyStore(
+                    config.idempotency_store_path,
+                    config.idempotency_ttl_seconds,
+                    # Un intento no puede durar más que el presupuesto total del request
+                    lease_seconds=config.max_total_timeout + config.deadline_reserve_seconds,
+                )
+    return _SHARED_STORE
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+PENDING = "pendiente"
+RUNNING = "procesando"
+DONE = "completado"
+FAILED = "fallido"
+
+_FINISHED = (DONE, FAILED)
+
+
+class SQLiteJobBackend:
+    """Backend de jobs en un archivo SQLite"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (reference_id TEXT PRIMARY KEY, record TEXT,"
+                " finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0)
+    
+    def load(self, reference_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT record FROM jobs WHERE reference_id = ?", (reference_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def save(self, record: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (reference_id, record, finished_at) VALUES (?, ?, ?)",
+                (record["reference_id"], json.dumps(record, ensure_ascii=False), record.get("finished_at")),
+            )
+    
+    def insert(self, record: Dict[str, Any]) -> bool:
+        """Guarda el registro solo si no existe otro con ese reference_id"""
+        with self._connect() as conn:
+            return conn.execute(
+                "INSERT OR IGNORE INTO jobs (reference_id, record, finished_at) VALUES (?, ?, ?)",
+                (record["reference_id"], json.dumps(record, ensure_ascii=False), record.get("finished_at")),
+            ).rowcount == 1
+    
+    def delete(self, reference_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE reference_id = ?", (reference_id,))
+    
+    def purge_finished_before(self, cutoff: float) -> int:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at <= ?",
+                                (cutoff,)).rowcount
+
+
+class FileJobBackend:
+    """Backend de jobs con un archivo JSON por job (escritura atómica)"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, reference_id: str) -> str:
+        # reference_id lo define el cliente: no usarlo directamente como nombre de archivo
+        name = hashlib.sha256(reference_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.json")
+    
+    def load(self, reference_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(reference_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def save(self, record: Dict[str, Any]) -> None:
+        path = self._path(record["reference_id"])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def insert(self, record: Dict[str, Any]) -> bool:
+        """Guarda el registro solo si no existe otro con ese reference_id"""
+        path = self._path(record["reference_id"])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        try:
+            # link() falla si el destino existe: creación exclusiva y atómica
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+    
+    def delete(self, reference_id: str) -> None:
+        try:
+            os.remove(self._path(reference_id))
+        except FileNotFoundError:
+            pass
+    
+    def purge_finished_before(self, cutoff: float) -> int:
+        purged = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    finished_at = json.load(f).get("finished_at")
+                if finished_at is not None and finished_at <= cutoff:
+                    os.remove(path)
+                    purged += 1
+            except (OSError, json.JSONDecodeError):
+                continue
+        return purged
+
+
+class JobStore:
+    """
+    Registro de jobs asíncronos por reference_id.
+    
+    Guarda el request original (para que el worker pueda re-leerlo), el
+    estado, el progreso (preguntas respondidas sobre el total) y el
+    resultado serializado. Cada cambio incrementa `version`, que se usa
+    como ETag del endpoint de polling. Los jobs terminados expiran tras
+    `ttl_seconds`.
+    
+    En Lambda los backends locales viven en /tmp del contenedor; para que
+    el worker self-invocado y el polling vean el mismo registro,
+    JOB_STORE_PATH debe apuntar a almacenamiento compartido (p.ej. EFS).
+    """
+    
+    # Intervalo mínimo entre barridos de expirados
+    EVICT_INTERVAL = 60.0
+    
+    def __init__(self, backend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+    
+    def create(self, reference_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra un job pendiente (reemplaza uno previo con el mismo reference_id)"""
+        self._maybe_evict()
+        record = self._new_record(reference_id, request)
+        with self._lock:
+            self.backend.save(record)
+        return self._public(record)
+    
+    def create_if_absent(self, reference_id: str, request: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Registra un job pendiente salvo que ya exista uno vigente con ese reference_id.
+        
+        La inserción es atómica en el backend, así que de dos submits
+        concurrentes solo uno crea el job. Un job fallido o expirado se
+        reemplaza para que el cliente pueda reintentar.
+        
+        Returns:
+            (job, creado): el job nuevo o el existente, y si se creó
+        """
+        self._maybe_evict()
+        record = self._new_record(reference_id, request)
+        with self._lock:
+            if self.backend.insert(record):
+                return self._public(record), True
+            existing = self.backend.load(reference_id)
+            if existing is not None and existing.get("estado") != FAILED and not self._expired(existing):
+                return self._public(existing), False
+            self.backend.save(record)
+        return self._public(record), True
+    
+    def _new_record(self, reference_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "reference_id": reference_id,
+            "estado": PENDING,
+            "version": 1,
+            "request": request,
+            "total_preguntas": len(((request.get("qa") or {}).get("preguntas")) or []),
+            "respondidas": 0,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+    
+    def get(self, reference_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Estado del job (sin el request original), o None si no existe o expiró.
+        
+        `result` es el JSON del resultado final como string.
+        """
+        with self._lock:
+            record = self.backend.load(reference_id)
+            if record is None:
+                return None
+            if self._expired(record):
+                self.backend.delete(reference_id)
+                return None
+        return self._public(record)
+    
+    def get_request(self, reference_id: str) -> Optional[Dict[str, Any]]:
+        """Request original del job"""
+        with self._lock:
+            record = self.backend.load(reference_id)
+        return record.get("request") if record else None
+    
+    def mark_running(self, reference_id: str) -> None:
+        self._update(reference_id, estado=RUNNING)
+    
+    def mark_pending(self, reference_id: str) -> None:
+        """Devuelve el job a pendiente (se reintentará)"""
+        self._update(reference_id, estado=PENDING)
+    
+    def set_progress(self, reference_id: str, respondidas: int) -> None:
+        self._update(reference_id, respondidas=respondidas)
+    
+    def complete(self, reference_id: str, result: bytes, success: bool, respondidas: Optional[int] = None) -> None:
+        """Guarda el resultado final (completado si success, fallido si no)"""
+        fields = {"estado": DONE if success else FAILED, "result": result.decode("utf-8"), "finished_at": time.time()}
+        if respondidas is not None:
+            fields["respondidas"] = respondidas
+        self._update(reference_id, **fields)
+    
+    def fail(self, reference_id: str, error: str) -> None:
+        self._update(reference_id, estado=FAILED, error=error, finished_at=time.time())
+    
+    def evict_expired(self) -> int:
+        """Elimina los jobs terminados hace más de ttl_seconds"""
+        with self._lock:
+            self._last_evict = time.monotonic()
+            return self.backend.purge_finished_before(time.time() - self.ttl_seconds)
+    
+    def _update(self, reference_id: str, **fields: Any) -> None:
+        with self._lock:
+            record = self.backend.load(reference_id)
+            if record is None:
+                return
+            record.update(fields)
+            record["version"] = record.get("version", 0) + 1
+            record["updated_at"] = time.time()
+            self.backend.save(record)
+    
+    def _expired(self, record: Dict[str, Any]) -> bool:
+        finished_at = record.get("finished_at")
+        return finished_at is not None and finished_at + self.ttl_seconds <= time.time()
+    
+    def _maybe_evict(self) -> None:
+        if time.monotonic() - self._last_evict >= self.EVICT_INTERVAL:
+            self.evict_expired()
+    
+    def _public(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in record.items() if key != "request"}
+
+
+def make_job_backend(kind: str, path: str):
+    """Crea el backend configurado: "sqlite" (archivo) o "file" (directorio con un JSON por job)"""
+    if kind == "file":
+        return FileJobBackend(path)
+    if kind == "sqlite":
+        return SQLiteJobBackend(path)
+    raise ValueError(f"Unknown job store backend: {kind}")
+
+
+_SHARED_STORE: Optional[JobStore] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_job_store(config) -> JobStore:
+    """Job store compartido por el contenedor"""
+    global _SHARED_STORE
+    if _SHARED_STORE is None:
+        with _SHARED_LOCK:
+            if _SHARED_STORE is None:
+                backend = make_job_backend(config.job_store_backend, config.job_store_path)
+                _SHARED_STORE = JobStore(backend, config.job_ttl_seconds)
+    return _SHARED_STORE
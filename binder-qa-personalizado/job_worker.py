@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Worker local de jobs asíncronos (modo offline, sin auto-invocación de Lambda)
+
+Uso:
+    python job_worker.py <reference_id>
+"""
+
+import os
+import sys
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import default_config
+from app_logging import get_app_logger
+from job_store import get_job_store
+from qa_service.controller import QAController
+from qa_service.job_runner import JobInProgressError, JobRunner
+
+
+def main():
+    """Función principal"""
+    if len(sys.argv) < 2:
+        print("Uso: python job_worker.py <reference_id>")
+        sys.exit(1)
+    
+    config = default_config()
+    logger = get_app_logger(json_logs=True, level=config.log_level)
+    store = get_job_store(config)
+    runner = JobRunner(QAController(config, logger), store, config, logger)
+    try:
+        result = runner.run(sys.argv[1])
+    except JobInProgressError as e:
+        # Sin reintento automático fuera de Lambda: el cliente puede reenviar el job
+        store.fail(sys.argv[1], str(e))
+        sys.exit(1)
+    sys.exit(0 if result.get("success") else 1)
+
+
+if __name__ == "__main__":
+    main()
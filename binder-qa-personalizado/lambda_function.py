@@ -3,19 +3,53 @@
 
 LOG_LEVEL = "INFO"
 
+from time import perf_counter
+_MODULE_START = perf_counter()
+
 # ===== Imports del servicio ===================================================
 from qa_service.controller import QAController
 from qa_service.validator import QAValidator
-from http_gateway import parse_body, Responder
+from http_gateway import BodyDecodeError, parse_body, Responder
+from streaming import NDJSONResponse, accepts_ndjson
+from routes import route_get, route_head, route_post
+from job_store import get_job_store
+from qa_service.job_runner import JobRunner, JOB_EVENT_KEY, is_async_job_request
+from qa_service.queue_handler import QueueBatchProcessor, is_queue_event
 from config import default_config
+from deadline import deadline_from_context
 from app_logging import get_app_logger
 from aws_clients import make_boto_clients, is_aws_environment
-from time import perf_counter
+from resources import ResourceRegistry
+from http_pool import get_shared_transport
+from call_llm.api import get_qa_service_cache_info, get_single_flight_info
+from contract_store import get_contract_stats
 
 logger = get_app_logger(json_logs=True, level=LOG_LEVEL)
 CONFIG = default_config()
 
 
+# ===== Recursos del contenedor (warm) =========================================
+def _controller_healthy(controller: QAController) -> bool:
+    """
+    El transporte HTTP del controller sigue abierto y es el compartido vigente,
+    y el batcher (si hay) entrega con el WebhookService de este controller
+    """
+    transport = controller.webhook_service.transport
+    if transport.closed or transport is not get_shared_transport(CONFIG):
+        return False
+    batcher = controller.webhook_batcher
+    return batcher is None or batcher.webhook_service is controller.webhook_service
+
+
+RESOURCES = ResourceRegistry(logger)
+RESOURCES.register("controller", lambda: QAController(CONFIG, logger), health_check=_controller_healthy)
+# Clientes AWS: el flujo QA no los usa; se construyen solo si alguien los pide
+RESOURCES.register("aws_clients", lambda: make_boto_clients(region=CONFIG.region))
+
+_IMPORT_MS = round((perf_counter() - _MODULE_START) * 1000, 2)
+_COLD_START = True
+
+
 def _get_http_method(event) -> str:
     """Extrae método HTTP del evento"""
     if not isinstance(event, dict):
@@ -43,17 +77,88 @@ def _get_http_info(event) -> dict:
     path = event.get("rawPath") or event.get("path") or event.get("resource") or ""
     headers = event.get("headers") or {}
     origin = headers.get("origin") or headers.get("Origin") or ""
-    return {"method": method, "path": path, "origin": origin}
+    accept_encoding = headers.get("accept-encoding") or headers.get("Accept-Encoding") or ""
+    accept = headers.get("accept") or headers.get("Accept") or ""
+    return {"method": method, "path": path, "origin": origin, "accept_encoding": accept_encoding, "accept": accept}
+
+
+# Status HTTP por código de error (el resto de los errores es 400)
+_ERROR_STATUS = {"TIMEOUT": 504, "CONFLICT": 409, "NOT_FOUND": 404, "FETCH_ERROR": 502}
+
+
+def _status_for(result: dict) -> int:
+    """Status HTTP de una respuesta del controller"""
+    if result.get("success", False):
+        return 202 if result.get("estado") == "procesando" else 200
+    return _ERROR_STATUS.get((result.get("error") or {}).get("codigo"), 400)
+
+
+def _continuation_submitter(controller: QAController, fn: str):
+    """Despacha las preguntas pendientes de un resultado parcial como job asíncrono"""
+    def submit(request: dict) -> dict:
+        runner = JobRunner(controller, get_job_store(CONFIG), CONFIG, logger)
+        lambda_client = RESOURCES.get("aws_clients")[1] if fn else None
+        _, accepted = runner.submit(request, lambda_client=lambda_client, function_name=fn)
+        return accepted
+    return submit
+
+
+def _log_invocation_metrics(reference_id, cold_start: bool, built: dict, request_start: float, start: float) -> None:
+    """Separa el costo de inicialización (imports + recursos construidos) del costo del request"""
+    resources_ms = round(sum(built.values()), 2)
+    logger.event(
+        "⏱️ invocation.metrics",
+        id=reference_id,
+        cold_start=cold_start,
+        import_ms=_IMPORT_MS if cold_start else 0,
+        init_ms=round((_IMPORT_MS if cold_start else 0) + resources_ms, 2),
+        resources_built=built,
+        request_ms=round((perf_counter() - request_start) * 1000, 2),
+        total_ms=round((perf_counter() - start) * 1000, 2),
+        openai_service=get_qa_service_cache_info(),
+        single_flight=get_single_flight_info(),
+        contracts=get_contract_stats(),
+    )
 
 
 # ===== Handler ===============================================================
 def lambda_handler(event, context):
     """Handler principal de Lambda para QA personalizado"""
+    global _COLD_START
     start = perf_counter()
+    cold_start, _COLD_START = _COLD_START, False
+    # Presupuesto del request: lo que le queda a la invocación menos un margen para responder
+    deadline = deadline_from_context(context, CONFIG.max_total_timeout, reserve=CONFIG.deadline_reserve_seconds)
     
-    # Parsear evento
-    body, is_http = parse_body(event)
+    # Lote de una cola SQS: cada mensaje es un body de invocación directa
+    if is_queue_event(event):
+        logger.event("🚀 queue.start", fn=_get_function_name_from_ctx(context), records=len(event["Records"]))
+        RESOURCES.check_health()
+        controller = RESOURCES.get("controller")
+        built = RESOURCES.take_build_metrics()
+        request_start = perf_counter()
+        result = QueueBatchProcessor(controller, CONFIG, logger).process(event, deadline)
+        _log_invocation_metrics(None, cold_start, built, request_start, start)
+        return result
+    
+    # Parsear evento (gzip se descomprime con límite de tamaño)
+    body_stats = {}
+    try:
+        body, is_http = parse_body(event, max_decompressed_bytes=CONFIG.request_max_decompressed_bytes,
+                                   stats=body_stats)
+    except BodyDecodeError as e:
+        logger.event("❌ qa.bad_body", fn=_get_function_name_from_ctx(context), status=e.status, error=str(e),
+                     **body_stats)
+        responder = Responder(is_http=isinstance(event, dict) and "body" in event, cors_origin=CONFIG.allowed_origin)
+        return responder.respond(e.status, {
+            "success": False,
+            "reference_id": None,
+            "error": {"codigo": "BAD_REQUEST", "detalle": str(e)},
+        })
     reference_id = body.get("reference_id") if isinstance(body, dict) else None
+    job_event = body.get(JOB_EVENT_KEY) if isinstance(body, dict) and not is_http else None
+    if job_event:
+        reference_id = job_event.get("reference_id")
     fn = _get_function_name_from_ctx(context)
     http = _get_http_info(event) if is_http else {}
     mode = "HTTP" if is_http else "DIRECT"
@@ -65,10 +170,18 @@ def lambda_handler(event, context):
         fn=fn,
         mode=mode,
         **({"method": http.get("method"), "path": http.get("path"), "origin": http.get("origin")} if http else {}),
+        **body_stats,
     )
     
     # Configurar responder
-    responder = Responder(is_http=is_http, cors_origin=CONFIG.allowed_origin)
+    responder = Responder(
+        is_http=is_http,
+        cors_origin=CONFIG.allowed_origin,
+        accept_encoding=http.get("accept_encoding", "") if http else "",
+        compression_min_bytes=CONFIG.compression_min_bytes,
+        compression_level=CONFIG.compression_level,
+        log=logger,
+    )
     
     # Preflight CORS
     method = _get_http_method(event)
@@ -83,21 +196,66 @@ def lambda_handler(event, context):
         )
         return responder.preflight()
     
-    # Configurar clientes AWS (solo para logging)
-    cloudwatch_client, lambda_client = make_boto_clients(region=CONFIG.region)
+    # Rutas de lectura (p.ej. GET /results/{id} de webhooks claim-check)
+    if is_http and method.upper() == "GET":
+        routed = route_get(http.get("path", ""), responder, CONFIG, logger, headers=event.get("headers"))
+        if routed is not None:
+            return routed
     
-    # Crear controller
-    controller = QAController(CONFIG, logger)
+    # HEAD /contracts/{sha256} y POST /contracts/check (carga en dos fases)
+    if is_http and method.upper() == "HEAD":
+        routed = route_head(http.get("path", ""), responder, CONFIG, logger)
+        return routed if routed is not None else responder.empty(404)
+    if is_http and method.upper() == "POST":
+        routed = route_post(http.get("path", ""), body, responder, CONFIG, logger)
+        if routed is not None:
+            return routed
+    
+    # Reutilizar recursos del contenedor (se reconstruyen si su health check falla)
+    RESOURCES.check_health()
+    controller = RESOURCES.get("controller")
+    built = RESOURCES.take_build_metrics()
+    request_start = perf_counter()
+    
+    # Worker de un job asíncrono (auto-invocación con InvocationType=Event)
+    if job_event:
+        runner = JobRunner(controller, get_job_store(CONFIG), CONFIG, logger)
+        result = runner.run(reference_id, job_event.get("request"), deadline=deadline)
+        _log_invocation_metrics(reference_id, cold_start, built, request_start, start)
+        return result
+    
+    # Modo job: validar, registrar y responder 202 sin esperar al modelo
+    if is_async_job_request(body):
+        runner = JobRunner(controller, get_job_store(CONFIG), CONFIG, logger)
+        lambda_client = RESOURCES.get("aws_clients")[1] if fn else None
+        status_code, accepted = runner.submit(body, lambda_client=lambda_client, function_name=fn)
+        _log_invocation_metrics(reference_id, cold_start, built, request_start, start)
+        headers = {"Retry-After": str(CONFIG.job_retry_after)} if status_code in (202, 503) else None
+        return responder.respond(status_code, accepted, headers=headers)
+    
+    # Accept: application/x-ndjson -> una línea por respuesta; se escribe al cliente
+    # a medida que llegan si el runtime entrega un response stream (modo servidor)
+    ndjson = None
+    if is_http and accepts_ndjson(http.get("accept", "")):
+        ndjson = NDJSONResponse(responder, stream=getattr(context, "response_stream", None),
+                                reference_id=reference_id, start=start, log=logger)
     
     try:
         # Procesar request
-        result = controller.handle_request(body)
+        result = controller.handle_request(
+            body,
+            deadline=deadline,
+            continue_pending=_continuation_submitter(controller, fn),
+            # Sin stream las líneas salen juntas al final: generar por shards solo
+            # multiplicaría los tokens del contrato sin adelantar el primer byte
+            on_answers=ndjson.answers if ndjson is not None and ndjson.stream is not None else None,
+        )
         
         # Calcular duración
         duration_ms = int((perf_counter() - start) * 1000)
         
         # Determinar status code
-        status_code = 200 if result.get("success", False) else 400
+        status_code = _status_for(result)
         
         # Log resultado
         logger.event(
@@ -108,14 +266,26 @@ def lambda_handler(event, context):
             success=result.get("success", False),
             ms=duration_ms,
             preguntas_count=len(result.get("qa_resultados", [])),
+            budget_left_s=round(deadline.remaining(), 2),
         )
         
-        # Retornar respuesta
-        return responder.respond(status_code, result)
+        # Entregar lotes de webhook pendientes antes de que Lambda congele el contenedor
+        if controller.webhook_batcher is not None:
+            controller.webhook_batcher.flush_all(deadline)
+        
+        _log_invocation_metrics(reference_id, cold_start, built, request_start, start)
+        
+        # Retornar respuesta (un duplicado aún en curso responde 202 con Retry-After)
+        if ndjson is not None:
+            return ndjson.finish(result, status_code)
+        headers = {"Retry-After": str(CONFIG.job_retry_after)} if status_code == 202 else None
+        return responder.respond(status_code, result, headers=headers)
         
     except Exception as e:
-        # Manejo de errores
+        # Manejo de errores: no reutilizar un controller que pudo quedar en mal estado
         duration_ms = int((perf_counter() - start) * 1000)
+        RESOURCES.invalidate("controller", reason=type(e).__name__)
+        _log_invocation_metrics(reference_id, cold_start, built, request_start, start)
         
         logger.event(
             "❌ qa.error",
@@ -136,4 +306,6 @@ def lambda_handler(event, context):
             }
         }
         
+        if ndjson is not None:
+            return ndjson.finish(error_response, 500)
         return responder.respond(500, error_response)
@@ -0,0 +1,48 @@
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+from typing import Optional
+
+
+_LOCK = threading.Lock()
+
+
+def lazy_import(name: str) -> Optional[ModuleType]:
+    """
+    Retorna un módulo que se ejecuta recién al acceder a su primer atributo.
+    
+    Pensado para dependencias pesadas y opcionales (p.ej. boto3) que no se
+    usan en el camino principal: importarlas así no suma al cold start.
+    Si el módulo ya está cargado se retorna tal cual.
+    
+    Returns:
+        El módulo (lazy) o None si no está instalado
+    """
+    with _LOCK:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None or spec.loader is None:
+            return None
+        
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
+
+
+def is_loaded(name: str) -> bool:
+    """Indica si el módulo ya se ejecutó (no solo se registró como lazy)"""
+    module = sys.modules.get(name)
+    if module is None:
+        return False
+    # LazyLoader cambia la clase del módulo a ModuleType cuando termina de ejecutarse
+    return type(module).__name__ != "_LazyModule"
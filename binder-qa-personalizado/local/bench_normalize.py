@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de normalización de contratos: clean_text anterior (concatenación
+carácter por carácter) vs clean_text con regex precompiladas vs normalize_for_prompt
+
+Usa los contratos de contratos/ (texto OCR real) repetidos para simular
+contratos largos.
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+# Agregar directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from boilerplate import strip_page_boilerplate
+from utils import clean_text, estimate_tokens, normalize_for_prompt
+
+
+CONTRATOS_DIR = Path(__file__).parent.parent / "contratos"
+
+
+def old_clean_text(text: str) -> str:
+    """Implementación anterior de clean_text (cuadrática en el peor caso)"""
+    if not text:
+        return ""
+    cleaned = ""
+    for char in text:
+        if ord(char) >= 32 or char in '\t\n\r':
+            cleaned += char
+    cleaned = re.sub(r'\s+', ' ', cleaned)
+    return cleaned.strip()
+
+
+def load_contracts() -> dict:
+    return {
+        path.name: path.read_text(encoding="utf-8", errors="replace")
+        for path in sorted(CONTRATOS_DIR.glob("*.txt"))
+    }
+
+
+def bench(fn, text: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    
+    contracts = load_contracts()
+    if not contracts:
+        print(f"❌ No hay contratos en {CONTRATOS_DIR}")
+        return
+    
+    for name, text in contracts.items():
+        text = text * repeat
+        # Sanity: clean_text produce exactamente lo mismo que antes
+        assert clean_text(text) == old_clean_text(text)
+        
+        prompt, stats = normalize_for_prompt(text)
+        old_ms = bench(old_clean_text, text, iterations)
+        new_ms = bench(clean_text, text, iterations)
+        prompt_ms = bench(normalize_for_prompt, text, iterations)
+        stripped, audit = strip_page_boilerplate(prompt)
+        boilerplate_ms = bench(strip_page_boilerplate, prompt, iterations)
+        
+        print(f"📄 {name[:60]} ({len(text) / 1024:.1f} KB)")
+        print(f"   caracteres: {stats['chars_before']} -> {stats['chars_after']}"
+              f" ({100.0 * (1 - stats['chars_after'] / max(1, stats['chars_before'])):.1f}% menos)")
+        print(f"   tokens estimados: {stats['tokens_before']} -> {stats['tokens_after']}"
+              f" ({100.0 * (1 - stats['tokens_after'] / max(1, stats['tokens_before'])):.1f}% menos)")
+        print(f"   🐢 clean_text anterior:  {old_ms:.2f} ms")
+        print(f"   ⚡ clean_text:           {new_ms:.2f} ms"
+              + (f" ({old_ms / new_ms:.1f}x)" if new_ms > 0 else ""))
+        print(f"   ⚡ normalize_for_prompt: {prompt_ms:.2f} ms")
+        print(f"   ✂️ boilerplate: {audit['lines_removed']} líneas en {audit['pages']} páginas,"
+              f" tokens estimados {stats['tokens_after']} -> {estimate_tokens(stripped)} ({boilerplate_ms:.2f} ms)")
+        assert estimate_tokens(prompt) == stats["tokens_after"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de serialización: json.dumps por etapa vs JSONPayload (serializar una vez)
+
+Simula un request con webhook: log del payload, body del webhook en cada
+reintento y body de la respuesta HTTP.
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+# Agregar directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from payload import JSONPayload, encode_json
+
+
+def build_response(n_preguntas: int = 50) -> dict:
+    """Respuesta típica con razonamientos largos"""
+    qa_resultados = [
+        {
+            "orden": i,
+            "pregunta": f"¿Cuál es la cláusula {i} sobre penalidades y plazos de pago?",
+            "respuesta": "Sí, el contrato establece una penalidad del 5% por retraso. " * 4,
+            "razonamiento": "Según la cláusula décima, numeral 3, el arrendatario deberá... " * 40,
+        }
+        for i in range(1, n_preguntas + 1)
+    ]
+    return {
+        "success": True,
+        "reference_id": "bench-001",
+        "qa_resultados": qa_resultados,
+        "metadatos": {"modelo": "gpt-4o-mini", "latencia_ms": 1234, "modo": "sync", "webhook_disparado": False},
+    }
+
+
+def old_path(response: dict, retries: int) -> int:
+    """Una serialización por etapa: log + cada intento del webhook + respuesta HTTP"""
+    total = len(json.dumps(response, ensure_ascii=False))
+    for _ in range(retries):
+        total += len(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+    response["metadatos"]["webhook_disparado"] = True
+    total += len(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+    return total
+
+
+def new_path(response: dict, retries: int) -> int:
+    """qa_resultados se serializa una vez; solo el sobre se re-serializa"""
+    payload = JSONPayload(response)
+    data = encode_json(payload)
+    total = len(data)
+    for _ in range(retries):
+        total += len(data)
+    payload["metadatos"] = dict(payload["metadatos"], webhook_disparado=True)
+    total += len(encode_json(payload))
+    return total
+
+
+def bench(fn, iterations: int, retries: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(build_response(), retries)
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    retries = 3
+    
+    # Sanity: misma salida byte a byte
+    response = build_response()
+    payload = JSONPayload(build_response())
+    assert payload.to_bytes() == json.dumps(response, ensure_ascii=False).encode("utf-8")
+    
+    size_kb = len(payload.to_bytes()) / 1024
+    base_ms = bench(lambda r, n: None, iterations, retries)
+    old_ms = bench(old_path, iterations, retries) - base_ms
+    new_ms = bench(new_path, iterations, retries) - base_ms
+    
+    print(f"📦 Payload: {size_kb:.1f} KB, {retries} intentos de webhook, {iterations} iteraciones")
+    print(f"🐢 json.dumps por etapa: {old_ms:.2f} ms/request")
+    print(f"⚡ JSONPayload:          {new_ms:.2f} ms/request")
+    if new_ms > 0:
+        print(f"📊 Speedup: {old_ms / new_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
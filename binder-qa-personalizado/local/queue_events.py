@@ -0,0 +1,73 @@
+"""
+Eventos SQS de ejemplo para probar el handler de colas sin AWS
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+QUEUE_ARN = "arn:aws:sqs:us-east-1:123456789012:qa-personalizado"
+FIFO_QUEUE_ARN = "arn:aws:sqs:us-east-1:123456789012:qa-personalizado.fifo"
+
+CONTRATO = (
+    "CONTRATO DE ARRENDAMIENTO. El arrendador entrega al arrendatario el inmueble ubicado en "
+    "Av. Siempre Viva 742 por un plazo de 12 meses, con una renta mensual de $500.000 pagadera "
+    "los primeros cinco días de cada mes."
+)
+
+
+def qa_body(reference_id: str, preguntas: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Body de invocación directa"""
+    return {
+        "reference_id": reference_id,
+        "texto_contrato": CONTRATO,
+        "qa": {"preguntas": preguntas or ["¿Cuál es el plazo del contrato?"]},
+    }
+
+
+def sqs_record(message_id: str, body: Any, group_id: Optional[str] = None, receive_count: int = 1) -> Dict[str, Any]:
+    """Record SQS; `body` se serializa salvo que ya sea un string"""
+    attributes = {
+        "ApproximateReceiveCount": str(receive_count),
+        "SentTimestamp": "1700000000000",
+        "SenderId": "AIDAEXAMPLE",
+        "ApproximateFirstReceiveTimestamp": "1700000000001",
+    }
+    if group_id is not None:
+        attributes["MessageGroupId"] = group_id
+        attributes["SequenceNumber"] = "1"
+    return {
+        "messageId": message_id,
+        "receiptHandle": f"handle-{message_id}",
+        "body": body if isinstance(body, str) else json.dumps(body, ensure_ascii=False),
+        "attributes": attributes,
+        "messageAttributes": {},
+        "md5OfBody": "",
+        "eventSource": "aws:sqs",
+        "eventSourceARN": FIFO_QUEUE_ARN if group_id is not None else QUEUE_ARN,
+        "awsRegion": "us-east-1",
+    }
+
+
+def sqs_event(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"Records": records}
+
+
+def mixed_batch_event() -> Dict[str, Any]:
+    """Lote estándar: éxito, error transitorio del modelo, JSON inválido y request inválido"""
+    return sqs_event([
+        sqs_record("m-ok", qa_body("q-ok")),
+        sqs_record("m-model-error", qa_body("q-model-error"), receive_count=2),
+        sqs_record("m-bad-json", "{no es json"),
+        sqs_record("m-bad-request", {"reference_id": "q-bad", "qa": {}}),
+    ])
+
+
+def fifo_batch_event() -> Dict[str, Any]:
+    """Lote FIFO: en el grupo A falla el segundo mensaje; el grupo B es independiente"""
+    return sqs_event([
+        sqs_record("a-1", qa_body("q-a1"), group_id="A"),
+        sqs_record("a-2", qa_body("q-model-error-a2"), group_id="A"),
+        sqs_record("a-3", qa_body("q-a3"), group_id="A"),
+        sqs_record("b-1", qa_body("q-b1"), group_id="B"),
+    ])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Pruebas del detector de encabezados y pies de página repetidos (sin API key)
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from boilerplate import strip_page_boilerplate
+from utils import normalize_for_prompt
+
+
+CONTRATOS_DIR = Path(__file__).parent.parent / "contratos"
+FIRMA = "Este documento fue firmado electrónicamente por Juan Pérez. Código: ab12cd34"
+
+
+def _document(pages: int, body) -> str:
+    """Contrato OCR sintético: marcador, numeración, cuerpo y sello de firma por página"""
+    parts = []
+    for n in range(1, pages + 1):
+        parts.append(f"Página {n}\n{n}\n" + "\n".join(body(n)) + f"\n{FIRMA}\n--- Caracteres extraídos: {100 * n}\n")
+    return "\n".join(parts)
+
+
+def test_removes_page_boilerplate():
+    """Numeración y sello de firma se eliminan; el sello queda una sola vez"""
+    print("🧪 Probando eliminación de encabezados y pies...")
+    
+    text = _document(5, lambda n: [f"CLÁUSULA {n}: el plazo es de {n * 10} días.", f"Texto de la página {n}."])
+    cleaned, audit = strip_page_boilerplate(text)
+    
+    if cleaned.count(FIRMA) != 1 or "Caracteres extraídos" in cleaned or "\n3\n" in cleaned:
+        print(f"❌ Quedó boilerplate:\n{cleaned}")
+        return False
+    if cleaned.count("Página") != 5 or "CLÁUSULA 4: el plazo es de 40 días." not in cleaned:
+        print(f"❌ Se perdió contenido:\n{cleaned}")
+        return False
+    if audit["page_numbers_removed"] != 10 or audit["repeated_lines_removed"] != 4 or audit["pages"] != 5:
+        print(f"❌ Auditoría inesperada: {audit}")
+        return False
+    
+    print(f"✅ {audit['lines_removed']} líneas eliminadas, {audit['chars_before']} -> {audit['chars_after']} caracteres")
+    return True
+
+
+def test_keeps_repeated_clause_text():
+    """Texto repetido en el cuerpo de la página no se toca; con pocas páginas no se colapsa nada"""
+    print("\n🧪 Probando que no se pierdan cláusulas repetidas...")
+    
+    repeated = "El arrendatario pagará la penalidad establecida en la cláusula décima."
+    body = lambda n: ["Inicio de página."] * 6 + [repeated] + ["Fin de página."] * 6
+    cleaned, audit = strip_page_boilerplate(_document(5, body))
+    if cleaned.count(repeated) != 5:
+        print(f"❌ Se eliminó texto del cuerpo ({cleaned.count(repeated)}/5): {audit}")
+        return False
+    
+    cleaned, audit = strip_page_boilerplate(_document(2, lambda n: ["Texto."]))
+    if cleaned.count(FIRMA) != 2 or audit["repeated_lines_removed"] != 0:
+        print(f"❌ Con 2 páginas no debería colapsar líneas: {audit}")
+        return False
+    
+    text = "Sin marcadores de página.\n1\nOtra línea."
+    if strip_page_boilerplate(text)[0] != text:
+        print("❌ Sin marcadores el texto debe quedar igual")
+        return False
+    
+    print("✅ Cláusulas repetidas y documentos cortos se conservan")
+    return True
+
+
+def test_short_pages_keep_clauses():
+    """En páginas cortas solo cuentan las primeras/últimas 2 líneas: las cláusulas repetidas quedan"""
+    print("\n🧪 Probando páginas cortas con cláusulas repetidas...")
+    
+    clauses = ["El arrendatario pagará la renta mensual.", "Las partes se someten a la jurisdicción de Lima."]
+    body = lambda n: [f"CLÁUSULA {n}.", f"Objeto de la página {n}."] + clauses + [f"Fin de la página {n}."]
+    cleaned, audit = strip_page_boilerplate(_document(5, body))
+    for clause in clauses:
+        if cleaned.count(clause) != 5:
+            print(f"❌ Se eliminó una cláusula ({cleaned.count(clause)}/5): {audit}")
+            return False
+    if cleaned.count(FIRMA) != 1 or audit["page_numbers_removed"] != 10:
+        print(f"❌ Quedó boilerplate: {audit}")
+        return False
+    
+    print("✅ Cláusulas conservadas, sello y numeración eliminados")
+    return True
+
+
+def test_page_number_totals():
+    """"N de M" y "N/M" solo son numeración si N <= M <= páginas del documento"""
+    print("\n🧪 Probando numeración con total...")
+    
+    body = lambda n: [f"{n}/5", f"{n + 9} de 2024"] + [f"Línea {k} de la página {n}." for k in range(12)]
+    cleaned, audit = strip_page_boilerplate(_document(5, body))
+    kept = [f"{n + 9} de 2024" for n in range(1, 6) if f"{n + 9} de 2024" in cleaned.split("\n")]
+    if len(kept) != 5:
+        print(f"❌ Se eliminaron fechas \"N de YYYY\" ({len(kept)}/5 quedan): {audit}")
+        return False
+    if any(f"{n}/5" in cleaned.split("\n") for n in range(1, 6)) or audit["page_numbers_removed"] != 15:
+        print(f"❌ \"N/5\" debería eliminarse: {audit}")
+        return False
+    
+    print("✅ \"N de 2024\" se conserva y \"N/5\" se elimina")
+    return True
+
+
+def test_sample_contracts():
+    """Sobre contratos/ solo se quitan numeración, pies del extractor y sellos repetidos"""
+    print("\n🧪 Probando contratos de ejemplo...")
+    
+    for path in sorted(CONTRATOS_DIR.glob("*.txt")):
+        text, _ = normalize_for_prompt(path.read_text(encoding="utf-8", errors="replace"))
+        cleaned, audit = strip_page_boilerplate(text)
+        kept = set(cleaned.split("\n"))
+        lost = {line for line in text.split("\n") if line and line not in kept}
+        unexpected = [line for line in lost if not (
+            line.isdigit() or line.startswith("Página ") or line.startswith("--- Caracteres")
+        )]
+        if len(unexpected) > len(audit["repeated"]):
+            print(f"❌ {path.name}: líneas eliminadas inesperadas: {unexpected[:5]}")
+            return False
+        print(f"   {path.name[:50]}: {audit['lines_removed']} líneas, "
+              f"{audit['chars_before'] - audit['chars_after']} caracteres menos")
+    
+    print("✅ Contratos de ejemplo limpios")
+    return True
+
+
+def main():
+    print("🚀 Pruebas de boilerplate de página")
+    print("=" * 60)
+    
+    tests = [
+        test_removes_page_boilerplate,
+        test_keeps_repeated_clause_text,
+        test_short_pages_keep_clauses,
+        test_page_number_totals,
+        test_sample_contracts,
+    ]
+    
+    passed = 0
+    for test in tests:
+        if test():
+            passed += 1
+    
+    print("\n" + "=" * 60)
+    print(f"📊 Resultados: {passed}/{len(tests)} tests pasaron")
+    
+    if passed == len(tests):
+        print("🎉 ¡Todos los tests pasaron!")
+        return 0
+    print("⚠️ Algunos tests fallaron")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Presupuesto de cold start: costo de imports del handler en un intérprete nuevo
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from startup_profile import COLD_START_BUDGET_MS, HEAVY_MODULES, profile_imports
+
+
+def test_import_budget():
+    """Importar lambda_function cabe en COLD_START_BUDGET_MS"""
+    print("🧪 Probando presupuesto de imports...")
+    
+    try:
+        profile = profile_imports("lambda_function")
+        slowest = sorted(profile["modules"], key=lambda m: m["self_ms"], reverse=True)[:3]
+        print(f"⏱️  {profile['total_ms']:.1f} ms (presupuesto {COLD_START_BUDGET_MS:.0f} ms); más lentos: "
+              + ", ".join(f"{m['module']} {m['self_ms']:.1f}ms" for m in slowest))
+        
+        if profile["total_ms"] > COLD_START_BUDGET_MS:
+            print("❌ Cold start excede el presupuesto")
+            return False
+        
+        print("✅ Dentro del presupuesto")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error midiendo imports: {str(e)}")
+        return False
+
+
+def test_heavy_modules_are_lazy():
+    """boto3/botocore no se cargan al importar el handler"""
+    print("\n🧪 Probando imports lazy...")
+    
+    try:
+        profile = profile_imports("lambda_function")
+        if profile["heavy_loaded"]:
+            print(f"❌ Cargados al importar: {profile['heavy_loaded']}")
+            return False
+        
+        print(f"✅ Sin cargar: {', '.join(HEAVY_MODULES)}")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error verificando imports lazy: {str(e)}")
+        return False
+
+
+def main():
+    """Función principal de testing"""
+    print("🧪 Testing QA Personalizado Service - Cold start")
+    print("=" * 60)
+    
+    tests = [
+        test_import_budget,
+        test_heavy_modules_are_lazy,
+    ]
+    
+    passed = sum(1 for test in tests if test())
+    
+    print("\n" + "=" * 60)
+    print(f"📊 Resultados: {passed}/{len(tests)} tests pasaron")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Pruebas de contrato_url hacia direcciones internas (sin API key ni red)
+"""
+
+import dataclasses
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import QAConfig
+from contract_store import ContractCache, ContractResolver, ContractStore
+from deadline import Deadline
+from qa_service.validator import QAValidator
+
+
+class _Logger:
+    def event(self, name, **fields):
+        pass
+
+
+def _body(url: str) -> dict:
+    return {"reference_id": "url-test", "contrato_url": url, "qa": {"preguntas": ["¿Cuál es el plazo?"]}}
+
+
+def test_disabled_without_allowed_domains():
+    """Sin CONTRACT_URL_ALLOWED_DOMAINS contrato_url se rechaza en la validación"""
+    print("🧪 Probando contrato_url sin dominios permitidos...")
+    
+    config = dataclasses.replace(QAConfig(), contract_url_allowed_domains=())
+    result = QAValidator(config).validate_request(_body("https://example.com/contrato.txt"))
+    if result.get("valid") or result["error"]["codigo"] != "BAD_REQUEST":
+        print(f"❌ Debió rechazarse: {result}")
+        return False
+    
+    print(f"✅ {result['error']['detalle']}")
+    return True
+
+
+def test_blocks_internal_addresses():
+    """Metadata de la instancia y loopback responden BAD_REQUEST aunque el dominio esté permitido"""
+    print("\n🧪 Probando contrato_url hacia direcciones internas...")
+    
+    tmp = tempfile.mkdtemp()
+    config = dataclasses.replace(
+        QAConfig(),
+        contract_url_allowed_domains=("169.254.169.254", "localhost", "127.0.0.1"),
+        contract_store_path=f"{tmp}/contracts.sqlite3",
+    )
+    validator = QAValidator(config)
+    resolver = ContractResolver(
+        config,
+        _Logger(),
+        ContractStore(config.contract_store_path, config.contract_ttl_seconds),
+        ContractCache(config.contract_cache_entries, config.contract_cache_max_bytes, config.contract_ttl_seconds),
+    )
+    
+    for url in ("http://169.254.169.254/latest/meta-data/iam/security-credentials/",
+                "http://localhost:8080/admin", "http://127.0.0.1/contrato.txt"):
+        if not validator.validate_request(_body(url)).get("valid"):
+            print(f"❌ La validación no debería depender de la dirección: {url}")
+            return False
+        contrato, error = resolver.resolve(_body(url), Deadline(5))
+        if contrato is not None or error["codigo"] != "BAD_REQUEST":
+            print(f"❌ {url}: se esperaba BAD_REQUEST, se obtuvo {error}")
+            return False
+        print(f"   {url}: {error['detalle']}")
+    
+    print("✅ Direcciones internas rechazadas")
+    return True
+
+
+def main():
+    print("🚀 Pruebas de contrato_url")
+    print("=" * 60)
+    
+    tests = [
+        test_disabled_without_allowed_domains,
+        test_blocks_internal_addresses,
+    ]
+    
+    passed = 0
+    for test in tests:
+        if test():
+            passed += 1
+    
+    print("\n" + "=" * 60)
+    print(f"📊 Resultados: {passed}/{len(tests)} tests pasaron")
+    
+    if passed == len(tests):
+        print("🎉 ¡Todos los tests pasaron!")
+        return 0
+    print("⚠️ Algunos tests fallaron")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
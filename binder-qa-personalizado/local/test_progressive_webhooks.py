@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Pruebas del modo webhook progresivo contra un servidor sink local (sin API key)
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Agregar directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Reintentos rápidos y spool temporal para no depender del entorno
+os.environ.setdefault("WEBHOOK_BACKOFF_BASE", "0.01")
+os.environ.setdefault("WEBHOOK_BACKOFF_MAX", "0.05")
+os.environ.setdefault("WEBHOOK_MIN_ATTEMPT_TIME", "0.1")
+os.environ["WEBHOOK_DEFERRED_DIR"] = tempfile.mkdtemp(prefix="qa-progressive-")
+
+
+class Sink:
+    """Servidor HTTP local que registra los eventos recibidos por path"""
+    
+    def __init__(self, fail_first: int = 0):
+        self.events = {}
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+        sink = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with sink._lock:
+                    sink.events.setdefault(self.path, []).append(body)
+                    status = 500 if sink.fail_first > 0 else 200
+                    sink.fail_first -= 1
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _delivery(total: int, urls):
+    from config import default_config
+    from app_logging import get_app_logger
+    from qa_service.webhook_service import WebhookService
+    from qa_service.progressive import ProgressiveDelivery
+    
+    logger = get_app_logger(json_logs=True, level="WARNING")
+    service = WebhookService(default_config(), logger)
+    return ProgressiveDelivery(service, urls, "ref-progresivo", total, logger=logger)
+
+
+def _resultado(orden: int):
+    return {"pregunta_orden": orden, "pregunta": f"Pregunta {orden}", "respuesta": "Sí", "confianza": 0.9}
+
+
+def test_split_shards():
+    """Los shards cubren todas las preguntas con offsets correctos"""
+    print("🧪 Probando división en shards...")
+    
+    try:
+        from call_llm.api import split_shards
+        
+        preguntas = [f"p{i}" for i in range(23)]
+        shards = split_shards(preguntas, 10)
+        if [offset for offset, _ in shards] != [0, 10, 20] or sum(len(s) for _, s in shards) != 23:
+            print(f"❌ Shards incorrectos: {[(o, len(s)) for o, s in shards]}")
+            return False
+        
+        print("✅ 23 preguntas -> shards de 10, 10 y 3")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error en shards: {str(e)}")
+        return False
+
+
+def test_order_and_dedup():
+    """Secuencia creciente, una entrega por pregunta y completado al final"""
+    print("\n🧪 Probando orden y deduplicación...")
+    
+    sink = Sink()
+    try:
+        urls = [sink.url("/app"), sink.url("/auditoria")]
+        delivery = _delivery(4, urls)
+        
+        # El segundo shard termina primero y el tercero repite una pregunta
+        delivery.emit_answers([_resultado(4), _resultado(3)])
+        delivery.emit_answers([_resultado(1), _resultado(2)])
+        delivery.emit_answers([_resultado(3)])
+        entregas = delivery.complete(True, metadatos={"modo": "progressive"})
+        
+        for path in ("/app", "/auditoria"):
+            events = sink.events.get(path, [])
+            secuencias = [e["secuencia"] for e in events]
+            ordenes = [e["pregunta_orden"] for e in events if e["evento"] == "respuesta"]
+            
+            if secuencias != [1, 2, 3, 4, 5]:
+                print(f"❌ {path}: secuencias {secuencias}")
+                return False
+            if sorted(ordenes) != [1, 2, 3, 4]:
+                print(f"❌ {path}: preguntas emitidas {ordenes}")
+                return False
+            if ordenes != [3, 4, 1, 2]:
+                print(f"❌ {path}: dentro de un shard se esperaba orden por pregunta_orden, llegó {ordenes}")
+                return False
+            
+            final = events[-1]
+            if final["evento"] != "completado" or final["respuestas_emitidas"] != 4 or final["total_preguntas"] != 4:
+                print(f"❌ {path}: evento final incorrecto {final}")
+                return False
+        
+        if delivery.eventos != 5 or any(e["estado"] != "entregado" for e in entregas):
+            print(f"❌ Estado final incorrecto: eventos={delivery.eventos} entregas={entregas}")
+            return False
+        
+        print("✅ 4 respuestas + completado en ambos endpoints, duplicado descartado")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error en orden/dedup: {str(e)}")
+        return False
+    finally:
+        sink.close()
+
+
+def test_retry_resends_same_event():
+    """Un reintento reenvía el mismo evento_id y secuencia (el receptor deduplica)"""
+    print("\n🧪 Probando reintentos idempotentes...")
+    
+    sink = Sink(fail_first=1)
+    try:
+        delivery = _delivery(1, [sink.url("/app")])
+        delivery.emit_answers([_resultado(1)])
+        delivery.complete(True)
+        
+        events = sink.events.get("/app", [])
+        ids = [(e["evento_id"], e["secuencia"]) for e in events]
+        if ids != [("ref-progresivo:1", 1), ("ref-progresivo:1", 1), ("ref-progresivo:completado", 2)]:
+            print(f"❌ Eventos recibidos: {ids}")
+            return False
+        
+        unicos = {e["evento_id"] for e in events}
+        print(f"✅ {len(events)} POSTs recibidos, {len(unicos)} eventos únicos tras deduplicar")
+        return True
+    
+    except Exception as e:
+        print(f"❌ Error en reintentos: {str(e)}")
+        return False
+    finally:
+        sink.close()
+
+
+def main():
+    """Función principal de testing"""
+    print("🧪 Testing QA Personalizado Service - Webhooks progresivos")
+    print("=" * 60)
+    
+    tests = [
+        test_split_shards,
+        test_order_and_dedup,
+        test_retry_resends_same_event,
+    ]
+    
+    passed = sum(1 for test in tests if test())
+    
+    print("\n" + "=" * 60)
+    print(f"📊 Resultados: {passed}/{len(tests)} tests pasaron")
+    return 0 if passed == len(tests) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
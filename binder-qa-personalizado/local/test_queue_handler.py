@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Pruebas del handler de lotes SQS con eventos de ejemplo (sin AWS ni API key)
+"""
+
+import sys
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+
+# Agregar directorio padre al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import QAConfig
+from deadline import Deadline
+from qa_service.queue_handler import QueueBatchProcessor, is_queue_event
+from queue_events import mixed_batch_event, fifo_batch_event, sqs_event, sqs_record, qa_body
+
+
+class _Logger:
+    def event(self, name, **kwargs):
+        pass
+
+
+class _FakeController:
+    """Controller de prueba: el resultado depende del reference_id"""
+    
+    webhook_batcher = None
+    
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+    
+    def handle_request(self, body, deadline=None):
+        with self._lock:
+            self.calls.append(body.get("reference_id"))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        
+        reference_id = body.get("reference_id")
+        if "texto_contrato" not in body:
+            return {"success": False, "reference_id": reference_id,
+                    "error": {"codigo": "BAD_REQUEST", "detalle": "texto_contrato is required"}}
+        if "model-error" in reference_id:
+            return {"success": False, "reference_id": reference_id,
+                    "error": {"codigo": "MODEL_ERROR", "detalle": "OpenAI API error: HTTP 500"}}
+        return {"success": True, "reference_id": reference_id, "qa_resultados": [], "metadatos": {}}
+
+
+def _failed_ids(result):
+    return sorted(item["itemIdentifier"] for item in result["batchItemFailures"])
+
+
+def test_partial_batch_failures():
+    """Solo los errores transitorios se reportan en batchItemFailures"""
+    print("🧪 Probando fallos parciales del lote...")
+    
+    event = mixed_batch_event()
+    if not is_queue_event(event) or is_queue_event({"body": "{}"}):
+        print("❌ Detección de eventos SQS incorrecta")
+        return False
+    
+    controller = _FakeController()
+    result = QueueBatchProcessor(controller, QAConfig(), _Logger()).process(event, Deadline(30))
+    
+    if _failed_ids(result) != ["m-model-error"]:
+        print(f"❌ batchItemFailures inesperado: {result}")
+        return False
+    if "q-bad" not in controller.calls or len(controller.calls) != 3:
+        print(f"❌ Mensajes procesados inesperados: {controller.calls}")
+        return False
+    
+    print("✅ Solo m-model-error vuelve a la cola (JSON inválido y BAD_REQUEST se descartan)")
+    return True
+
+
+def test_fifo_group_order():
+    """En FIFO, tras un fallo el resto del grupo no se procesa y se reentrega"""
+    print("\n🧪 Probando orden de grupos FIFO...")
+    
+    controller = _FakeController()
+    result = QueueBatchProcessor(controller, QAConfig(), _Logger()).process(fifo_batch_event(), Deadline(30))
+    
+    if _failed_ids(result) != ["a-2", "a-3"]:
+        print(f"❌ batchItemFailures inesperado: {result}")
+        return False
+    if "q-a3" in controller.calls or "q-b1" not in controller.calls:
+        print(f"❌ Mensajes procesados inesperados: {controller.calls}")
+        return False
+    
+    print("✅ a-2 y a-3 se reentregan; el grupo B no se ve afectado")
+    return True
+
+
+def test_bounded_concurrency():
+    """El lote se procesa en paralelo sin superar QUEUE_WORKERS y respeta el deadline"""
+    print("\n🧪 Probando concurrencia acotada...")
+    
+    config = replace(QAConfig(), queue_workers=3)
+    controller = _FakeController(delay=0.1)
+    event = sqs_event([sqs_record(f"m-{i}", qa_body(f"q-{i}")) for i in range(9)])
+    
+    start = time.perf_counter()
+    result = QueueBatchProcessor(controller, config, _Logger()).process(event, Deadline(30))
+    elapsed = time.perf_counter() - start
+    
+    if result["batchItemFailures"] or controller.max_active != 3 or elapsed > 0.6:
+        print(f"❌ max_active={controller.max_active} elapsed={elapsed:.2f}s result={result}")
+        return False
+    
+    # Sin presupuesto para una llamada útil los mensajes vuelven a la cola sin procesarse
+    expired = _FakeController()
+    result = QueueBatchProcessor(expired, config, _Logger()).process(event, Deadline(0))
+    if len(result["batchItemFailures"]) != 9 or expired.calls:
+        print(f"❌ Deadline vencido no reentregó el lote: {result}")
+        return False
+    
+    print(f"✅ 9 mensajes en {elapsed:.2f}s con máximo 3 en paralelo; deadline vencido reentrega todo")
+    return True
+
+
+def main():
+    """Función principal de testing"""
+    print("🧪 Testing QA Personalizado Service - Lotes SQS")
+    print("=" * 60)
+    
+    tests = [
+        test_partial_batch_failures,
+        test_fifo_group_order,
+        test_bounded_concurrency,
+    ]
+    
+    passed = 0
+    for test in tests:
+        if test():
+            passed += 1
+    
+    print("\n" + "=" * 60)
+    print(f"📊 Resultados: {passed}/{len(tests)} tests pasaron")
+    
+    if passed == len(tests):
+        print("🎉 ¡Todos los tests pasaron!")
+        return 0
+    print("⚠️ Algunos tests fallaron")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
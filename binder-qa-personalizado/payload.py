@@ -0,0 +1,90 @@
+import json
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from compression import maybe_gzip
+
+
+class JSONPayload(dict):
+    """
+    Dict de respuesta que cachea su serialización UTF-8.
+    
+    Las claves de `frozen_keys` (la parte pesada, p.ej. qa_resultados) se
+    serializan una sola vez y se reutilizan en el body del webhook, en cada
+    reintento y en la respuesta HTTP. El resto del sobre (metadatos) se
+    re-serializa en cada llamada porque se modifica después de enviar el
+    webhook; si no cambió, se retorna exactamente el mismo buffer.
+    
+    Cada fragmento se cachea junto al objeto que serializó: reasignar la
+    clave por cualquier vía (asignación, update, pop, |=) invalida la cache.
+    Los valores de `frozen_keys` no deben mutarse in-place después de la
+    primera serialización.
+    """
+    
+    def __init__(self, data: Optional[Dict[str, Any]] = None, frozen_keys: Iterable[str] = ("qa_resultados",)):
+        super().__init__(data or {})
+        self.frozen_keys = tuple(frozen_keys)
+        self._fragments: Dict[str, Tuple[Any, bytes]] = {}
+        self._last_parts: Optional[Tuple[bytes, ...]] = None
+        self._last_bytes: Optional[bytes] = None
+        self._gzip_cache: Optional[Tuple[bytes, int, int, bytes, bool]] = None
+    
+    def _fragment(self, key: str, value: Any) -> bytes:
+        """Serializa `"clave": valor` con los mismos separadores que json.dumps"""
+        if key in self.frozen_keys:
+            cached = self._fragments.get(key)
+            if cached is None or cached[0] is not value:
+                cached = (value, (json.dumps(key) + ": " + json.dumps(value, ensure_ascii=False)).encode("utf-8"))
+                self._fragments[key] = cached
+            return cached[1]
+        return (json.dumps(key) + ": " + json.dumps(value, ensure_ascii=False)).encode("utf-8")
+    
+    def to_bytes(self) -> bytes:
+        """Serialización UTF-8, idéntica a json.dumps(self, ensure_ascii=False)"""
+        # Los fragmentos congelados son el mismo objeto en cada llamada, por lo que
+        # comparar la tupla solo compara de verdad el sobre (tuple == usa identidad primero)
+        parts = tuple(self._fragment(k, v) for k, v in self.items())
+        if self._last_bytes is not None and parts == self._last_parts:
+            return self._last_bytes
+        
+        self._last_parts = parts
+        self._last_bytes = b"{" + b", ".join(parts) + b"}"
+        return self._last_bytes
+    
+    def gzip_bytes(self, min_bytes: int, level: int) -> Tuple[bytes, bool]:
+        """Versión gzip del buffer actual, cacheada mientras el buffer no cambie"""
+        data = self.to_bytes()
+        cache = self._gzip_cache
+        if cache and cache[0] is data and cache[1] == min_bytes and cache[2] == level:
+            return cache[3], cache[4]
+        
+        compressed, was_compressed = maybe_gzip(data, min_bytes, level)
+        self._gzip_cache = (data, min_bytes, level, compressed, was_compressed)
+        return compressed, was_compressed
+    
+    def with_envelope(self, **changes: Any) -> "JSONPayload":
+        """Copia superficial con claves del sobre reemplazadas, compartiendo los fragmentos cacheados"""
+        for key in self.frozen_keys:
+            if key in self:
+                self._fragment(key, self[key])
+        
+        clone = JSONPayload(self, frozen_keys=self.frozen_keys)
+        clone._fragments = dict(self._fragments)
+        for key, value in changes.items():
+            clone[key] = value
+        return clone
+
+
+def encode_json(payload: Any) -> bytes:
+    """
+    Serializa un payload a UTF-8 reutilizando las caches de JSONPayload.
+    
+    Acepta un JSONPayload, una lista de payloads (lotes de webhook), bytes
+    ya serializados (se retornan tal cual) o cualquier valor serializable.
+    """
+    if isinstance(payload, bytes):
+        return payload
+    if isinstance(payload, JSONPayload):
+        return payload.to_bytes()
+    if isinstance(payload, list) and payload and all(isinstance(p, JSONPayload) for p in payload):
+        return b"[" + b", ".join(p.to_bytes() for p in payload) + b"]"
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
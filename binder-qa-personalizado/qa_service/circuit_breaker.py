@@ -0,0 +1,189 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+# Prefijo del error cuando la entrega no se intenta porque el breaker del host está abierto
+CIRCUIT_OPEN_PREFIX = "Circuit open"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Mínimo de muestras en la ventana antes de evaluar la tasa de éxito
+_MIN_SAMPLES = 10
+
+
+def _percentile(sorted_values, pct: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100.0 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+
+class HostHealth:
+    """Salud de un host de webhook: ventana de resultados y estado del breaker"""
+    
+    def __init__(self, host: str, window: int):
+        self.host = host
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started_at: Optional[float] = None
+        self.total_requests = 0
+        self.total_failures = 0
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+    
+    def record(self, success: bool, latency_ms: float) -> None:
+        self.total_requests += 1
+        self._outcomes.append(success)
+        self._latencies.append(latency_ms)
+        if success:
+            self.consecutive_failures = 0
+        else:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+    
+    def success_rate(self) -> Optional[float]:
+        if not self._outcomes:
+            return None
+        return sum(1 for ok in self._outcomes if ok) / len(self._outcomes)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        rate = self.success_rate()
+        return {
+            "host": self.host,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "success_rate": round(rate, 3) if rate is not None else None,
+            "samples": len(self._outcomes),
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+        }
+
+
+class CircuitBreakerRegistry:
+    """
+    Circuit breaker por host para webhooks.
+    
+    El breaker se abre tras `failure_threshold` fallos consecutivos o si la
+    tasa de éxito de la ventana cae bajo `min_success_rate`. Mientras está
+    abierto las entregas no se intentan (se estacionan para envío diferido).
+    Pasados `open_seconds` se permite un único intento de prueba (half-open):
+    si tiene éxito el breaker se cierra, si falla vuelve a abrirse.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 30.0,
+                 window: int = 50, min_success_rate: float = 0.5, logger=None):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.window = max(1, window)
+        self.min_success_rate = min_success_rate
+        self.logger = logger
+        self._hosts: Dict[str, HostHealth] = {}
+        self._lock = threading.Lock()
+    
+    def _health(self, host: str) -> HostHealth:
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = HostHealth(host, self.window)
+        return health
+    
+    def allow(self, host: str) -> bool:
+        """Indica si se puede intentar una entrega al host (reserva el intento de prueba en half-open)"""
+        now = time.monotonic()
+        with self._lock:
+            health = self._health(host)
+            if health.state == CLOSED:
+                return True
+            
+            if health.state == OPEN:
+                if now - health.opened_at < self.open_seconds:
+                    return False
+                self._transition(health, HALF_OPEN)
+                health.probe_started_at = now
+                return True
+            
+            # Half-open: solo un intento de prueba a la vez; si el que lo reservó
+            # nunca reportó (p.ej. se quedó sin presupuesto) se libera tras open_seconds
+            if health.probe_started_at is not None and now - health.probe_started_at < self.open_seconds:
+                return False
+            health.probe_started_at = now
+            return True
+    
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            health = self._hosts.get(host)
+            return health is not None and health.state == OPEN
+    
+    def record(self, host: str, success: bool, latency_ms: float) -> None:
+        """Registra el resultado de un intento y actualiza el estado del breaker"""
+        with self._lock:
+            health = self._health(host)
+            health.record(success, round(latency_ms, 1))
+            
+            if health.state == HALF_OPEN:
+                health.probe_started_at = None
+                self._transition(health, CLOSED if success else OPEN)
+                return
+            
+            if health.state == CLOSED and not success and self._unhealthy(health):
+                self._transition(health, OPEN)
+    
+    def _unhealthy(self, health: HostHealth) -> bool:
+        if health.consecutive_failures >= self.failure_threshold:
+            return True
+        rate = health.success_rate()
+        return len(health._outcomes) >= _MIN_SAMPLES and rate is not None and rate < self.min_success_rate
+    
+    def _transition(self, health: HostHealth, state: str) -> None:
+        previous = health.state
+        health.state = state
+        if state == OPEN:
+            health.opened_at = time.monotonic()
+        elif state == CLOSED:
+            health.opened_at = None
+            health.consecutive_failures = 0
+            # La ventana previa refleja la caída; empezar limpio tras recuperarse
+            health._outcomes.clear()
+        
+        if self.logger is not None:
+            self.logger.event("webhook.breaker_state", previous=previous, **health.snapshot())
+    
+    def health(self, host: str) -> Dict[str, Any]:
+        """Salud y estado del breaker de un host"""
+        with self._lock:
+            return self._health(host).snapshot()
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Salud y estado del breaker de cada host"""
+        with self._lock:
+            return {host: health.snapshot() for host, health in self._hosts.items()}
+
+
+_SHARED_BREAKERS: Optional[CircuitBreakerRegistry] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_circuit_breakers(config, logger=None) -> CircuitBreakerRegistry:
+    """Registry compartido por el contenedor (la salud de un host se conserva entre invocaciones)"""
+    global _SHARED_BREAKERS
+    if _SHARED_BREAKERS is None:
+        with _SHARED_LOCK:
+            if _SHARED_BREAKERS is None:
+                _SHARED_BREAKERS = CircuitBreakerRegistry(
+                    failure_threshold=config.webhook_breaker_failures,
+                    open_seconds=config.webhook_breaker_open_seconds,
+                    window=config.webhook_breaker_window,
+                    min_success_rate=config.webhook_breaker_min_success_rate,
+                    logger=logger,
+                )
+    return _SHARED_BREAKERS
@@ -1,11 +1,23 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable
+import json
 import time
 from datetime import datetime, timezone
 
 from .validator import QAValidator
 from .webhook_service import WebhookService
-from call_llm.api import generate_qa_responses
+from .webhook_batcher import get_webhook_batcher
+from .progressive import ProgressiveDelivery
+from call_llm.api import generate_qa_responses, generate_qa_responses_sharded, generate_qa_responses_partial
 from config import QAConfig
+from contract_store import get_contract_resolver
+from deadline import Deadline, TIMEOUT_PREFIX, deadline_or_default
+from idempotency import get_idempotency_store, request_hash, COMPLETED, CONFLICT, IN_PROGRESS
+from payload import JSONPayload, encode_json
+from result_store import get_result_store, new_result_id, result_fetch_url
+
+
+# Intervalo de consulta mientras se espera a un intento previo del mismo reference_id
+_IDEMPOTENCY_POLL_SECONDS = 0.25
 
 
 class QAController:
@@ -16,17 +28,114 @@ class QAController:
         self.logger = logger
         self.validator = QAValidator(config)
         self.webhook_service = WebhookService(config, logger)
+        self.webhook_batcher = get_webhook_batcher(self.webhook_service, config) if config.webhook_batch_mode else None
+        self.idempotency = get_idempotency_store(config) if config.idempotency_enabled else None
+        self.contracts = get_contract_resolver(config, logger)
     
-    def handle_request(self, body: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_request(self, body: Dict[str, Any],
+                       on_progress: Optional[Callable[[int, int], None]] = None,
+                       deadline: Optional[Deadline] = None,
+                       continue_pending: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                       on_answers: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                       idempotency_wait: Optional[float] = None) -> Dict[str, Any]:
         """
-        Maneja un request de QA personalizado.
+        Maneja un request de QA personalizado de forma idempotente por reference_id.
+        
+        Un duplicado de un request completado recibe el resultado guardado sin
+        llamar al modelo; uno aún en curso recibe estado "procesando" (o espera
+        hasta IDEMPOTENCY_WAIT_SECONDS al primer intento), y el mismo
+        reference_id con otro body se rechaza con CONFLICT.
         
         Args:
             body: Cuerpo del request
+            on_progress: Callback (respondidas, total): por shard si la generación va por
+                shards; si no, 0 al empezar y total al terminar (no activa los shards,
+                que pagan el contrato completo en cada llamada)
+            deadline: Presupuesto total del request (None = MAX_TOTAL_TIMEOUT); OpenAI
+                y webhooks derivan sus timeouts de lo que queda
+            continue_pending: Despacha un request de continuación con las preguntas
+                pendientes (qa.continuar_pendientes) y retorna su respuesta 202
+            on_answers: Callback con las respuestas de cada shard apenas termina
+                (respuestas NDJSON); activa la generación por shards
+            idempotency_wait: Segundos que un duplicado espera al intento en curso
+                (None = IDEMPOTENCY_WAIT_SECONDS; siempre acotado por el deadline)
             
         Returns:
-            Respuesta estructurada con resultado o error
+            Respuesta estructurada con resultado o error (TIMEOUT si se agotó el presupuesto)
+        """
+        deadline = deadline_or_default(deadline, self.config.max_total_timeout)
+        reference_id = body.get("reference_id") if isinstance(body, dict) else None
+        if self.idempotency is None or not isinstance(reference_id, str) or not reference_id:
+            return self._handle_request(body, on_progress, deadline, continue_pending, on_answers)
+        
+        try:
+            replay = self._claim(reference_id, request_hash(body), deadline, idempotency_wait)
+        except Exception as e:
+            # Sin registro de idempotencia se procesa igual (mejor pagar un análisis que fallar)
+            self.logger.event("idempotency.store_error", id=reference_id, error=str(e))
+            return self._handle_request(body, on_progress, deadline, continue_pending, on_answers)
+        if replay is not None:
+            return replay
+        
+        result = None
+        try:
+            result = self._handle_request(body, on_progress, deadline, continue_pending, on_answers)
+            return result
+        finally:
+            # Solo se guardan resultados completos; errores y parciales se pueden reintentar
+            try:
+                if result is not None and result.get("success") and result["metadatos"].get("completo", True):
+                    self.idempotency.complete(reference_id, encode_json(result))
+                else:
+                    self.idempotency.release(reference_id)
+            except Exception as e:
+                self.logger.event("idempotency.store_error", id=reference_id, error=str(e))
+    
+    def _claim(self, reference_id: str, body_hash: str, deadline: Deadline,
+               wait: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Reclama el reference_id en el registro de idempotencia.
+        
+        Returns:
+            None si este intento debe procesar el request, o la respuesta para
+            el duplicado (resultado guardado, "procesando" o CONFLICT)
         """
+        status, stored = self.idempotency.begin(reference_id, body_hash)
+        
+        # Esperar al primer intento si está configurado y el presupuesto lo permite
+        if wait is None:
+            wait = self.config.idempotency_wait_seconds
+        wait_until = time.monotonic() + min(wait, deadline.remaining())
+        while status == IN_PROGRESS and time.monotonic() + _IDEMPOTENCY_POLL_SECONDS < wait_until:
+            time.sleep(_IDEMPOTENCY_POLL_SECONDS)
+            status, stored = self.idempotency.begin(reference_id, body_hash)
+        
+        if status == COMPLETED:
+            self.logger.event("idempotency.replay", id=reference_id, bytes=len(stored))
+            replay = json.loads(stored)
+            replay["metadatos"]["reutilizado"] = True
+            return replay
+        if status == IN_PROGRESS:
+            self.logger.event("idempotency.in_progress", id=reference_id)
+            return {
+                "success": True,
+                "reference_id": reference_id,
+                "estado": "procesando",
+                "retry_after": self.config.job_retry_after,
+            }
+        if status == CONFLICT:
+            self.logger.event("idempotency.conflict", id=reference_id)
+            return self._create_error_response(
+                "CONFLICT", "reference_id already used with a different request body", reference_id
+            )
+        return None
+    
+    def _handle_request(self, body: Dict[str, Any],
+                        on_progress: Optional[Callable[[int, int], None]],
+                        deadline: Deadline,
+                        continue_pending: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]],
+                        on_answers: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
+        """Procesa un request de QA (validación, modelo y webhooks) sin control de duplicados"""
         start_time = time.perf_counter()
         
         try:
@@ -40,12 +149,28 @@ class QAController:
                 )
             
             # Extraer datos validados
-            texto_contrato = body.get("texto_contrato")
             reference_id = body.get("reference_id")
+            
+            # Contrato inline, por URL o por hash (normalizado y cacheado por hash de contenido)
+            contrato, contrato_error = self.contracts.resolve(body, deadline)
+            if contrato_error is not None:
+                return self._create_error_response(contrato_error["codigo"], contrato_error["detalle"], reference_id)
+            texto_contrato = contrato["texto"]
+            if len(texto_contrato) < self.config.min_chars_contrato:
+                return self._create_error_response(
+                    "BAD_REQUEST",
+                    f"Contract must have at least {self.config.min_chars_contrato} characters",
+                    reference_id
+                )
             qa_section = body.get("qa")
             preguntas = qa_section.get("preguntas")
-            webhook_url = qa_section.get("webhook_url")
+            webhook_targets = self._webhook_targets(qa_section)
+            webhook_gzip = qa_section.get("webhook_gzip")
+            webhook_mode = qa_section.get("webhook_mode") or "final"
+            webhook_claim_check = qa_section.get("webhook_claim_check")
             incluir_razonamiento = qa_section.get("incluir_razonamiento", False)
+            parciales = qa_section.get("resultados_parciales", self.config.qa_partial_results)
+            ordenes = qa_section.get("pregunta_ordenes")
             
             # Log inicio
             self.logger.event(
@@ -53,32 +178,98 @@ class QAController:
                 id=reference_id,
                 preguntas_count=len(preguntas),
                 incluir_razonamiento=incluir_razonamiento,
-                has_webhook=bool(webhook_url)
+                has_webhook=bool(webhook_targets),
+                webhook_targets=len(webhook_targets),
+                webhook_mode=webhook_mode,
+                contrato_hash=contrato["hash"],
+                contrato_origen=contrato["origen"],
+                contrato_cache=contrato["cache"],
+                contrato_tokens=contrato["normalizacion"]["tokens_after"],
+                budget_s=round(deadline.remaining(), 2)
             )
             
+            progressive = None
+            if webhook_mode == "progressive" and webhook_targets:
+                progressive = ProgressiveDelivery(
+                    self.webhook_service, webhook_targets, reference_id, len(preguntas),
+                    compress=webhook_gzip, logger=self.logger, deadline=deadline
+                )
+            
             # Generar respuestas con OpenAI
-            qa_resultados, error = generate_qa_responses(
-                texto_contrato=texto_contrato,
-                preguntas=preguntas,
-                incluir_razonamiento=incluir_razonamiento,
-                model=self.config.default_model,
-                timeout=self.config.openai_timeout,
-                log=self.logger
-            )
+            pendientes: List[Dict[str, Any]] = []
+            if progressive is not None or on_answers is not None or parciales:
+                # Shards en paralelo: cada respuesta se envía (modo progresivo o NDJSON)
+                # y se reporta como progreso apenas su shard termina
+                respondidas = [0]
+                
+                def on_shard(shard_resultados: List[Dict[str, Any]]) -> None:
+                    if ordenes:
+                        self._remap_orden(shard_resultados, ordenes)
+                    if progressive is not None:
+                        progressive.emit_answers(shard_resultados)
+                    if on_answers is not None:
+                        on_answers(shard_resultados)
+                    if on_progress is not None:
+                        respondidas[0] += len(shard_resultados)
+                        on_progress(respondidas[0], len(preguntas))
+                
+                shard_kwargs = dict(
+                    texto_contrato=texto_contrato,
+                    preguntas=preguntas,
+                    incluir_razonamiento=incluir_razonamiento,
+                    model=self.config.default_model,
+                    timeout=self.config.openai_timeout,
+                    shard_size=self.config.qa_shard_size,
+                    max_workers=self.config.qa_shard_workers,
+                    on_shard=on_shard,
+                    deadline=deadline,
+                    log=self.logger
+                )
+                if parciales:
+                    # Al vencer el deadline se retorna lo que terminó y el resto queda pendiente
+                    qa_resultados, pendientes, error = generate_qa_responses_partial(**shard_kwargs)
+                    if ordenes:
+                        self._remap_orden(pendientes, ordenes)
+                else:
+                    qa_resultados, error = generate_qa_responses_sharded(**shard_kwargs)
+            else:
+                if on_progress is not None:
+                    on_progress(0, len(preguntas))
+                qa_resultados, error = generate_qa_responses(
+                    texto_contrato=texto_contrato,
+                    preguntas=preguntas,
+                    incluir_razonamiento=incluir_razonamiento,
+                    model=self.config.default_model,
+                    timeout=self.config.openai_timeout,
+                    deadline=deadline,
+                    log=self.logger
+                )
+                if qa_resultados is not None and ordenes:
+                    self._remap_orden(qa_resultados, ordenes)
+                if qa_resultados is not None and on_progress is not None:
+                    on_progress(len(qa_resultados), len(preguntas))
             
             if qa_resultados is None:
-                return self._create_error_response(
-                    "MODEL_ERROR",
+                timed_out = (error or "").startswith(TIMEOUT_PREFIX)
+                if timed_out:
+                    self.logger.event("qa.timeout", id=reference_id, error=error,
+                                      elapsed_ms=int((time.perf_counter() - start_time) * 1000))
+                error_response = self._create_error_response(
+                    "TIMEOUT" if timed_out else "MODEL_ERROR",
                     error or "Failed to generate responses",
                     reference_id
                 )
+                if progressive is not None:
+                    progressive.complete(False, error=error_response["error"])
+                return error_response
             
             # Calcular tiempo transcurrido
             end_time = time.perf_counter()
             latencia_ms = int((end_time - start_time) * 1000)
             
             # Crear respuesta exitosa
-            response = {
+            # qa_resultados se serializa una sola vez para webhook, reintentos y respuesta HTTP
+            response = JSONPayload({
                 "success": True,
                 "reference_id": reference_id,
                 "qa_resultados": qa_resultados,
@@ -86,32 +277,83 @@ class QAController:
                     "modelo": self.config.default_model,
                     "latencia_ms": latencia_ms,
                     "modo": "sync",
-                    "webhook_disparado": False
+                    "webhook_disparado": False,
+                    "completo": not pendientes,
+                    "contrato": self._contract_metadata(contrato)
                 }
-            }
+            })
+            
+            if pendientes:
+                response["preguntas_pendientes"] = pendientes
+                self.logger.event(
+                    "qa.partial",
+                    id=reference_id,
+                    respondidas=len(qa_resultados),
+                    pendientes=len(pendientes),
+                    estados=sorted({p["estado"] for p in pendientes})
+                )
+                if qa_section.get("continuar_pendientes") and continue_pending is not None:
+                    response["metadatos"]["continuacion"] = self._continue_pending(
+                        body, pendientes, continue_pending
+                    )
             
-            # Enviar webhook si está configurado
+            # Enviar webhook(s) si está configurado
             webhook_success = True
-            if webhook_url:
+            if webhook_targets:
                 try:
-                    if self.config.webhook_async_mode:
-                        # Modo asíncrono: no esperamos respuesta
-                        self.webhook_service.send_webhook_async(webhook_url, response)
+                    # Claim-check: el webhook lleva un resumen y la URL del resultado guardado
+                    webhook_payload = response
+                    if progressive is None and self._wants_claim_check(webhook_claim_check, response):
+                        webhook_payload = self._claim_check_payload(response)
+                    
+                    if progressive is not None:
+                        # Las respuestas ya se enviaron; solo falta el evento final
+                        response["metadatos"]["modo"] = "progressive"
+                        entregas = progressive.complete(True, metadatos=dict(response["metadatos"]))
+                        webhook_success = all(e["estado"] == "entregado" for e in entregas)
+                        response["metadatos"]["webhook_disparado"] = webhook_success
+                        response["metadatos"]["webhook_eventos"] = progressive.eventos
+                    elif self.webhook_batcher is not None:
+                        # Modo agrupado: el resultado se entrega junto a otros del mismo endpoint
+                        if webhook_payload is response:
+                            snapshot = response.with_envelope(metadatos=dict(response["metadatos"], modo="batch"))
+                        else:
+                            snapshot = webhook_payload
+                        entregas = []
+                        for url in webhook_targets:
+                            item_id = self.webhook_batcher.submit(url, snapshot, compress=webhook_gzip)
+                            entregas.append({"url": url, "estado": "encolado", "item_id": item_id})
+                            self.logger.event("webhook.batched", id=reference_id, url=url, item_id=item_id)
+                        response["metadatos"]["webhook_disparado"] = True
+                        response["metadatos"]["webhook_lote_item"] = entregas[0]["item_id"]
+                    elif self.config.webhook_async_mode:
+                        # Modo asíncrono: el resultado del webhook no afecta el request
+                        # (entregas concurrentes, igual que en modo síncrono)
+                        entregas = self.webhook_service.send_webhooks(webhook_targets, webhook_payload,
+                                                                      compress=webhook_gzip, deadline=deadline)
+                        for entrega in entregas:
+                            self.logger.event("webhook.async_dispatched", id=reference_id, url=entrega["url"],
+                                              estado=entrega["estado"])
                         response["metadatos"]["webhook_disparado"] = True
                         response["metadatos"]["modo"] = "async"
-                        self.logger.event("webhook.async_dispatched", id=reference_id, url=webhook_url)
                     else:
-                        # Modo síncrono: esperamos respuesta
-                        webhook_success, webhook_error = self.webhook_service.send_webhook(webhook_url, response)
+                        # Modo síncrono: entregas concurrentes, cada una con sus reintentos
+                        entregas = self.webhook_service.send_webhooks(webhook_targets, webhook_payload,
+                                                                      compress=webhook_gzip, deadline=deadline)
+                        webhook_success = all(e["estado"] == "entregado" for e in entregas)
                         response["metadatos"]["webhook_disparado"] = webhook_success
                         
-                        if not webhook_success:
-                            self.logger.event("webhook.failed", id=reference_id, error=webhook_error)
-                            # No fallar el request por webhook, solo loguear
+                        for entrega in entregas:
+                            if entrega["estado"] != "entregado":
+                                # No fallar el request por webhook, solo loguear
+                                self.logger.event("webhook.failed", id=reference_id, url=entrega["url"], error=entrega["error"])
+                    
+                    response["metadatos"]["webhooks"] = entregas
                         
                 except Exception as e:
                     self.logger.event("webhook.exception", id=reference_id, error=str(e))
                     response["metadatos"]["webhook_disparado"] = False
+                    webhook_success = False
             
             # Log éxito
             self.logger.event(
@@ -142,6 +384,120 @@ class QAController:
                 body.get("reference_id")
             )
     
+    def _contract_metadata(self, contrato: Dict[str, Any]) -> Dict[str, Any]:
+        """metadatos.contrato: origen del contrato y cuánto se redujo antes del prompt"""
+        stats = contrato["normalizacion"]
+        normalizacion = {
+            "caracteres_antes": stats["chars_before"],
+            "caracteres_despues": stats["chars_after"],
+            "tokens_estimados_antes": stats["tokens_before"],
+            "tokens_estimados_despues": stats["tokens_after"]
+        }
+        audit = stats.get("boilerplate")
+        if audit is not None:
+            normalizacion["boilerplate"] = {
+                "paginas": audit["pages"],
+                "numeros_pagina_eliminados": audit["page_numbers_removed"],
+                "lineas_repetidas_eliminadas": audit["repeated_lines_removed"],
+                "caracteres_eliminados": audit["chars_before"] - audit["chars_after"]
+            }
+        return {
+            "hash": contrato["hash"],
+            "origen": contrato["origen"],
+            "cache": contrato["cache"],
+            "normalizacion": normalizacion
+        }
+    
+    def _wants_claim_check(self, requested: Optional[bool], response: JSONPayload) -> bool:
+        """Claim-check si el request lo pide o si el resultado supera WEBHOOK_CLAIM_CHECK_MIN_BYTES"""
+        if requested is not None:
+            return requested
+        min_bytes = self.config.webhook_claim_check_min_bytes
+        return min_bytes > 0 and len(response.to_bytes()) >= min_bytes
+    
+    def _claim_check_payload(self, response: JSONPayload) -> Dict[str, Any]:
+        """
+        Guarda el resultado completo y construye el webhook liviano.
+        
+        El resultado guardado ya incluye `metadatos.resultado_url`; solo los
+        campos de la entrega (webhook_disparado, webhooks) se completan
+        después, en la respuesta síncrona. Si el store falla se retorna el
+        resultado completo para no perder la entrega.
+        """
+        reference_id = response["reference_id"]
+        result_id = new_result_id()
+        fetch_url = result_fetch_url(self.config, result_id)
+        response["metadatos"]["resultado_url"] = fetch_url
+        try:
+            stored = get_result_store(self.config).put(reference_id, response.to_bytes(), result_id=result_id)
+        except Exception as e:
+            self.logger.event("results.store_error", id=reference_id, error=str(e))
+            del response["metadatos"]["resultado_url"]
+            return response
+        
+        qa_resultados = response["qa_resultados"]
+        confianzas = [r.get("confianza", 0.0) for r in qa_resultados]
+        self.logger.event("results.stored", id=reference_id, result_id=stored["id"], bytes=stored["bytes"])
+        return {
+            "success": True,
+            "reference_id": reference_id,
+            "claim_check": True,
+            "resumen": {
+                "total_preguntas": len(qa_resultados),
+                "confianza_promedio": round(sum(confianzas) / len(confianzas), 3) if confianzas else None,
+                "modelo": response["metadatos"]["modelo"],
+                "latencia_ms": response["metadatos"]["latencia_ms"],
+            },
+            "sha256": stored["sha256"],
+            "bytes": stored["bytes"],
+            "fetch_url": fetch_url,
+            "expira": datetime.fromtimestamp(stored["expires_at"], timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+    
+    def _remap_orden(self, items: List[Dict[str, Any]], ordenes: List[int]) -> None:
+        """Traduce pregunta_orden local (1..n) al orden del request original (continuaciones)"""
+        for item in items:
+            item["pregunta_orden"] = ordenes[item["pregunta_orden"] - 1]
+    
+    def _continue_pending(self, body: Dict[str, Any], pendientes: List[Dict[str, Any]],
+                          continue_pending: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Despacha las preguntas pendientes como job asíncrono.
+        
+        El job usa reference_id "<original>:pendientes", conserva los webhooks
+        del request y numera sus respuestas con el pregunta_orden original.
+        """
+        qa_section = body["qa"]
+        continuation = dict(
+            body,
+            reference_id=f"{body['reference_id']}:pendientes",
+            qa=dict(
+                qa_section,
+                preguntas=[p["pregunta"] for p in pendientes],
+                pregunta_ordenes=[p["pregunta_orden"] for p in pendientes],
+                async_job=True,
+                resultados_parciales=False,
+                continuar_pendientes=False,
+            ),
+        )
+        try:
+            accepted = continue_pending(continuation)
+        except Exception as e:
+            self.logger.event("qa.continuation_failed", id=body["reference_id"], error=str(e))
+            return {"estado": "fallido", "error": str(e)}
+        
+        self.logger.event("qa.continuation_dispatched", id=body["reference_id"],
+                          job_id=accepted.get("reference_id"), preguntas=len(pendientes))
+        return {key: accepted.get(key) for key in ("reference_id", "estado", "status_url")}
+    
+    def _webhook_targets(self, qa_section: Dict[str, Any]) -> List[str]:
+        """Endpoints de entrega: webhook_url más webhook_urls, sin duplicados y en orden"""
+        urls = []
+        if qa_section.get("webhook_url"):
+            urls.append(qa_section["webhook_url"])
+        urls.extend(qa_section.get("webhook_urls") or [])
+        return list(dict.fromkeys(urls))
+    
     def _create_error_response(self, codigo: str, detalle: str, reference_id: Optional[str] = None) -> Dict[str, Any]:
         """Crea respuesta de error estructurada"""
         return {
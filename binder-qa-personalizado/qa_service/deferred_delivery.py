@@ -0,0 +1,118 @@
+import json
+import os
+import time
+import uuid
+from typing import Dict, Any, Optional, List
+
+from .circuit_breaker import CIRCUIT_OPEN_PREFIX
+
+
+class DeferredDeliveryStore:
+    """
+    Spool local de webhooks pendientes de entrega.
+    
+    Cuando un envío no cabe en el tiempo restante de la invocación se
+    estaciona aquí (un archivo JSON por entrega) y se reintenta más tarde
+    con `drain`. En producción el equivalente sería una cola (SQS).
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+    
+    def _path(self, delivery_id: str) -> str:
+        return os.path.join(self.directory, f"{delivery_id}.json")
+    
+    def park(self, webhook_url: str, payload: Dict[str, Any], reason: str,
+             compress: bool = False) -> str:
+        """
+        Guarda una entrega pendiente.
+        
+        Returns:
+            ID de la entrega diferida
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        delivery_id = uuid.uuid4().hex
+        record = {
+            "id": delivery_id,
+            "url": webhook_url,
+            "payload": payload,
+            "compress": compress,
+            "reason": reason,
+            "parked_at": time.time(),
+        }
+        
+        self._write(record)
+        return delivery_id
+    
+    def pending(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Entregas pendientes, las más antiguas primero"""
+        if not os.path.isdir(self.directory):
+            return []
+        
+        records = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    records.append(json.load(f))
+            except Exception:
+                continue
+        
+        records.sort(key=lambda r: r.get("parked_at", 0))
+        return records[:limit] if limit else records
+    
+    def remove(self, delivery_id: str) -> None:
+        try:
+            os.remove(self._path(delivery_id))
+        except FileNotFoundError:
+            pass
+    
+    def _write(self, record: Dict[str, Any]) -> None:
+        """Escritura atómica: archivo temporal + rename"""
+        tmp_path = self._path(record["id"]) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(record["id"]))
+    
+    def drain(self, webhook_service, deadline=None, limit: Optional[int] = None,
+              max_drain_attempts: int = 5) -> Dict[str, int]:
+        """
+        Reintenta las entregas pendientes.
+        
+        Una entrega se elimina al entregarse o tras `max_drain_attempts` drenajes fallidos.
+        Las entregas a hosts con el circuit breaker abierto se saltan sin contar intento.
+        
+        Returns:
+            Dict con contadores {"delivered", "failed", "dropped", "skipped", "remaining"}
+        """
+        delivered = failed = dropped = skipped = 0
+        for record in self.pending(limit):
+            if deadline is not None and deadline.expired():
+                break
+            
+            success, error = webhook_service.send_webhook(
+                record["url"], record["payload"],
+                compress=record.get("compress", False),
+                deadline=deadline,
+                defer=False,
+            )
+            if success:
+                delivered += 1
+                self.remove(record["id"])
+                continue
+            
+            if (error or "").startswith(CIRCUIT_OPEN_PREFIX):
+                skipped += 1
+                continue
+            
+            failed += 1
+            record["drain_attempts"] = record.get("drain_attempts", 0) + 1
+            if record["drain_attempts"] >= max_drain_attempts:
+                dropped += 1
+                self.remove(record["id"])
+            else:
+                self._write(record)
+        
+        return {"delivered": delivered, "failed": failed, "dropped": dropped, "skipped": skipped,
+                "remaining": len(self.pending())}
@@ -0,0 +1,190 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from idempotency import request_hash
+from job_store import RUNNING
+from payload import encode_json
+
+
+# Clave del evento con el que el handler se auto-invoca para procesar un job
+JOB_EVENT_KEY = "qa_job"
+
+# Límite de payload de invocaciones asíncronas de Lambda (con margen)
+_MAX_EVENT_BYTES = 250 * 1024
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Workers locales en curso (modo servidor / offline), acotados por JOB_LOCAL_WORKERS
+_LOCAL_WORKERS: List[subprocess.Popen] = []
+_LOCAL_LOCK = threading.Lock()
+
+
+class JobInProgressError(RuntimeError):
+    """Otro intento con el mismo reference_id sigue en curso al vencer el presupuesto del worker"""
+
+
+def is_async_job_request(body: Any) -> bool:
+    """Indica si el request pide modo job (qa.async_job = true)"""
+    return isinstance(body, dict) and isinstance(body.get("qa"), dict) and body["qa"].get("async_job") is True
+
+
+class JobRunner:
+    """
+    Modo job asíncrono: acepta el request, lo persiste y lo procesa en segundo plano.
+    
+    El trabajo se entrega a una invocación asíncrona de la misma función
+    Lambda (InvocationType=Event); fuera de Lambda (modo servidor/offline)
+    se lanza un proceso worker local. Si no se puede despachar el job queda
+    fallido y se responde 503. El resultado se entrega por webhook y queda
+    en el job store. Un submit repetido con el mismo reference_id y body
+    recibe el job existente sin volver a despacharlo.
+    """
+    
+    def __init__(self, controller, store, config, logger):
+        self.controller = controller
+        self.store = store
+        self.config = config
+        self.logger = logger
+    
+    def submit(self, body: Dict[str, Any], lambda_client=None, function_name: str = "") -> Tuple[int, Dict[str, Any]]:
+        """
+        Valida, registra y despacha el job.
+        
+        Returns:
+            Tuple con (status_code, body): 202 si se aceptó (o ya existía), 400 si
+            el request es inválido, 409 si el reference_id ya tiene un job con otro
+            body, 503 si no se pudo despachar
+        """
+        validation = self.controller.validator.validate_request(body)
+        if not validation.get("valid", False):
+            error = validation.get("error", {})
+            return 400, self.controller._create_error_response(
+                error.get("codigo", "BAD_REQUEST"), error.get("detalle", "Validation failed"), body.get("reference_id")
+            )
+        
+        reference_id = body["reference_id"]
+        job, created = self.store.create_if_absent(reference_id, body)
+        if not created:
+            if request_hash(self.store.get_request(reference_id) or {}) != request_hash(body):
+                return 409, self.controller._create_error_response(
+                    "CONFLICT", f"reference_id {reference_id} already has a job with a different body", reference_id
+                )
+            self.logger.event("job.duplicate", id=reference_id, estado=job["estado"])
+            return 202, self._accepted(reference_id, job)
+        
+        dispatcher, error = self._dispatch(reference_id, body, lambda_client, function_name)
+        if dispatcher is None:
+            # Nadie va a procesar el job: no dejarlo pendiente para siempre
+            self.store.fail(reference_id, f"Dispatch failed: {error}")
+            self.logger.event("job.dispatch_failed", id=reference_id, error=error)
+            return 503, self.controller._create_error_response(
+                "UNAVAILABLE", f"Could not dispatch job: {error}", reference_id
+            )
+        self.logger.event("job.accepted", id=reference_id, dispatcher=dispatcher,
+                          total_preguntas=job["total_preguntas"])
+        return 202, self._accepted(reference_id, job)
+    
+    def _accepted(self, reference_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Body de la respuesta 202 con el estado del job y la URL de polling"""
+        return {
+            "success": True,
+            "reference_id": reference_id,
+            "job_id": reference_id,
+            "estado": job["estado"],
+            "status_url": f"{self.config.results_base_url.rstrip('/')}/jobs/{quote(reference_id, safe='')}",
+            "retry_after": self.config.job_retry_after,
+        }
+    
+    def _dispatch(self, reference_id: str, body: Dict[str, Any], lambda_client,
+                  function_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Auto-invoca la función Lambda o, fuera de Lambda, lanza un worker local.
+        
+        En Lambda no hay fallback a un proceso local: al responder el 202 el
+        contenedor se congela y el proceso hijo no termina el job.
+        
+        Returns:
+            Tuple con ("lambda" | "local", None) o (None, error)
+        """
+        if function_name:
+            if lambda_client is None:
+                return None, "Lambda client unavailable"
+            event = {JOB_EVENT_KEY: {"reference_id": reference_id, "request": body}}
+            payload = json.dumps(event, ensure_ascii=False).encode("utf-8")
+            if len(payload) > _MAX_EVENT_BYTES:
+                # El worker leerá el request desde el job store
+                payload = json.dumps({JOB_EVENT_KEY: {"reference_id": reference_id}}).encode("utf-8")
+            try:
+                lambda_client.invoke(FunctionName=function_name, InvocationType="Event", Payload=payload)
+                return "lambda", None
+            except Exception as e:
+                return None, str(e)
+        
+        with _LOCAL_LOCK:
+            _LOCAL_WORKERS[:] = [worker for worker in _LOCAL_WORKERS if worker.poll() is None]
+            if len(_LOCAL_WORKERS) >= self.config.job_local_workers:
+                return None, f"{len(_LOCAL_WORKERS)} local job workers already running"
+            try:
+                _LOCAL_WORKERS.append(subprocess.Popen(
+                    [sys.executable, os.path.join(_BASE_DIR, "job_worker.py"), reference_id],
+                    cwd=_BASE_DIR,
+                    start_new_session=True,
+                ))
+            except OSError as e:
+                return None, str(e)
+        return "local", None
+    
+    def run(self, reference_id: str, request: Optional[Dict[str, Any]] = None, deadline=None) -> Dict[str, Any]:
+        """
+        Procesa un job (lado worker) y guarda el resultado en el job store.
+        
+        Si otro intento con el mismo reference_id tiene el reclamo de
+        idempotencia, se espera (hasta el deadline) a su resultado guardado.
+        Si sigue en curso, el job vuelve a pendiente y se lanza
+        JobInProgressError: en Lambda la invocación falla y el reintento
+        asíncrono llega cuando el reclamo del intento colgado ya expiró.
+        """
+        if request is None:
+            request = self.store.get_request(reference_id)
+        if request is None:
+            self.logger.event("job.not_found", id=reference_id)
+            return self.controller._create_error_response("BAD_REQUEST", f"Unknown job {reference_id}", reference_id)
+        
+        self.store.mark_running(reference_id)
+        self.logger.event("job.running", id=reference_id)
+        
+        try:
+            # Procesar como request síncrono (el webhook se envía dentro del controller)
+            body = dict(request, qa=dict(request["qa"], async_job=False))
+            result = self.controller.handle_request(
+                body,
+                on_progress=lambda respondidas, total: self.store.set_progress(reference_id, respondidas),
+                deadline=deadline,
+                idempotency_wait=float("inf"),
+            )
+            if self.controller.webhook_batcher is not None:
+                self.controller.webhook_batcher.flush_all(deadline)
+            
+            if result.get("estado") == RUNNING and "qa_resultados" not in result:
+                # Placeholder de idempotencia: el otro intento no terminó dentro del
+                # presupuesto (o murió sin liberar); no cerrar el job como exitoso
+                self.store.mark_pending(reference_id)
+                self.logger.event("job.duplicate_in_progress", id=reference_id)
+                raise JobInProgressError(f"Job {reference_id} is still in progress in another attempt")
+            
+            self.store.complete(reference_id, encode_json(result), bool(result.get("success")),
+                                respondidas=len(result.get("qa_resultados") or []))
+            self.logger.event("job.completed", id=reference_id, success=bool(result.get("success")))
+            return result
+        
+        except JobInProgressError:
+            raise
+        except Exception as e:
+            self.store.fail(reference_id, str(e))
+            self.logger.event("job.failed", id=reference_id, error=str(e))
+            return self.controller._create_error_response("MODEL_ERROR", f"Internal error: {str(e)}", reference_id)
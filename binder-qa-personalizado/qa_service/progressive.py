@@ -0,0 +1,118 @@
+import threading
+from typing import Dict, Any, List, Optional
+
+
+class ProgressiveDelivery:
+    """
+    Entrega progresiva: un webhook por respuesta apenas está lista y un
+    evento final de completado.
+    
+    Garantías:
+    - `secuencia` es estrictamente creciente (1, 2, ...) en el orden de envío;
+      el evento `completado` siempre lleva la última secuencia y se envía
+      después de que todos los eventos `respuesta` terminaron su entrega.
+    - Cada `pregunta_orden` se emite como máximo una vez por request; un
+      reintento HTTP reenvía exactamente el mismo evento (mismo `evento_id`),
+      por lo que el receptor debe deduplicar por (reference_id, pregunta_orden)
+      o por `evento_id`.
+    - Los eventos se envían de a uno, pero una entrega estacionada para envío
+      diferido puede llegar después de eventos posteriores: el receptor debe
+      ordenar por `secuencia` o `pregunta_orden` y usar `total_preguntas` del
+      evento final para detectar faltantes.
+    """
+    
+    def __init__(self, webhook_service, webhook_urls: List[str], reference_id: str,
+                 total_preguntas: int, compress: Optional[bool] = None, logger=None, deadline=None):
+        self.webhook_service = webhook_service
+        self.webhook_urls = list(webhook_urls)
+        self.reference_id = reference_id
+        self.total_preguntas = total_preguntas
+        self.compress = compress
+        self.deadline = deadline
+        self.logger = logger or webhook_service.logger
+        self._secuencia = 0
+        self._emitidas = set()
+        self._entregados = 0
+        self._lock = threading.Lock()
+    
+    def _next(self, pregunta_orden: Optional[int] = None) -> Optional[int]:
+        """Reserva la siguiente secuencia (None si la pregunta ya fue emitida)"""
+        with self._lock:
+            if pregunta_orden is not None:
+                if pregunta_orden in self._emitidas:
+                    return None
+                self._emitidas.add(pregunta_orden)
+            self._secuencia += 1
+            return self._secuencia
+    
+    def _send(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        entregas = self.webhook_service.send_webhooks(self.webhook_urls, event, compress=self.compress,
+                                                      deadline=self.deadline)
+        if all(e["estado"] == "entregado" for e in entregas):
+            with self._lock:
+                self._entregados += 1
+        return entregas
+    
+    def emit_answers(self, resultados: List[Dict[str, Any]]) -> int:
+        """
+        Envía un evento `respuesta` por cada resultado aún no emitido.
+        
+        Returns:
+            Número de eventos enviados (los duplicados se descartan)
+        """
+        enviados = 0
+        for resultado in sorted(resultados, key=lambda r: r["pregunta_orden"]):
+            pregunta_orden = resultado["pregunta_orden"]
+            secuencia = self._next(pregunta_orden)
+            if secuencia is None:
+                self.logger.event("webhook.progressive_duplicate", id=self.reference_id,
+                                  pregunta_orden=pregunta_orden)
+                continue
+            
+            self._send({
+                "evento": "respuesta",
+                "evento_id": f"{self.reference_id}:{pregunta_orden}",
+                "reference_id": self.reference_id,
+                "pregunta_orden": pregunta_orden,
+                "secuencia": secuencia,
+                "total_preguntas": self.total_preguntas,
+                "resultado": resultado,
+            })
+            enviados += 1
+        
+        self.logger.event("webhook.progressive_emitted", id=self.reference_id, events=enviados,
+                          emitted_total=len(self._emitidas), total=self.total_preguntas)
+        return enviados
+    
+    def complete(self, success: bool, metadatos: Optional[Dict[str, Any]] = None,
+                 error: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Envía el evento final `completado`.
+        
+        Returns:
+            Estado de entrega por endpoint del evento final
+        """
+        secuencia = self._next()
+        event = {
+            "evento": "completado",
+            "evento_id": f"{self.reference_id}:completado",
+            "reference_id": self.reference_id,
+            "secuencia": secuencia,
+            "success": success,
+            "total_preguntas": self.total_preguntas,
+            "respuestas_emitidas": len(self._emitidas),
+        }
+        if metadatos is not None:
+            event["metadatos"] = metadatos
+        if error is not None:
+            event["error"] = error
+        
+        entregas = self._send(event)
+        self.logger.event("webhook.progressive_completed", id=self.reference_id, success=success,
+                          events=secuencia, delivered_events=self._entregados)
+        return entregas
+    
+    @property
+    def eventos(self) -> int:
+        """Eventos enviados hasta ahora (incluye el final)"""
+        return self._secuencia
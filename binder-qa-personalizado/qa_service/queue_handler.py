@@ -0,0 +1,139 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+
+SQS_EVENT_SOURCE = "aws:sqs"
+
+# Errores que no se corrigen reintentando: el mensaje se descarta (y se loguea)
+_PERMANENT_ERRORS = ("BAD_REQUEST", "CONFLICT", "NOT_FOUND")
+
+
+def is_queue_event(event: Any) -> bool:
+    """Indica si el evento es un lote de mensajes SQS"""
+    if not isinstance(event, dict):
+        return False
+    records = event.get("Records")
+    return isinstance(records, list) and bool(records) and all(
+        isinstance(r, dict) and r.get("eventSource") == SQS_EVENT_SOURCE for r in records
+    )
+
+
+class QueueBatchProcessor:
+    """
+    Procesa un lote de mensajes de cola (SQS) con concurrencia acotada.
+    
+    Cada mensaje lleva en `body` el mismo JSON de una invocación directa.
+    Retorna `batchItemFailures` para que solo se reentreguen los mensajes
+    que fallaron por causas transitorias (requiere ReportBatchItemFailures
+    en el event source mapping). Los mensajes inválidos se descartan.
+    
+    En colas FIFO los mensajes de un mismo MessageGroupId se procesan en
+    orden y, tras el primer fallo, el resto del grupo se reporta como
+    fallido sin procesar para no romper el orden.
+    """
+    
+    def __init__(self, controller, config, logger):
+        self.controller = controller
+        self.config = config
+        self.logger = logger
+    
+    def process(self, event: Dict[str, Any], deadline) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Procesa el lote dentro del presupuesto de la invocación.
+        
+        Returns:
+            {"batchItemFailures": [{"itemIdentifier": messageId}, ...]}
+        """
+        start = time.perf_counter()
+        records = event.get("Records") or []
+        groups = self._groups(records)
+        
+        workers = max(1, min(self.config.queue_workers, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qa-queue") as pool:
+            outcomes = [o for group in pool.map(lambda g: self._process_group(g, deadline), groups) for o in group]
+        
+        if self.controller.webhook_batcher is not None:
+            self.controller.webhook_batcher.flush_all(deadline)
+        
+        failures = [{"itemIdentifier": message_id} for message_id, outcome in outcomes if outcome == "retry"]
+        counts = {}
+        for _, outcome in outcomes:
+            counts[outcome] = counts.get(outcome, 0) + 1
+        self.logger.event(
+            "queue.batch_done",
+            records=len(records),
+            groups=len(groups),
+            workers=workers,
+            ms=int((time.perf_counter() - start) * 1000),
+            **counts,
+        )
+        return {"batchItemFailures": failures}
+    
+    def _groups(self, records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Agrupa por MessageGroupId en colas FIFO; en colas estándar cada mensaje es su propio grupo"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            is_fifo = (record.get("eventSourceARN") or "").endswith(".fifo")
+            group_id = (record.get("attributes") or {}).get("MessageGroupId") if is_fifo else None
+            groups.setdefault(group_id or record.get("messageId", ""), []).append(record)
+        return list(groups.values())
+    
+    def _process_group(self, records: List[Dict[str, Any]], deadline) -> List[Tuple[str, str]]:
+        outcomes = []
+        blocked = False
+        for record in records:
+            message_id = record.get("messageId", "")
+            if blocked:
+                outcomes.append((message_id, "retry"))
+                continue
+            outcome = self._process_record(record, deadline)
+            outcomes.append((message_id, outcome))
+            blocked = outcome == "retry"
+        return outcomes
+    
+    def _process_record(self, record: Dict[str, Any], deadline) -> str:
+        """
+        Procesa un mensaje.
+        
+        Returns:
+            "ok", "retry" (se reentrega) o "dropped" (inválido, no se reentrega)
+        """
+        message_id = record.get("messageId", "")
+        
+        # Sin tiempo para una llamada útil: devolver el mensaje a la cola sin intentarlo
+        if not deadline.can_fit(self.config.openai_min_attempt_time):
+            self.logger.event("queue.record_deferred", message_id=message_id,
+                              remaining_s=round(deadline.remaining(), 2))
+            return "retry"
+        
+        try:
+            body = json.loads(record.get("body") or "")
+        except (TypeError, ValueError) as e:
+            self.logger.event("queue.record_dropped", message_id=message_id, reason=f"Invalid JSON body: {str(e)}")
+            return "dropped"
+        if not isinstance(body, dict):
+            self.logger.event("queue.record_dropped", message_id=message_id, reason="Body must be a JSON object")
+            return "dropped"
+        
+        try:
+            result = self.controller.handle_request(body, deadline=deadline)
+        except Exception as e:
+            self.logger.event("queue.record_error", message_id=message_id, id=body.get("reference_id"), error=str(e))
+            return "retry"
+        
+        if result.get("success") and result.get("estado") != "procesando":
+            return "ok"
+        
+        codigo = (result.get("error") or {}).get("codigo")
+        if codigo in _PERMANENT_ERRORS:
+            self.logger.event("queue.record_dropped", message_id=message_id, id=body.get("reference_id"),
+                              reason=codigo, detalle=result["error"].get("detalle"))
+            return "dropped"
+        
+        # Error transitorio (modelo, timeout) o un intento previo aún en curso: reintentar más tarde
+        self.logger.event("queue.record_failed", message_id=message_id, id=body.get("reference_id"),
+                          codigo=codigo or "IN_PROGRESS",
+                          receive_count=(record.get("attributes") or {}).get("ApproximateReceiveCount"))
+        return "retry"
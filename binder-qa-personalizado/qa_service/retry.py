@@ -0,0 +1,83 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from deadline import Deadline
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Interpreta el header Retry-After (segundos o fecha HTTP).
+    
+    Returns:
+        Segundos a esperar, o None si el header no existe o no es válido
+    """
+    if not value:
+        return None
+    
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class RetryScheduler:
+    """
+    Planifica reintentos dentro de un deadline.
+    
+    Usa backoff con "decorrelated jitter" (cada espera es aleatoria entre la
+    base y el triple de la anterior, con tope) para que muchos envíos que
+    fallan contra el mismo endpoint no reintenten sincronizados. Respeta
+    Retry-After y solo autoriza un intento si cabe en el tiempo restante.
+    """
+    
+    def __init__(
+        self,
+        deadline: Deadline,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        attempt_timeout: float,
+        min_attempt_time: float,
+        rng: Optional[random.Random] = None,
+    ):
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.attempt_timeout = attempt_timeout
+        self.min_attempt_time = min_attempt_time
+        self.attempts = 0
+        self._prev_delay = self.base_delay
+        self._rng = rng or random.Random()
+    
+    def can_attempt(self, delay: float = 0.0) -> bool:
+        """Indica si un intento que empieza tras `delay` segundos cabe en el presupuesto"""
+        if self.attempts >= self.max_attempts:
+            return False
+        return self.deadline.can_fit(delay + self.min_attempt_time)
+    
+    def timeout_for_attempt(self) -> float:
+        """Timeout del próximo intento, recortado al tiempo restante"""
+        return self.deadline.timeout_for(self.attempt_timeout)
+    
+    def record_attempt(self) -> None:
+        self.attempts += 1
+    
+    def next_delay(self, retry_after: Optional[float] = None) -> float:
+        """Espera antes del próximo intento"""
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            upper = max(self.base_delay, self._prev_delay * 3)
+            delay = min(self.max_delay, self._rng.uniform(self.base_delay, upper))
+        self._prev_delay = max(self.base_delay, delay)
+        return delay
@@ -1,6 +1,8 @@
 from typing import Dict, Any, List, Optional
 from urllib.parse import urlparse
 
+from contract_store import is_contract_hash
+
 
 class QAValidator:
     """Validador para entrada de QA personalizado"""
@@ -22,20 +24,41 @@ class QAValidator:
             if not isinstance(body, dict):
                 return self._error("BAD_REQUEST", "Request body must be a JSON object")
             
-            # Validar campos requeridos
-            if "texto_contrato" not in body:
+            # Validar campos requeridos (el contrato puede ir inline o por referencia)
+            fuentes = [k for k in ("texto_contrato", "contrato_url", "contrato_hash") if k in body]
+            if not fuentes:
                 return self._error("BAD_REQUEST", "Missing required field: texto_contrato")
             
+            if len(fuentes) > 1:
+                return self._error("BAD_REQUEST", "Provide only one of texto_contrato, contrato_url or contrato_hash")
+            
             if "reference_id" not in body:
                 return self._error("BAD_REQUEST", "Missing required field: reference_id")
             
             if "qa" not in body:
                 return self._error("BAD_REQUEST", "Missing required field: qa")
             
-            # Validar texto_contrato
-            texto_contrato = body.get("texto_contrato")
-            if not isinstance(texto_contrato, str) or len(texto_contrato.strip()) < self.config.min_chars_contrato:
-                return self._error("BAD_REQUEST", f"texto_contrato must be a string with at least {self.config.min_chars_contrato} characters")
+            # Validar texto_contrato o su referencia
+            if "texto_contrato" in body:
+                texto_contrato = body.get("texto_contrato")
+                if not isinstance(texto_contrato, str) or len(texto_contrato.strip()) < self.config.min_chars_contrato:
+                    return self._error("BAD_REQUEST", f"texto_contrato must be a string with at least {self.config.min_chars_contrato} characters")
+            
+            if "contrato_hash" in body and not is_contract_hash(body.get("contrato_hash")):
+                return self._error("BAD_REQUEST", "contrato_hash must be a lowercase hex SHA-256")
+            
+            if "contrato_url" in body:
+                contrato_url = body.get("contrato_url")
+                if not isinstance(contrato_url, str):
+                    return self._error("BAD_REQUEST", "contrato_url must be a string")
+                
+                # Sin lista de dominios permitidos la descarga por URL está deshabilitada
+                if not self.config.contract_url_allowed_domains:
+                    return self._error("BAD_REQUEST", "contrato_url is disabled: CONTRACT_URL_ALLOWED_DOMAINS is not configured")
+                
+                url_valid, url_error = self._validate_url(contrato_url, False, self.config.contract_url_allowed_domains)
+                if not url_valid:
+                    return self._error("BAD_REQUEST", f"Invalid contrato_url: {url_error}")
             
             # Validar reference_id
             reference_id = body.get("reference_id")
@@ -79,6 +102,56 @@ class QAValidator:
                 if not webhook_valid:
                     return self._error("BAD_REQUEST", f"Invalid webhook_url: {webhook_error}")
             
+            # Validar webhook_urls si está presente (entrega a varios endpoints)
+            webhook_urls = qa_section.get("webhook_urls")
+            if webhook_urls is not None:
+                if not isinstance(webhook_urls, list) or len(webhook_urls) == 0:
+                    return self._error("BAD_REQUEST", "webhook_urls must be a non-empty array")
+                
+                if len(webhook_urls) > self.config.max_webhook_targets:
+                    return self._error("BAD_REQUEST", f"Maximum {self.config.max_webhook_targets} webhook_urls allowed")
+                
+                for i, url in enumerate(webhook_urls):
+                    if not isinstance(url, str):
+                        return self._error("BAD_REQUEST", f"webhook_urls[{i}] must be a string")
+                    
+                    webhook_valid, webhook_error = self._validate_webhook_url(url)
+                    if not webhook_valid:
+                        return self._error("BAD_REQUEST", f"Invalid webhook_urls[{i}]: {webhook_error}")
+            
+            # Validar webhook_mode si está presente
+            webhook_mode = qa_section.get("webhook_mode")
+            if webhook_mode is not None and webhook_mode not in ("final", "progressive"):
+                return self._error("BAD_REQUEST", "webhook_mode must be 'final' or 'progressive'")
+            
+            # Validar webhook_claim_check si está presente
+            webhook_claim_check = qa_section.get("webhook_claim_check")
+            if webhook_claim_check is not None and not isinstance(webhook_claim_check, bool):
+                return self._error("BAD_REQUEST", "webhook_claim_check must be a boolean")
+            
+            # Validar async_job si está presente
+            async_job = qa_section.get("async_job")
+            if async_job is not None and not isinstance(async_job, bool):
+                return self._error("BAD_REQUEST", "async_job must be a boolean")
+            
+            # Validar webhook_gzip si está presente
+            webhook_gzip = qa_section.get("webhook_gzip")
+            if webhook_gzip is not None and not isinstance(webhook_gzip, bool):
+                return self._error("BAD_REQUEST", "webhook_gzip must be a boolean")
+            
+            # Validar resultados_parciales / continuar_pendientes si están presentes
+            for flag in ("resultados_parciales", "continuar_pendientes"):
+                value = qa_section.get(flag)
+                if value is not None and not isinstance(value, bool):
+                    return self._error("BAD_REQUEST", f"{flag} must be a boolean")
+            
+            # Validar pregunta_ordenes (requests de continuación): un orden original por pregunta
+            pregunta_ordenes = qa_section.get("pregunta_ordenes")
+            if pregunta_ordenes is not None:
+                if (not isinstance(pregunta_ordenes, list) or len(pregunta_ordenes) != len(preguntas)
+                        or not all(isinstance(o, int) and not isinstance(o, bool) and o >= 1 for o in pregunta_ordenes)):
+                    return self._error("BAD_REQUEST", "pregunta_ordenes must be an array of positive integers, one per pregunta")
+            
             # Validar incluir_razonamiento si está presente
             incluir_razonamiento = qa_section.get("incluir_razonamiento")
             if incluir_razonamiento is not None and not isinstance(incluir_razonamiento, bool):
@@ -91,6 +164,10 @@ class QAValidator:
     
     def _validate_webhook_url(self, url: str) -> tuple[bool, Optional[str]]:
         """Valida URL de webhook"""
+        return self._validate_url(url, self.config.require_https_webhook, self.config.allowed_webhook_domains)
+    
+    def _validate_url(self, url: str, require_https: bool, allowed_domains) -> tuple[bool, Optional[str]]:
+        """Valida esquema y dominio de una URL (webhook o contrato_url)"""
         try:
             parsed = urlparse(url)
             
@@ -99,18 +176,18 @@ class QAValidator:
                 return False, "URL must use http or https scheme"
             
             # Verificar HTTPS si está requerido
-            if self.config.require_https_webhook and parsed.scheme != "https":
+            if require_https and parsed.scheme != "https":
                 return False, "URL must use HTTPS"
             
             # Verificar dominio si hay restricciones
-            if self.config.allowed_webhook_domains:
+            if allowed_domains:
                 hostname = parsed.hostname
                 if not hostname:
                     return False, "Invalid hostname"
                 
                 hostname_lower = hostname.lower()
                 allowed = False
-                for allowed_domain in self.config.allowed_webhook_domains:
+                for allowed_domain in allowed_domains:
                     if hostname_lower == allowed_domain.lower() or hostname_lower.endswith("." + allowed_domain.lower()):
                         allowed = True
                         break
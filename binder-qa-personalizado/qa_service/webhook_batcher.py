@@ -0,0 +1,229 @@
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List
+from urllib.parse import urlparse
+
+from deadline import Deadline
+from .webhook_service import DEFERRED_PREFIX, http_status_from_error
+
+
+# Códigos con los que un endpoint indica que no acepta un array como body
+_BATCH_REJECT_CODES = (400, 404, 405, 413, 415, 422)
+
+# Máximo de ítems cuyo estado se conserva para consulta
+_MAX_TRACKED_ITEMS = 10000
+
+
+@dataclass
+class BatchItem:
+    """Resultado encolado para entrega agrupada"""
+    item_id: str
+    url: str
+    payload: Dict[str, Any]
+    compress: Optional[bool] = None
+    status: str = "pending"  # pending | sent | sent_single | deferred | failed
+    error: Optional[str] = None
+    batch_id: Optional[str] = None
+
+
+class WebhookBatcher:
+    """
+    Agrupa resultados por endpoint y los entrega como un solo array JSON.
+    
+    Un lote se envía cuando se cumple la ventana de tiempo o se alcanza el
+    máximo de ítems. Si el endpoint rechaza el array (o está configurado
+    como no compatible) los ítems se entregan uno por uno. Lo que no cabe
+    en el deadline del flush se estaciona para envío diferido.
+    """
+    
+    def __init__(self, webhook_service, window_seconds: float = 0.5, max_items: int = 25,
+                 unsupported_hosts: tuple = (), logger=None):
+        self.webhook_service = webhook_service
+        self.window_seconds = window_seconds
+        self.max_items = max(1, max_items)
+        self.logger = logger or webhook_service.logger
+        self._unsupported_hosts = {h.lower() for h in unsupported_hosts}
+        self._queues: Dict[str, List[BatchItem]] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._items: "OrderedDict[str, BatchItem]" = OrderedDict()
+        self._requests: Dict[str, int] = {}
+        self._delivered: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def rebind(self, webhook_service) -> None:
+        """Usa el WebhookService de un controller reconstruido (también para los lotes pendientes)"""
+        with self._lock:
+            self.webhook_service = webhook_service
+    
+    def _supports_batch(self, url: str) -> bool:
+        return (urlparse(url).hostname or "").lower() not in self._unsupported_hosts
+    
+    def submit(self, url: str, payload: Dict[str, Any], compress: Optional[bool] = None) -> str:
+        """
+        Encola un resultado para el endpoint.
+        
+        Args:
+            url: Endpoint del webhook
+            payload: Resultado a entregar
+            compress: Opt-in gzip del request (None = según WEBHOOK_GZIP_HOSTS)
+        
+        Returns:
+            ID del ítem para consultar su estado con `status`
+        """
+        item = BatchItem(item_id=uuid.uuid4().hex, url=url, payload=payload, compress=compress)
+        flush_now = False
+        
+        with self._lock:
+            self._items[item.item_id] = item
+            while len(self._items) > _MAX_TRACKED_ITEMS:
+                self._items.popitem(last=False)
+            
+            queue = self._queues.setdefault(url, [])
+            queue.append(item)
+            if len(queue) >= self.max_items:
+                flush_now = True
+            elif url not in self._timers:
+                timer = threading.Timer(self.window_seconds, self.flush, args=(url,))
+                timer.daemon = True
+                self._timers[url] = timer
+                timer.start()
+        
+        if flush_now:
+            self.flush(url)
+        
+        return item.item_id
+    
+    def status(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de entrega de un ítem"""
+        item = self._items.get(item_id)
+        if item is None:
+            return None
+        return {"item_id": item.item_id, "url": item.url, "status": item.status,
+                "error": item.error, "batch_id": item.batch_id}
+    
+    def flush(self, url: str, deadline: Optional[Deadline] = None) -> None:
+        """
+        Entrega los ítems pendientes de un endpoint.
+        
+        Args:
+            url: Endpoint del webhook
+            deadline: Presupuesto para los envíos y sus reintentos (None =
+                MAX_TOTAL_TIMEOUT, p.ej. el timer de la ventana); lo que no
+                alcance a enviarse queda estacionado
+        """
+        with self._lock:
+            items = self._queues.pop(url, [])
+            timer = self._timers.pop(url, None)
+        if timer is not None:
+            timer.cancel()
+        if not items:
+            return
+        
+        batch_id = uuid.uuid4().hex
+        for item in items:
+            item.batch_id = batch_id
+        
+        if len(items) > 1 and self._supports_batch(url):
+            self._count_request(url)
+            # Basta con que un request haya declarado que el endpoint acepta gzip
+            compress = True if any(item.compress for item in items) else None
+            success, error = self.webhook_service.send_webhook(url, [item.payload for item in items],
+                                                               compress=compress, deadline=deadline)
+            if success:
+                self._mark(items, "sent")
+                self._log_flush(url, batch_id, items, batched=True)
+                return
+            
+            status = http_status_from_error(error)
+            if status not in _BATCH_REJECT_CODES:
+                self._mark(items, self._failure_status(error), error)
+                self._log_flush(url, batch_id, items, batched=True, error=error)
+                return
+            
+            # El endpoint no acepta arrays: recordar y entregar uno por uno
+            with self._lock:
+                self._unsupported_hosts.add((urlparse(url).hostname or "").lower())
+            self.logger.event("webhook.batch_unsupported", url=url, status_code=status)
+        
+        for item in items:
+            self._count_request(url)
+            success, error = self.webhook_service.send_webhook(url, item.payload, compress=item.compress,
+                                                               deadline=deadline)
+            self._mark([item], "sent_single" if success else self._failure_status(error), error)
+        self._log_flush(url, batch_id, items, batched=False)
+    
+    def flush_all(self, deadline: Optional[Deadline] = None) -> None:
+        """
+        Entrega todos los lotes pendientes (p.ej. antes de que Lambda congele el contenedor).
+        
+        Con el deadline de la invocación los envíos no pueden exceder su
+        timeout: lo que no cabe se estaciona en el almacén diferido.
+        """
+        with self._lock:
+            urls = list(self._queues.keys())
+        for url in urls:
+            self.flush(url, deadline=deadline)
+    
+    def request_counts(self) -> Dict[str, Dict[str, int]]:
+        """Requests HTTP enviados e ítems entregados por endpoint"""
+        with self._lock:
+            return {
+                url: {"requests": self._requests.get(url, 0), "items": self._delivered.get(url, 0)}
+                for url in set(self._requests) | set(self._delivered)
+            }
+    
+    def _count_request(self, url: str) -> None:
+        with self._lock:
+            self._requests[url] = self._requests.get(url, 0) + 1
+    
+    def _failure_status(self, error: Optional[str]) -> str:
+        return "deferred" if (error or "").startswith(DEFERRED_PREFIX) else "failed"
+    
+    def _mark(self, items: List[BatchItem], status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            for item in items:
+                item.status = status
+                item.error = error
+                if status in ("sent", "sent_single"):
+                    self._delivered[item.url] = self._delivered.get(item.url, 0) + 1
+    
+    def _log_flush(self, url: str, batch_id: str, items: List[BatchItem], batched: bool,
+                   error: Optional[str] = None) -> None:
+        self.logger.event(
+            "webhook.batch_flush",
+            url=url,
+            batch_id=batch_id,
+            items=len(items),
+            batched=batched,
+            failed=sum(1 for item in items if item.status == "failed"),
+            requests_total=self._requests.get(url, 0),
+            error=error,
+        )
+
+
+_SHARED_BATCHER: Optional[WebhookBatcher] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_webhook_batcher(webhook_service, config) -> WebhookBatcher:
+    """
+    Batcher compartido por el contenedor (los lotes agrupan resultados de varios requests).
+    
+    Si el controller se reconstruyó, el batcher pasa a usar su WebhookService
+    en lugar de seguir referenciando el del controller descartado.
+    """
+    global _SHARED_BATCHER
+    if _SHARED_BATCHER is None:
+        with _SHARED_LOCK:
+            if _SHARED_BATCHER is None:
+                _SHARED_BATCHER = WebhookBatcher(
+                    webhook_service,
+                    window_seconds=config.webhook_batch_window_ms / 1000.0,
+                    max_items=config.webhook_batch_max_items,
+                    unsupported_hosts=config.webhook_batch_unsupported_hosts,
+                )
+    if _SHARED_BATCHER.webhook_service is not webhook_service:
+        _SHARED_BATCHER.rebind(webhook_service)
+    return _SHARED_BATCHER
@@ -1,19 +1,49 @@
-import json
+import re
 import time
 import socket
-from typing import Dict, Any, Optional, Tuple
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import urlparse
-import ssl
+
+from http_pool import PooledHTTPTransport, PoolTimeout, get_shared_transport
+from compression import maybe_gzip, compression_stats
+from payload import JSONPayload, encode_json
+from deadline import Deadline, deadline_or_default
+from .retry import RetryScheduler, parse_retry_after
+from .deferred_delivery import DeferredDeliveryStore
+from .circuit_breaker import CircuitBreakerRegistry, CIRCUIT_OPEN_PREFIX, get_circuit_breakers
+
+
+# Prefijo del mensaje de error cuando la entrega quedó estacionada para envío diferido
+DEFERRED_PREFIX = "Deferred"
+
+# Errores 4xx que no se resuelven reintentando (408 y 429 sí se reintentan)
+_RETRYABLE_4XX = (408, 429)
+_HTTP_STATUS_RE = re.compile(r"^HTTP (\d{3})")
+
+# Prefijo del error cuando no hubo slot en el pool local (no afecta la salud del host)
+_POOL_SATURATED_PREFIX = "Pool saturated"
+
+
+def http_status_from_error(error: Optional[str]) -> Optional[int]:
+    """Extrae el código HTTP de un mensaje de error de WebhookService"""
+    match = _HTTP_STATUS_RE.match(error or "")
+    return int(match.group(1)) if match else None
 
 
 class WebhookService:
     """Servicio para envío de webhooks con reintentos"""
     
-    def __init__(self, config, logger):
+    def __init__(self, config, logger, transport: Optional[PooledHTTPTransport] = None,
+                 deferred: Optional[DeferredDeliveryStore] = None,
+                 breakers: Optional[CircuitBreakerRegistry] = None):
         self.config = config
         self.logger = logger
+        # Transporte compartido: conexiones keep-alive, SSLContext y DNS se reutilizan entre envíos
+        self.transport = transport or get_shared_transport(config)
+        self.deferred = deferred or DeferredDeliveryStore(config.webhook_deferred_dir)
+        # Salud por host compartida por el contenedor: un endpoint caído no consume reintentos en cada resultado
+        self.breakers = breakers or get_circuit_breakers(config, logger)
     
     def _validate_webhook_url(self, webhook_url: str) -> Tuple[bool, Optional[str]]:
         """Valida la URL del webhook"""
@@ -43,13 +73,34 @@ class WebhookService:
         except Exception as e:
             return False, f"URL validation error: {str(e)}"
     
-    def send_webhook(self, webhook_url: str, payload: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+    def _wants_gzip(self, webhook_url: str) -> bool:
+        """Indica si el endpoint está configurado para recibir payloads gzip"""
+        if not self.config.webhook_gzip_hosts:
+            return False
+        hostname = (urlparse(webhook_url).hostname or "").lower()
+        return any(
+            hostname == host.lower() or hostname.endswith("." + host.lower())
+            for host in self.config.webhook_gzip_hosts
+        )
+    
+    def send_webhook(self, webhook_url: str, payload: Dict[str, Any],
+                     compress: Optional[bool] = None,
+                     deadline: Optional[Deadline] = None,
+                     defer: bool = True) -> Tuple[bool, Optional[str]]:
         """
-        Envía webhook con reintentos exponenciales.
+        Envía webhook con reintentos acotados por un deadline.
+        
+        El backoff usa jitter decorrelacionado y respeta Retry-After en
+        respuestas 429/503. Un intento solo se inicia si cabe en el tiempo
+        restante y el circuit breaker del host está cerrado; si no, la
+        entrega se estaciona para envío diferido.
         
         Args:
             webhook_url: URL del webhook
             payload: Datos a enviar
+            compress: Enviar con Content-Encoding: gzip (None = según WEBHOOK_GZIP_HOSTS)
+            deadline: Presupuesto de tiempo (None = MAX_TOTAL_TIMEOUT)
+            defer: Estacionar la entrega si el presupuesto no alcanza
             
         Returns:
             Tuple con (success, error_message)
@@ -60,104 +111,278 @@ class WebhookService:
             self.logger.event("webhook.validation_failed", url=webhook_url, error=validation_error)
             return False, validation_error
         
-        attempts = self.config.webhook_retry_attempts
-        backoff_base = self.config.webhook_backoff_base
+        if compress is None:
+            compress = self._wants_gzip(webhook_url)
+        
+        # Serializar una sola vez: el mismo buffer se usa en todos los reintentos
+        try:
+            data, headers = self._encode_body(webhook_url, payload, compress)
+        except Exception as e:
+            self.logger.event("webhook.serialization_error", url=webhook_url, error=str(e))
+            return False, f"Serialization error: {str(e)}"
+        
+        host = (urlparse(webhook_url).hostname or "").lower()
+        if not self.breakers.allow(host):
+            reason = f"{CIRCUIT_OPEN_PREFIX} for {host}"
+            self.logger.event("webhook.circuit_open", url=webhook_url, host=host)
+            return self._handoff(webhook_url, payload, compress, reason, None, defer)
+        
+        scheduler = RetryScheduler(
+            deadline=deadline_or_default(deadline, self.config.max_total_timeout),
+            max_attempts=self.config.webhook_retry_attempts,
+            base_delay=self.config.webhook_backoff_base,
+            max_delay=self.config.webhook_backoff_max,
+            attempt_timeout=self.config.webhook_timeout,
+            min_attempt_time=self.config.webhook_min_attempt_time,
+        )
         
         last_error = None
+        delay = 0.0
         
-        for attempt in range(attempts):
-            if attempt > 0:
-                # Backoff exponencial
-                delay = backoff_base ** attempt
-                self.logger.event("webhook.retry", attempt=attempt+1, delay=delay)
+        while scheduler.attempts < scheduler.max_attempts:
+            if scheduler.attempts > 0 and not self.breakers.allow(host):
+                # Otra entrega abrió el breaker del host entre reintentos
+                reason = f"{CIRCUIT_OPEN_PREFIX} for {host}"
+                self.logger.event("webhook.circuit_open", url=webhook_url, host=host)
+                return self._handoff(webhook_url, payload, compress, reason, last_error, defer)
+            
+            if not scheduler.can_attempt(delay):
+                reason = f"Insufficient time budget ({scheduler.deadline.remaining():.1f}s left)"
+                return self._handoff(webhook_url, payload, compress, reason, last_error, defer)
+            
+            if delay > 0:
+                self.logger.event("webhook.retry", attempt=scheduler.attempts+1, delay=round(delay, 3))
                 time.sleep(delay)
             
+            scheduler.record_attempt()
+            attempt = scheduler.attempts
+            retry_after = None
+            started = time.perf_counter()
             try:
-                success, error = self._send_single_webhook(webhook_url, payload)
+                success, error, retry_after = self._send_single_webhook(
+                    webhook_url, data, headers, timeout=scheduler.timeout_for_attempt()
+                )
+                self._record_health(host, success, error, started)
                 
                 if success:
-                    self.logger.event("webhook.success", attempt=attempt+1)
+                    self.logger.event("webhook.success", attempt=attempt)
+                    self.logger.event("webhook.host_health", **self.breakers.health(host))
                     return True, None
                 else:
                     last_error = error
-                    self.logger.event("webhook.failed", attempt=attempt+1, error=error)
+                    self.logger.event("webhook.failed", attempt=attempt, error=error)
+                    
+                    status = http_status_from_error(error)
+                    if status and 400 <= status < 500 and status not in _RETRYABLE_4XX:
+                        # El endpoint rechazó el payload: reintentar no cambia el resultado
+                        break
                     
             except Exception as e:
                 last_error = str(e)
-                self.logger.event("webhook.exception", attempt=attempt+1, error=str(e))
+                self.breakers.record(host, False, (time.perf_counter() - started) * 1000)
+                self.logger.event("webhook.exception", attempt=attempt, error=str(e))
+            
+            if self.breakers.is_open(host):
+                # El host se declaró caído durante esta entrega: no seguir reintentando inline
+                reason = f"{CIRCUIT_OPEN_PREFIX} for {host}"
+                return self._handoff(webhook_url, payload, compress, reason, last_error, defer)
+            
+            delay = scheduler.next_delay(retry_after)
         
-        self.logger.event("webhook.gave_up", attempts=attempts, final_error=last_error)
+        self.logger.event("webhook.gave_up", attempts=scheduler.attempts, final_error=last_error)
+        self.logger.event("webhook.host_health", **self.breakers.health(host))
         return False, last_error
     
-    def _send_single_webhook(self, webhook_url: str, payload: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
-        """Envía un solo webhook"""
+    def send_webhooks(self, webhook_urls: List[str], payload: Dict[str, Any],
+                      compress: Optional[bool] = None,
+                      deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """
+        Entrega el mismo payload a varios endpoints en paralelo.
+        
+        Cada entrega tiene sus propios reintentos, timeout y breaker; el
+        payload se serializa una sola vez y se comparte entre todas.
+        
+        Returns:
+            Lista (en el orden de `webhook_urls`) de dicts con url, estado
+            ("entregado" | "diferido" | "fallido"), error y latencia_ms
+        """
+        def deliver(url: str) -> Dict[str, Any]:
+            started = time.perf_counter()
+            try:
+                success, error = self.send_webhook(url, payload, compress=compress, deadline=deadline)
+            except Exception as e:
+                success, error = False, str(e)
+            
+            if success:
+                estado = "entregado"
+            elif (error or "").startswith(DEFERRED_PREFIX):
+                estado = "diferido"
+            else:
+                estado = "fallido"
+            return {
+                "url": url,
+                "estado": estado,
+                "error": error,
+                "latencia_ms": int((time.perf_counter() - started) * 1000),
+            }
+        
+        if len(webhook_urls) == 1:
+            results = [deliver(webhook_urls[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=len(webhook_urls), thread_name_prefix="webhook") as pool:
+                results = list(pool.map(deliver, webhook_urls))
+        
+        self.logger.event(
+            "webhook.fanout",
+            targets=len(results),
+            delivered=sum(1 for r in results if r["estado"] == "entregado"),
+            deferred=sum(1 for r in results if r["estado"] == "diferido"),
+            failed=sum(1 for r in results if r["estado"] == "fallido"),
+        )
+        return results
+    
+    def _record_health(self, host: str, success: bool, error: Optional[str], started: float) -> None:
+        """Registra el intento en la salud del host"""
+        latency_ms = (time.perf_counter() - started) * 1000
+        if success:
+            self.breakers.record(host, True, latency_ms)
+            return
+        
+        if (error or "").startswith(_POOL_SATURATED_PREFIX):
+            # Saturación del pool local: no dice nada de la salud del host
+            return
+        
+        # Un 4xx permanente significa que el host responde; cuenta como sano
+        status = http_status_from_error(error)
+        healthy = status is not None and 400 <= status < 500 and status not in _RETRYABLE_4XX
+        self.breakers.record(host, healthy, latency_ms)
+    
+    def _handoff(self, webhook_url: str, payload: Dict[str, Any], compress: bool,
+                 reason: str, last_error: Optional[str], defer: bool) -> Tuple[bool, Optional[str]]:
+        """
+        Estaciona la entrega para un envío posterior cuando no queda presupuesto.
+        
+        Sin `defer` retorna el error; si el breaker rechazó el intento el error
+        conserva CIRCUIT_OPEN_PREFIX para que quien llama (p.ej. drain) lo
+        distinga de un fallo de la entrega.
+        """
+        if not defer:
+            self.logger.event("webhook.gave_up", reason=reason, final_error=last_error)
+            if reason.startswith(CIRCUIT_OPEN_PREFIX):
+                return False, f"{reason} (last error: {last_error})" if last_error else reason
+            return False, last_error or reason
+        
+        try:
+            delivery_id = self.deferred.park(webhook_url, payload, reason, compress)
+            self.logger.event("webhook.deferred", url=webhook_url, delivery_id=delivery_id,
+                              reason=reason, last_error=last_error)
+            return False, f"{DEFERRED_PREFIX}: {reason}"
+        except Exception as e:
+            self.logger.event("webhook.defer_failed", url=webhook_url, error=str(e))
+            return False, last_error or reason
+    
+    def _encode_body(self, webhook_url: str, payload: Any, compress: bool) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Serializa (y opcionalmente comprime) el payload una sola vez por entrega.
+        
+        Un JSONPayload reutiliza su buffer cacheado, que también sirve para la
+        respuesta HTTP; el mismo body se reenvía en cada reintento.
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "Binder-QA-Service/1.0"
+        }
+        
+        # Compresión opt-in por endpoint
+        if compress:
+            if isinstance(payload, JSONPayload):
+                data = payload.to_bytes()
+                compressed, was_compressed = payload.gzip_bytes(
+                    self.config.compression_min_bytes, self.config.compression_level
+                )
+            else:
+                data = encode_json(payload)
+                compressed, was_compressed = maybe_gzip(
+                    data, self.config.compression_min_bytes, self.config.compression_level
+                )
+            if was_compressed:
+                self.logger.event("webhook.compressed", url=webhook_url,
+                                  **compression_stats(len(data), len(compressed)))
+                headers["Content-Encoding"] = "gzip"
+                return compressed, headers
+            return data, headers
+        
+        return encode_json(payload), headers
+    
+    def _send_single_webhook(self, webhook_url: str, data: bytes, headers: Dict[str, str],
+                             timeout: Optional[float] = None) -> Tuple[bool, Optional[str], Optional[float]]:
+        """
+        Envía un solo webhook con el body ya serializado.
+        
+        Returns:
+            Tuple con (success, error_message, retry_after_segundos)
+        """
+        if timeout is None:
+            timeout = self.config.webhook_timeout
+        
         try:
             # Log detallado del intento
             self.logger.event("webhook.attempt", 
                             url=webhook_url, 
-                            timeout=self.config.webhook_timeout,
-                            payload_size=len(json.dumps(payload)))
-            
-            # Preparar datos
-            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                            timeout=round(timeout, 3),
+                            payload_size=len(data))
             
-            # Crear request
-            req = Request(
+            # Enviar request por el pool de conexiones
+            response = self.transport.request(
+                "POST",
                 webhook_url,
-                data=data,
-                headers={
-                    "Content-Type": "application/json",
-                    "User-Agent": "Binder-QA-Service/1.0"
-                },
-                method="POST"
+                body=data,
+                headers=headers,
+                timeout=timeout,
             )
+            status_code = response.status
             
-            # Configurar SSL
-            ctx = ssl.create_default_context()
+            # Log respuesta con tiempos por fase
+            self.logger.event("webhook.response", 
+                            status_code=status_code,
+                            reused_connection=response.reused,
+                            **response.timings)
             
-            # Enviar request
-            with urlopen(req, timeout=self.config.webhook_timeout, context=ctx) as response:
-                status_code = response.getcode()
-                
-                # Log respuesta
-                self.logger.event("webhook.response", 
-                                status_code=status_code,
-                                headers=dict(response.headers))
-                
-                if 200 <= status_code < 300:
-                    return True, None
-                else:
-                    return False, f"HTTP {status_code}"
-                    
-        except HTTPError as e:
-            try:
-                error_body = e.read().decode("utf-8", errors="replace")
-                self.logger.event("webhook.http_error", 
-                                code=e.code, 
-                                reason=e.reason,
-                                body=error_body[:500])  # Limitar tamaño del log
-            except Exception:
-                error_body = ""
-                self.logger.event("webhook.http_error", 
-                                code=e.code, 
-                                reason=e.reason,
-                                body="Could not read error body")
-            
-            return False, f"HTTP {e.code}: {error_body}"
+            if 200 <= status_code < 300:
+                return True, None, None
+            
+            retry_after = None
+            if status_code in (429, 503):
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            
+            error_body = response.body.decode("utf-8", errors="replace")
+            self.logger.event("webhook.http_error", 
+                            code=status_code, 
+                            reason=response.reason,
+                            body=error_body[:500])  # Limitar tamaño del log
+            
+            return False, f"HTTP {status_code}: {error_body}", retry_after
+        
+        except PoolTimeout as e:
+            self.logger.event("webhook.pool_saturated", url=webhook_url, error=str(e))
+            return False, f"{_POOL_SATURATED_PREFIX}: {e}", None
             
         except socket.timeout:
-            self.logger.event("webhook.timeout", timeout=self.config.webhook_timeout)
-            return False, "Request timeout"
+            self.logger.event("webhook.timeout", timeout=round(timeout, 3))
+            return False, "Request timeout", None
             
         except Exception as e:
             self.logger.event("webhook.exception", error=str(e), error_type=type(e).__name__)
-            return False, str(e)
+            return False, str(e), None
     
-    def send_webhook_async(self, webhook_url: str, payload: Dict[str, Any]) -> None:
+    def send_webhook_async(self, webhook_url: str, payload: Dict[str, Any],
+                           compress: Optional[bool] = None,
+                           deadline: Optional[Deadline] = None) -> None:
         """
         Envía webhook de forma asíncrona (fire-and-forget).
         
-        Para uso en Lambda donde no podemos esperar el resultado.
+        Para uso en Lambda donde no podemos esperar el resultado. Los
+        reintentos quedan acotados por `deadline` (el de la invocación).
         """
         try:
             # En Lambda, solo logueamos la intención
@@ -165,7 +390,7 @@ class WebhookService:
             
             # En un entorno real, aquí podrías usar SQS, SNS, o invocar otra Lambda
             # Para simplicidad, intentamos enviar directamente
-            success, error = self.send_webhook(webhook_url, payload)
+            success, error = self.send_webhook(webhook_url, payload, compress=compress, deadline=deadline)
             
             if success:
                 self.logger.event("webhook.async_success")
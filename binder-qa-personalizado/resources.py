@@ -0,0 +1,81 @@
+import threading
+from time import perf_counter
+from typing import Any, Callable, Dict, Optional
+
+
+class ResourceRegistry:
+    """
+    Recursos reutilizables entre invocaciones de un contenedor Lambda warm.
+    
+    Cada recurso se registra con una factory y se construye de forma lazy
+    la primera vez que se pide. Un health check opcional decide antes de
+    cada invocación si la instancia sigue siendo usable; si falla (o si se
+    invalida tras un error) se reconstruye en el siguiente `get`.
+    """
+    
+    def __init__(self, logger=None):
+        self.logger = logger
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._health_checks: Dict[str, Optional[Callable[[Any], bool]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._built_ms: Dict[str, float] = {}
+        self._lock = threading.RLock()
+    
+    def register(self, name: str, factory: Callable[[], Any],
+                 health_check: Optional[Callable[[Any], bool]] = None) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._health_checks[name] = health_check
+    
+    def get(self, name: str) -> Any:
+        """Retorna la instancia del recurso, construyéndola si no existe"""
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            
+            start = perf_counter()
+            instance = self._factories[name]()
+            build_ms = round((perf_counter() - start) * 1000, 2)
+            self._instances[name] = instance
+            self._built_ms[name] = self._built_ms.get(name, 0.0) + build_ms
+            
+            if self.logger is not None:
+                self.logger.event("resources.built", resource=name, build_ms=build_ms)
+            return instance
+    
+    def invalidate(self, name: str, reason: Optional[str] = None) -> None:
+        """Descarta la instancia para que el próximo `get` la reconstruya"""
+        with self._lock:
+            dropped = self._instances.pop(name, None) is not None
+        if dropped and self.logger is not None:
+            self.logger.event("resources.invalidated", resource=name, reason=reason)
+    
+    def check_health(self) -> Dict[str, bool]:
+        """
+        Ejecuta los health checks de los recursos ya construidos.
+        
+        Los recursos no saludables se invalidan. Returns: {nombre: saludable}
+        """
+        with self._lock:
+            built = [(name, inst) for name, inst in self._instances.items()]
+        
+        results = {}
+        for name, instance in built:
+            check = self._health_checks.get(name)
+            if check is None:
+                results[name] = True
+                continue
+            try:
+                healthy = bool(check(instance))
+            except Exception:
+                healthy = False
+            results[name] = healthy
+            if not healthy:
+                self.invalidate(name, reason="health_check_failed")
+        return results
+    
+    def take_build_metrics(self) -> Dict[str, float]:
+        """Tiempo de construcción por recurso desde la última llamada (costo de init de esta invocación)"""
+        with self._lock:
+            built, self._built_ms = self._built_ms, {}
+        return built
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+
+class ResultStore:
+    """
+    Almacén de resultados para webhooks claim-check.
+    
+    Guarda el resultado completo (ya serializado) en SQLite con TTL y
+    devuelve un ID no adivinable para recuperarlo. Es el sustituto local
+    de un bucket de objetos: en producción el mismo contrato (put/get por
+    ID con expiración) se implementaría sobre S3 con lifecycle rules.
+    """
+    
+    # Intervalo mínimo entre barridos de expirados
+    EVICT_INTERVAL = 60.0
+    
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " id TEXT PRIMARY KEY, reference_id TEXT, sha256 TEXT, body BLOB,"
+                " created_at REAL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_expires ON results (expires_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5.0)
+    
+    def put(self, reference_id: str, data: bytes, result_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Guarda un resultado serializado.
+        
+        Args:
+            reference_id: reference_id del request
+            data: Resultado serializado
+            result_id: ID ya asignado (p.ej. si el resultado incluye su propia URL)
+        
+        Returns:
+            Dict con id, sha256, bytes y expires_at (epoch)
+        """
+        self._maybe_evict()
+        result_id = result_id or new_result_id()
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO results (id, reference_id, sha256, body, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (result_id, reference_id, digest, sqlite3.Binary(data), now, expires_at),
+            )
+        
+        return {"id": result_id, "sha256": digest, "bytes": len(data), "expires_at": expires_at}
+    
+    def get(self, result_id: str) -> Optional[Tuple[bytes, str, float]]:
+        """
+        Recupera un resultado vigente.
+        
+        Returns:
+            Tuple con (body, sha256, expires_at) o None si no existe o expiró
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT body, sha256, expires_at FROM results WHERE id = ?", (result_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] <= time.time():
+                conn.execute("DELETE FROM results WHERE id = ?", (result_id,))
+                return None
+        return bytes(row[0]), row[1], row[2]
+    
+    def evict_expired(self) -> int:
+        """Elimina los resultados expirados y retorna cuántos se borraron"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+            self._last_evict = time.monotonic()
+            return cursor.rowcount
+    
+    def _maybe_evict(self) -> None:
+        if time.monotonic() - self._last_evict >= self.EVICT_INTERVAL:
+            self.evict_expired()
+
+
+_SHARED_STORE: Optional[ResultStore] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_result_store(config) -> ResultStore:
+    """Result store compartido por el contenedor"""
+    global _SHARED_STORE
+    if _SHARED_STORE is None:
+        with _SHARED_LOCK:
+            if _SHARED_STORE is None:
+                _SHARED_STORE = ResultStore(config.result_store_path, config.result_ttl_seconds)
+    return _SHARED_STORE
+
+
+def new_result_id() -> str:
+    """ID de un resultado guardado (32 hex, el formato de GET /results/{id})"""
+    return uuid.uuid4().hex
+
+
+def result_fetch_url(config, result_id: str) -> str:
+    """URL de recuperación de un resultado (relativa si RESULTS_BASE_URL no está configurada)"""
+    return f"{config.results_base_url.rstrip('/')}/results/{result_id}"
@@ -0,0 +1,205 @@
+import hashlib
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from urllib.parse import unquote
+
+from contract_store import get_contract_resolver, is_contract_hash
+from job_store import get_job_store, DONE, FAILED
+from payload import encode_json
+from result_store import get_result_store
+
+
+_RESULT_PATH = re.compile(r"/results/([0-9a-f]{32})/?$")
+_JOB_PATH = re.compile(r"/jobs/([^/]+)/?$")
+_CONTRACT_PATH = re.compile(r"/contracts/([0-9a-f]{64})/?$")
+_CONTRACT_CHECK_PATH = re.compile(r"/contracts/check/?$")
+
+# Hashes por consulta en POST /contracts/check
+_MAX_CONTRACT_CHECKS = 50
+
+
+def _error(codigo: str, detalle: str) -> Dict[str, Any]:
+    return {"success": False, "reference_id": None, "error": {"codigo": codigo, "detalle": detalle}}
+
+
+def _header(headers: Optional[Dict[str, str]], name: str) -> str:
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value or ""
+    return ""
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compara If-None-Match (lista de ETags o *) con el ETag actual"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _iso(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def route_get(path: str, responder, config, log, headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Rutas GET de solo lectura.
+    
+    Returns:
+        Respuesta del responder, o None si el path no corresponde a ninguna ruta
+    """
+    match = _RESULT_PATH.search(path or "")
+    if match:
+        return get_result(match.group(1), responder, config, log)
+    
+    match = _JOB_PATH.search(path or "")
+    if match:
+        return get_job(unquote(match.group(1)), responder, config, log, _header(headers, "if-none-match"))
+    return None
+
+
+def route_head(path: str, responder, config, log) -> Optional[Dict[str, Any]]:
+    """
+    Rutas HEAD (sin cuerpo).
+    
+    Returns:
+        Respuesta del responder, o None si el path no corresponde a ninguna ruta
+    """
+    match = _CONTRACT_PATH.search(path or "")
+    if match:
+        return head_contract(match.group(1), responder, config, log)
+    return None
+
+
+def route_post(path: str, body: Any, responder, config, log) -> Optional[Dict[str, Any]]:
+    """
+    Rutas POST distintas del request de QA.
+    
+    Returns:
+        Respuesta del responder, o None si el request es de QA
+    """
+    if _CONTRACT_CHECK_PATH.search(path or ""):
+        return check_contracts(body, responder, config, log)
+    return None
+
+
+def head_contract(sha256: str, responder, config, log) -> Dict[str, Any]:
+    """HEAD /contracts/{sha256}: 200 si el contrato ya está guardado, 404 si hay que enviarlo"""
+    found = get_contract_resolver(config, log).check(sha256)
+    log.event("contracts.head", hash=sha256, disponible=found is not None)
+    if found is None:
+        return responder.empty(404, {"Cache-Control": "no-cache"})
+    return responder.empty(200, {
+        "ETag": f'"{sha256}"',
+        "Cache-Control": "no-cache",
+        "X-Contrato-Bytes": str(found["bytes"]),
+    })
+
+
+def check_contracts(body: Any, responder, config, log) -> Dict[str, Any]:
+    """
+    POST /contracts/check: indica qué contratos ya tiene el servicio.
+    
+    Acepta {"contrato_hash": "..."} o {"contrato_hashes": [...]}. Los
+    contratos disponibles se pueden usar con `contrato_hash` en el request
+    de QA sin volver a subir el texto.
+    """
+    hashes = body.get("contrato_hashes") if isinstance(body, dict) else None
+    if hashes is None and isinstance(body, dict) and "contrato_hash" in body:
+        hashes = [body["contrato_hash"]]
+    if not isinstance(hashes, list) or not hashes or len(hashes) > _MAX_CONTRACT_CHECKS:
+        return responder.respond(400, _error(
+            "BAD_REQUEST", f"contrato_hash or contrato_hashes (1-{_MAX_CONTRACT_CHECKS}) is required"
+        ))
+    if not all(is_contract_hash(h) for h in hashes):
+        return responder.respond(400, _error("BAD_REQUEST", "contrato_hashes must be lowercase hex SHA-256"))
+    
+    resolver = get_contract_resolver(config, log)
+    contratos = []
+    for sha256 in hashes:
+        found = resolver.check(sha256)
+        item = {"hash": sha256, "disponible": found is not None}
+        if found is not None:
+            item.update(bytes=found["bytes"], cache=found["cache"], expira=_iso(found["expira"]))
+        contratos.append(item)
+    
+    log.event("contracts.checked", hashes=len(hashes), disponibles=sum(1 for c in contratos if c["disponible"]))
+    return responder.respond(200, {"success": True, "contratos": contratos}, headers={"Cache-Control": "no-cache"})
+
+
+def get_result(result_id: str, responder, config, log) -> Dict[str, Any]:
+    """Sirve un resultado guardado por un webhook claim-check"""
+    try:
+        stored = get_result_store(config).get(result_id)
+    except Exception as e:
+        log.event("results.store_error", result_id=result_id, error=str(e))
+        return responder.respond(500, _error("MODEL_ERROR", "Result store unavailable"))
+    
+    if stored is None:
+        log.event("results.not_found", result_id=result_id)
+        return responder.respond(404, _error("NOT_FOUND", "Result not found or expired"))
+    
+    body, digest, expires_at = stored
+    log.event("results.served", result_id=result_id, bytes=len(body))
+    return responder.respond(200, body, headers={
+        "ETag": f'"{digest}"',
+        "Cache-Control": f"private, max-age={max(0, int(expires_at - time.time()))}",
+    })
+
+
+def get_job(reference_id: str, responder, config, log, if_none_match: str = "") -> Dict[str, Any]:
+    """
+    Estado de un job asíncrono: estado, progreso y resultado (cuando terminó).
+    
+    El ETag deriva de la versión del registro, así que un If-None-Match
+    vigente responde 304 sin leer ni re-serializar el resultado.
+    """
+    try:
+        job = get_job_store(config).get(reference_id)
+    except Exception as e:
+        log.event("jobs.store_error", id=reference_id, error=str(e))
+        return responder.respond(500, _error("MODEL_ERROR", "Job store unavailable"))
+    
+    if job is None:
+        log.event("jobs.not_found", id=reference_id)
+        return responder.respond(404, _error("NOT_FOUND", "Job not found or expired"))
+    
+    version_key = f"{reference_id}:{job['version']}".encode("utf-8")
+    etag = f'"{hashlib.sha256(version_key).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if _etag_matches(if_none_match, etag):
+        log.event("jobs.not_modified", id=reference_id, estado=job["estado"])
+        return responder.not_modified(headers)
+    
+    total = job["total_preguntas"] or 0
+    body = {
+        "success": True,
+        "reference_id": reference_id,
+        "estado": job["estado"],
+        "progreso": {
+            "respondidas": job["respondidas"],
+            "total": total,
+            "porcentaje": round(100.0 * job["respondidas"] / total, 1) if total else 0.0,
+        },
+        "actualizado": _iso(job["updated_at"]),
+    }
+    if job["estado"] in (DONE, FAILED):
+        body["expira"] = _iso(job["finished_at"] + config.job_ttl_seconds)
+    if job["error"]:
+        body["error_detalle"] = job["error"]
+    
+    # El resultado ya está serializado: se inserta tal cual en el JSON de respuesta
+    data = encode_json(body)
+    if job["result"] is not None:
+        data = data[:-1] + b', "resultado": ' + job["result"].encode("utf-8") + b"}"
+    
+    if job["estado"] not in (DONE, FAILED):
+        headers["Retry-After"] = str(config.job_retry_after)
+    
+    log.event("jobs.served", id=reference_id, estado=job["estado"], bytes=len(data))
+    return responder.respond(200, data, headers=headers)
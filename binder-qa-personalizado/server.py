@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP de larga duración (ECS, Kubernetes o local)
+
+Envuelve el mismo lambda_handler: cada request se convierte en un evento
+de API Gateway HTTP v2, por lo que rutas, validación, respuestas y CORS son
+idénticos a Lambda. Los recursos warm (controller, pools HTTP, caches de
+servicios OpenAI, single-flight) se crean una vez y se comparten entre
+todos los requests del proceso. Las respuestas NDJSON (Accept:
+application/x-ndjson) se escriben con Transfer-Encoding chunked a medida
+que termina cada shard.
+
+Uso:
+    python server.py [--host 0.0.0.0] [--port 8080] [--workers 16]
+"""
+
+import base64
+import json
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+# Agregar el directorio actual al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# En modo servidor un duplicado en curso espera al primer intento en lugar de
+# responder 202 (debe definirse antes de que se cargue QAConfig)
+os.environ.setdefault("IDEMPOTENCY_WAIT_SECONDS", "30")
+
+import lambda_function
+from lambda_function import CONFIG, RESOURCES, logger
+from deadline import Deadline
+
+
+class ServerContext:
+    """Contexto mínimo equivalente al de Lambda (sin auto-invocación: los jobs usan el worker local)"""
+    
+    function_name = ""
+    
+    def __init__(self, response_stream=None):
+        self.aws_request_id = uuid.uuid4().hex
+        self.response_stream = response_stream
+
+
+class ChunkedResponseStream:
+    """Response stream HTTP/1.1 chunked para respuestas NDJSON (equivalente al de Lambda)"""
+    
+    def __init__(self, handler):
+        self.handler = handler
+        self.status = None
+        self.ttfb_ms = None
+        self._start = time.perf_counter()
+    
+    def start(self, status: int, headers: Dict[str, str]) -> None:
+        self.status = status
+        self.handler.send_response(status)
+        for key, value in headers.items():
+            if key.lower() not in ("content-length", "connection", "transfer-encoding"):
+                self.handler.send_header(key, value)
+        self.handler.send_header("Transfer-Encoding", "chunked")
+        if self.handler.closing():
+            self.handler.send_header("Connection", "close")
+        self.handler.end_headers()
+    
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self.handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.handler.wfile.flush()
+        if self.ttfb_ms is None:
+            self.ttfb_ms = round((time.perf_counter() - self._start) * 1000, 2)
+    
+    def close(self) -> None:
+        """Chunk final; la conexión queda disponible para keep-alive"""
+        try:
+            self.handler.wfile.write(b"0\r\n\r\n")
+            self.handler.wfile.flush()
+        except OSError:
+            self.handler.close_connection = True
+
+
+def build_event(method: str, raw_path: str, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+    """Evento API Gateway HTTP v2 a partir de un request HTTP"""
+    parts = urlsplit(raw_path)
+    event: Dict[str, Any] = {
+        "version": "2.0",
+        "rawPath": parts.path,
+        "rawQueryString": parts.query,
+        "headers": {k.lower(): v for k, v in headers.items()},
+        "requestContext": {"http": {"method": method, "path": parts.path}},
+    }
+    if method not in ("GET", "HEAD", "OPTIONS"):
+        # Un body comprimido se pasa siempre como bytes (base64), igual que API Gateway
+        text = None
+        if event["headers"].get("content-encoding", "identity").lower() == "identity":
+            try:
+                text = body.decode("utf-8")
+            except UnicodeDecodeError:
+                pass
+        if text is not None:
+            event["body"] = text
+            event["isBase64Encoded"] = False
+        else:
+            event["body"] = base64.b64encode(body).decode("ascii")
+            event["isBase64Encoded"] = True
+    return event
+
+
+class QARequestHandler(BaseHTTPRequestHandler):
+    """Traduce requests HTTP/1.1 (con keep-alive) al lambda_handler"""
+    
+    protocol_version = "HTTP/1.1"
+    server_version = "binder-qa"
+    
+    def setup(self):
+        # Timeout de lectura de headers y body (lecturas lentas)
+        self.timeout = self.server.read_timeout
+        super().setup()
+    
+    def handle_one_request(self):
+        # Mientras espera el próximo request la conexión está inactiva pero ocupa un
+        # worker: solo se la espera `keepalive_seconds`
+        self.connection.settimeout(self.server.keepalive_seconds)
+        super().handle_one_request()
+    
+    def parse_request(self):
+        # Llegó el request line: el resto se lee con el timeout de lectura
+        self.connection.settimeout(self.timeout)
+        return super().parse_request()
+    
+    def closing(self) -> bool:
+        """
+        Indica si la conexión se cierra tras esta respuesta: lo pidió el cliente,
+        el servidor se está apagando o hay conexiones esperando un worker
+        """
+        if self.server.draining or self.server.has_waiting():
+            self.close_connection = True
+        return self.close_connection
+    
+    def do_GET(self):
+        self._dispatch()
+    
+    def do_HEAD(self):
+        self._dispatch()
+    
+    def do_POST(self):
+        self._dispatch()
+    
+    def do_OPTIONS(self):
+        self._dispatch()
+    
+    def _dispatch(self) -> None:
+        start = time.perf_counter()
+        path = urlsplit(self.path).path
+        self._stream = None
+        
+        if path == "/healthz":
+            status = self._send_json(200, {"status": "ok"})
+        elif path == "/readyz":
+            ready, detail = self.server.readiness()
+            status = self._send_json(200 if ready else 503, {"status": "ready" if ready else "not_ready", **detail})
+        else:
+            status = self._handle_qa()
+        
+        if self.server.draining:
+            # Durante el apagado no se reutilizan conexiones
+            self.close_connection = True
+        
+        if path not in ("/healthz", "/readyz"):
+            extra = {"ttfb_ms": self._stream.ttfb_ms} if self._stream is not None and self._stream.status else {}
+            logger.event("server.request", method=self.command, path=path, status=status,
+                         ms=round((time.perf_counter() - start) * 1000, 2), **extra)
+    
+    def _handle_qa(self) -> int:
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            return self._send_json(411, _error_body("BAD_REQUEST", "Content-Length required"))
+        
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            return self._send_json(400, _error_body("BAD_REQUEST", "Invalid Content-Length"))
+        if length > self.server.max_body_bytes:
+            self.close_connection = True
+            return self._send_json(413, _error_body("BAD_REQUEST", "Request body too large"))
+        
+        body = self.rfile.read(length) if length else b""
+        event = build_event(self.command, self.path, dict(self.headers.items()), body)
+        self._stream = ChunkedResponseStream(self)
+        try:
+            response = lambda_function.lambda_handler(event, ServerContext(response_stream=self._stream))
+        except json.JSONDecodeError:
+            return self._send_json(400, _error_body("BAD_REQUEST", "Invalid JSON body"))
+        except Exception as e:
+            logger.event("server.handler_error", path=event["rawPath"], error=str(e))
+            if self._stream.status is not None:
+                # Ya se enviaron headers y líneas: solo queda cortar la conexión
+                self.close_connection = True
+                return self._stream.status
+            return self._send_json(500, _error_body("MODEL_ERROR", f"Internal error: {str(e)}"))
+        
+        if self._stream.status is not None:
+            self._stream.close()
+            return self._stream.status
+        return self._send_lambda_response(response)
+    
+    def _send_lambda_response(self, response: Dict[str, Any]) -> int:
+        status = int(response.get("statusCode", 200))
+        body = response.get("body") or ""
+        data = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode("utf-8")
+        
+        self.send_response(status)
+        for key, value in (response.get("headers") or {}).items():
+            if key.lower() not in ("content-length", "connection"):
+                self.send_header(key, value)
+        self._end_headers(len(data))
+        if status != 304 and self.command != "HEAD":
+            self.wfile.write(data)
+        return status
+    
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> int:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self._end_headers(len(data))
+        self.wfile.write(data)
+        return status
+    
+    def _end_headers(self, length: int) -> None:
+        self.send_header("Content-Length", str(length))
+        if self.closing():
+            self.send_header("Connection", "close")
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        # El acceso se registra con logger.event en _dispatch
+        pass
+
+
+def _error_body(codigo: str, detalle: str) -> Dict[str, Any]:
+    return {"success": False, "reference_id": None, "error": {"codigo": codigo, "detalle": detalle}}
+
+
+class QAHTTPServer(HTTPServer):
+    """
+    HTTPServer con pool acotado de workers.
+    
+    Cada conexión aceptada entra a una cola de `max_pending` lugares que
+    atienden `workers` hilos; si la cola está llena se responde 503 de
+    inmediato en lugar de acumular conexiones sin límite. Una conexión
+    keep-alive ocupa su worker hasta que se cierra, queda inactiva
+    `keepalive_seconds` (corto) o responde mientras otras esperan en cola.
+    """
+    
+    allow_reuse_address = True
+    request_queue_size = 128
+    
+    def __init__(self, address, workers: int, max_pending: int, keepalive_seconds: float,
+                 max_body_bytes: int, read_timeout: float = 15.0):
+        super().__init__(address, QARequestHandler)
+        self.keepalive_seconds = keepalive_seconds
+        self.read_timeout = read_timeout
+        self.max_body_bytes = max_body_bytes
+        self.draining = False
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_pending))
+        self._active = 0
+        self._active_cond = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"qa-http-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def process_request(self, request, client_address):
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            logger.event("server.saturated", client=client_address[0], pending=self._queue.qsize())
+            self._reject(request)
+            self.shutdown_request(request)
+    
+    def has_waiting(self) -> bool:
+        """Hay conexiones aceptadas esperando un worker"""
+        return not self._queue.empty()
+    
+    def _worker(self) -> None:
+        while True:
+            request, client_address = self._queue.get()
+            with self._active_cond:
+                self._active += 1
+            try:
+                self.finish_request(request, client_address)
+            except (ConnectionError, socket.timeout):
+                pass
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._active_cond:
+                    self._active -= 1
+                    self._active_cond.notify_all()
+    
+    def _reject(self, request) -> None:
+        data = json.dumps(_error_body("MODEL_ERROR", "Server busy, retry later")).encode("utf-8")
+        head = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            "Content-Type: application/json\r\n"
+            "Retry-After: 1\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+        try:
+            request.sendall(head + data)
+        except OSError:
+            pass
+    
+    def readiness(self):
+        """Listo si no está en apagado y el controller está construido y sano"""
+        if self.draining:
+            return False, {"reason": "draining"}
+        try:
+            # Un controller invalidado se reconstruye aquí y no en el próximo request
+            RESOURCES.check_health()
+            RESOURCES.get("controller")
+        except Exception as e:
+            return False, {"reason": f"controller unavailable: {str(e)}"}
+        return True, {"busy_workers": self._active, "pending": self._queue.qsize()}
+    
+    def drain(self, timeout: float) -> bool:
+        """Espera a que terminen los requests en curso y en cola (True si terminaron a tiempo)"""
+        deadline = time.monotonic() + timeout
+        with self._active_cond:
+            while self._active or not self._queue.empty():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._active_cond.wait(min(remaining, 0.5))
+        return True
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    """Levanta el servidor y lo detiene ordenadamente con SIGTERM/SIGINT"""
+    server = QAHTTPServer(
+        (host, port),
+        workers=workers,
+        max_pending=CONFIG.server_max_pending,
+        keepalive_seconds=CONFIG.server_keepalive_seconds,
+        max_body_bytes=CONFIG.server_max_body_bytes,
+        read_timeout=CONFIG.server_read_timeout,
+    )
+    
+    # Construir los recursos warm antes de aceptar tráfico
+    RESOURCES.get("controller")
+    
+    def stop(signum, frame):
+        if server.draining:
+            return
+        server.draining = True
+        logger.event("server.draining", signal=signum)
+        # shutdown() bloquea hasta que serve_forever termina: llamarlo desde otro hilo
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    logger.event("server.start", host=host, port=server.server_address[1], workers=workers,
+                 max_pending=CONFIG.server_max_pending, keepalive_s=CONFIG.server_keepalive_seconds)
+    server.serve_forever()
+    
+    drained = server.drain(CONFIG.server_drain_seconds)
+    controller = RESOURCES.get("controller")
+    if controller.webhook_batcher is not None:
+        controller.webhook_batcher.flush_all(Deadline(CONFIG.server_drain_seconds))
+    server.server_close()
+    logger.event("server.stopped", drained=drained)
+
+
+def main():
+    """Función principal"""
+    args = sys.argv[1:]
+    host = args[args.index("--host") + 1] if "--host" in args else CONFIG.server_host
+    port = int(args[args.index("--port") + 1]) if "--port" in args else CONFIG.server_port
+    workers = int(args[args.index("--workers") + 1]) if "--workers" in args else CONFIG.server_workers
+    serve(host, port, workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Perfil de imports en frío del handler (equivalente a `python -X importtime`)
+
+Uso:
+    python startup_profile.py [--module lambda_function] [--top 25] [--budget 300]
+"""
+
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# Presupuesto de cold start para los imports del handler (ms)
+COLD_START_BUDGET_MS = float(os.environ.get("COLD_START_BUDGET_MS", "300"))
+
+# Dependencias pesadas que no deben cargarse al importar el handler
+HEAVY_MODULES = ("boto3", "botocore")
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "wall_ms = (time.perf_counter() - start) * 1000\n"
+    "from lazy_imports import is_loaded\n"
+    "print(json.dumps({{'wall_ms': wall_ms, 'heavy_loaded': [m for m in {heavy!r} if is_loaded(m)]}}))\n"
+)
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Parsea la salida de -X importtime.
+    
+    Returns:
+        Lista de {"module", "self_ms", "cumulative_ms", "depth"} en orden de carga
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules.append({
+                "module": name.strip(),
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cumulative_us) / 1000.0,
+                "depth": (len(name) - len(name.lstrip(" ")) - 1) // 2,
+            })
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_imports(module: str = "lambda_function") -> Dict[str, Any]:
+    """
+    Importa `module` en un intérprete nuevo y mide el costo de imports.
+    
+    Returns:
+        Dict con total_ms (acumulado del módulo), wall_ms, heavy_loaded y modules
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=_BASE_DIR,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import of {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+    
+    modules = parse_importtime(proc.stderr)
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    root = next((m for m in modules if m["module"] == module and m["depth"] == 0), None)
+    return {
+        "module": module,
+        "total_ms": root["cumulative_ms"] if root else probe["wall_ms"],
+        "wall_ms": round(probe["wall_ms"], 2),
+        "heavy_loaded": probe["heavy_loaded"],
+        "modules": modules,
+    }
+
+
+def main():
+    """Función principal"""
+    args = sys.argv[1:]
+    module = args[args.index("--module") + 1] if "--module" in args else "lambda_function"
+    top = int(args[args.index("--top") + 1]) if "--top" in args else 25
+    budget = float(args[args.index("--budget") + 1]) if "--budget" in args else COLD_START_BUDGET_MS
+    
+    profile = profile_imports(module)
+    
+    print(f"⏱️  Imports de {module}: {profile['total_ms']:.1f} ms (presupuesto {budget:.0f} ms)")
+    print(f"{'acumulado':>10} {'propio':>8}  módulo")
+    for entry in sorted(profile["modules"], key=lambda m: m["cumulative_ms"], reverse=True)[:top]:
+        indent = "  " * entry["depth"]
+        print(f"{entry['cumulative_ms']:>8.1f}ms {entry['self_ms']:>6.1f}ms  {indent}{entry['module']}")
+    
+    if profile["heavy_loaded"]:
+        print(f"⚠️  Dependencias pesadas cargadas al importar: {', '.join(profile['heavy_loaded'])}")
+    
+    if profile["total_ms"] > budget:
+        print(f"❌ Cold start excede el presupuesto por {profile['total_ms'] - budget:.1f} ms")
+        sys.exit(1)
+    print("✅ Dentro del presupuesto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import json
+import threading
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def accepts_ndjson(accept: str) -> bool:
+    """
+    Indica si el header Accept del cliente pide NDJSON explícitamente.
+    
+    El comodín no cuenta: NDJSON cambia el formato de la respuesta y solo se
+    usa si el cliente lo pidió (respetando q=0).
+    """
+    if not accept:
+        return False
+    
+    for item in accept.split(","):
+        parts = [p.strip() for p in item.split(";")]
+        if parts[0].lower() != NDJSON_CONTENT_TYPE:
+            continue
+        for param in parts[1:]:
+            if param.lower().startswith("q="):
+                try:
+                    return float(param[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    
+    return False
+
+
+def _line(event: Dict[str, Any]) -> bytes:
+    return json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class NDJSONResponse:
+    """
+    Respuesta NDJSON: una línea `respuesta` por pregunta apenas su shard
+    termina y una línea final `completado` con el resto del resultado
+    (metadatos, preguntas pendientes o error).
+    
+    Con un `stream` (start(status, headers) / write(bytes)) cada línea se
+    escribe al cliente en cuanto está lista; sin él las líneas se acumulan y
+    se responden juntas al final (Lambda sin response streaming).
+    
+    El status se fija con la primera escritura: si ya se envió alguna
+    respuesta es 200 y un fallo posterior solo se informa en la línea final
+    (`success: false` con `error`).
+    """
+    
+    def __init__(self, responder, stream=None, reference_id: Optional[str] = None,
+                 start: Optional[float] = None, log=None):
+        self.responder = responder
+        self.stream = stream
+        self.reference_id = reference_id
+        self.log = log
+        self._start = start if start is not None else perf_counter()
+        self._lines: List[bytes] = []
+        self._emitidas = set()
+        self._secuencia = 0
+        self._bytes = 0
+        self._status: Optional[int] = None
+        self._first_line_ms: Optional[float] = None
+        self._ttfb_ms: Optional[float] = None
+        self._client_gone = False
+        self._lock = threading.Lock()
+    
+    def _elapsed_ms(self) -> float:
+        return round((perf_counter() - self._start) * 1000, 2)
+    
+    def _write(self, data: bytes, status: int) -> None:
+        """Escribe (o acumula) líneas ya serializadas; se llama con el lock tomado"""
+        if self._first_line_ms is None:
+            self._first_line_ms = self._elapsed_ms()
+        self._bytes += len(data)
+        
+        if self.stream is None:
+            self._lines.append(data)
+            return
+        if self._client_gone:
+            return
+        
+        try:
+            if self._status is None:
+                self._status = status
+                self.stream.start(status, self.responder.ndjson_headers())
+            self.stream.write(data)
+            if self._ttfb_ms is None:
+                self._ttfb_ms = self._elapsed_ms()
+        except OSError as e:
+            # El cliente se desconectó: el request termina igual (webhooks, idempotencia)
+            self._client_gone = True
+            if self.log:
+                self.log.event("http.ndjson_client_gone", id=self.reference_id, error=str(e))
+    
+    def _answer_lines(self, resultados: List[Dict[str, Any]]) -> bytes:
+        """Líneas `respuesta` de los resultados aún no emitidos; se llama con el lock tomado"""
+        data = b""
+        for resultado in sorted(resultados, key=lambda r: r["pregunta_orden"]):
+            pregunta_orden = resultado["pregunta_orden"]
+            if pregunta_orden in self._emitidas:
+                continue
+            self._emitidas.add(pregunta_orden)
+            self._secuencia += 1
+            data += _line({
+                "evento": "respuesta",
+                "reference_id": self.reference_id,
+                "pregunta_orden": pregunta_orden,
+                "secuencia": self._secuencia,
+                "resultado": resultado,
+            })
+        return data
+    
+    def answers(self, resultados: List[Dict[str, Any]]) -> None:
+        """Emite las respuestas de un shard (callback `on_answers` del controller)"""
+        with self._lock:
+            data = self._answer_lines(resultados)
+            if data:
+                self._write(data, 200)
+    
+    def finish(self, result: Dict[str, Any], status: int) -> Dict[str, Any]:
+        """
+        Emite las respuestas que falten (p.ej. un resultado reutilizado) y la línea final.
+        
+        Returns:
+            Respuesta para el handler: la respuesta NDJSON completa si no hay
+            stream, o un marcador `streamed` si ya se escribió al cliente
+        """
+        with self._lock:
+            data = self._answer_lines(result.get("qa_resultados") or [])
+            self._secuencia += 1
+            trailer = {
+                "evento": "completado",
+                "secuencia": self._secuencia,
+                "respuestas_emitidas": len(self._emitidas),
+            }
+            trailer.update((k, v) for k, v in result.items() if k != "qa_resultados")
+            self._write(data + _line(trailer), status)
+            status = self._status or status
+        
+        total_ms = self._elapsed_ms()
+        if self.log:
+            self.log.event(
+                "http.ndjson",
+                id=self.reference_id,
+                streamed=self.stream is not None,
+                status=status,
+                lines=self._secuencia,
+                bytes=self._bytes,
+                first_line_ms=self._first_line_ms,
+                # Sin stream el primer byte sale con la respuesta completa
+                ttfb_ms=self._ttfb_ms if self.stream is not None else total_ms,
+                total_ms=total_ms,
+                client_gone=self._client_gone,
+            )
+        
+        if self.stream is not None:
+            return {"statusCode": status, "streamed": True}
+        return self.responder.ndjson(status, b"".join(self._lines))
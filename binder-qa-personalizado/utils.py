@@ -1,40 +1,185 @@
+import http.client
+import ipaddress
 import json
+import re
+import socket
 import time
-from typing import Dict, Any, Optional
-from urllib.request import Request, urlopen
+from typing import Dict, Any, Optional, Tuple
+from urllib.request import (HTTPHandler, HTTPRedirectHandler, HTTPSHandler, ProxyHandler, Request,
+                            build_opener, urlopen)
 from urllib.error import HTTPError
 import ssl
 
 
-def download_file(url: str, timeout: int = 30, max_bytes: int = 10 * 1024 * 1024) -> bytes:
+# Caracteres de control excepto tab, newline y carriage return
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Normalización para el prompt (todas las pasadas son lineales)
+_PROMPT_CONTROL_RE = re.compile(r"[\x00-\x08\x0e-\x1f\x7f-\x9f\u200b-\u200d\ufeff]")
+_PROMPT_LINE_BREAK_RE = re.compile(r"\r\n?|[\x0b\x0c\u2028\u2029]")
+# Solo corridas de 2+ espacios o espacios especiales: un espacio simple no se reemplaza
+_PROMPT_SPACES_RE = re.compile(r"[ \t\xa0\u2000-\u200a\u202f\u205f\u3000]{2,}|[\t\xa0\u2000-\u200a\u202f\u205f\u3000]")
+# Palabra cortada al final de línea: "contra-\nto" -> "contrato" (solo si sigue en minúscula)
+_PROMPT_HYPHENATION_RE = re.compile(r"(?<=[a-záéíóúüñ])-\n(?=[a-záéíóúüñ])")
+_PROMPT_EDGE_SPACES_RE = re.compile(r" ?\n ?")
+_PROMPT_BLANK_LINES_RE = re.compile(r"\n{3,}")
+# Estimación de tokens: trozos de hasta 4 caracteres de palabra, cada signo y cada corrida de espacios
+_TOKEN_ESTIMATE_RE = re.compile(r"\w{1,4}|[^\w\s]|\s{2,}")
+
+
+class BlockedAddressError(ValueError):
+    """El host de la URL resuelve a una dirección no pública"""
+
+
+def resolve_public_address(host: str, port: int) -> str:
+    """
+    Resuelve `host` y verifica que todas sus direcciones sean públicas.
+    
+    Rechaza loopback, link-local (p.ej. 169.254.169.254, metadata de la
+    instancia), redes privadas, reservadas, multicast y no especificadas.
+    
+    Returns:
+        La primera dirección resuelta, para conectarse a esa y no re-resolver
+    
+    Raises:
+        BlockedAddressError: Si alguna dirección no es pública
+    """
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise OSError(f"Could not resolve {host}: {e}") from e
+    
+    addresses = []
+    for info in infos:
+        address = info[4][0]
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise BlockedAddressError(f"Host {host} resolves to non-public address {ip}")
+        addresses.append(address)
+    if not addresses:
+        raise OSError(f"Could not resolve {host}")
+    return addresses[0]
+
+
+def _public_create_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    host, port = address
+    return socket.create_connection((resolve_public_address(host, port), port), timeout, source_address)
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_create_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    # El certificado y el SNI se validan contra el hostname, no contra la IP resuelta
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _public_create_connection
+
+
+class _PublicHTTPHandler(HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _NoRedirectHandler(HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        raise HTTPError(req.full_url, code, f"Redirect to {newurl} not followed", headers, fp)
+
+
+def _response_socket(response) -> Optional[socket.socket]:
+    """Socket de una respuesta de urllib/http.client (None si no es accesible)"""
+    raw = getattr(getattr(response, "fp", None), "raw", None)
+    sock = getattr(raw, "_sock", None)
+    return sock if isinstance(sock, socket.socket) else None
+
+
+def download_file(url: str, timeout: float = 30, max_bytes: int = 10 * 1024 * 1024,
+                  chunk_size: int = 64 * 1024, headers: Optional[Dict[str, str]] = None,
+                  public_only: bool = False, max_seconds: Optional[float] = None) -> bytes:
     """
     Descarga un archivo desde URL con límites de tamaño y timeout.
     
+    El cuerpo se lee por bloques de `chunk_size` y la descarga se corta
+    apenas supera `max_bytes`, aunque el servidor no envíe Content-Length.
+    `timeout` aplica a cada operación de socket; `max_seconds` acota la
+    descarga completa (un servidor que envía pocos bytes cada tanto no la
+    alarga más allá).
+    
+    Con `public_only` (URLs que define el cliente) la conexión va solo a
+    direcciones públicas, verificadas al conectar (no hay ventana para
+    DNS rebinding), sin proxy y sin seguir redirecciones.
+    
     Args:
         url: URL del archivo
         timeout: Timeout en segundos
         max_bytes: Máximo de bytes a descargar
+        chunk_size: Tamaño de cada lectura
+        headers: Headers adicionales
+        public_only: Rechazar hosts que resuelven a direcciones no públicas
+        max_seconds: Tiempo total máximo de la descarga (None = sin tope)
         
     Returns:
         Contenido del archivo como bytes
         
     Raises:
+        BlockedAddressError: Si public_only y el host no es público
+        TimeoutError: Si la descarga supera max_seconds
         Exception: Si hay error en la descarga
     """
-    req = Request(url)
+    give_up_at = time.monotonic() + max_seconds if max_seconds is not None else None
+    if give_up_at is not None:
+        timeout = min(timeout, max(max_seconds, 0.001))
+    request_headers = {'User-Agent': 'Binder-QA-Service/1.0'}
+    if headers:
+        request_headers.update(headers)
+    req = Request(url, headers=request_headers)
     ctx = ssl.create_default_context()
     
-    with urlopen(req, timeout=timeout, context=ctx) as response:
+    if public_only:
+        opener = build_opener(ProxyHandler({}), _NoRedirectHandler(), _PublicHTTPHandler(),
+                              _PublicHTTPSHandler(context=ctx))
+        response = opener.open(req, timeout=timeout)
+    else:
+        response = urlopen(req, timeout=timeout, context=ctx)
+    
+    with response:
         content_length = response.headers.get('Content-Length')
         
         if content_length and int(content_length) > max_bytes:
             raise Exception(f"File too large: {content_length} bytes (max: {max_bytes})")
         
-        data = response.read(max_bytes + 1)
-        if len(data) > max_bytes:
-            raise Exception(f"File too large: {len(data)} bytes (max: {max_bytes})")
+        chunks = []
+        size = 0
+        sock = _response_socket(response)
+        while True:
+            if give_up_at is not None:
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Download exceeded {max_seconds:.1f}s ({size} bytes read)")
+                if sock is not None:
+                    # La próxima lectura tampoco puede pasarse del tope total
+                    sock.settimeout(min(timeout, remaining))
+            # read1: a lo sumo una lectura del socket (read() espera hasta juntar chunk_size)
+            chunk = response.read1(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise Exception(f"File too large: more than {max_bytes} bytes")
+            chunks.append(chunk)
         
-        return data
+        return b"".join(chunks)
 
 
 def post_json(url: str, data: Dict[str, Any], timeout: int = 30, 
@@ -92,18 +237,56 @@ def clean_text(text: str) -> str:
         return ""
     
     # Remover caracteres de control excepto tab, newline, carriage return
-    cleaned = ""
-    for char in text:
-        if ord(char) >= 32 or char in '\t\n\r':
-            cleaned += char
+    cleaned = _CONTROL_CHARS_RE.sub("", text)
     
     # Normalizar espacios en blanco múltiples
-    import re
-    cleaned = re.sub(r'\s+', ' ', cleaned)
+    cleaned = _WHITESPACE_RE.sub(" ", cleaned)
     
     return cleaned.strip()
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación rápida de tokens del modelo (sin tokenizer).
+    
+    Cuenta trozos de hasta 4 caracteres de palabra, signos y corridas de
+    espacios; sirve para comparar textos, no para facturar.
+    """
+    return len(_TOKEN_ESTIMATE_RE.findall(text)) if text else 0
+
+
+def normalize_for_prompt(text: str) -> Tuple[str, Dict[str, int]]:
+    """
+    Normaliza el texto de un contrato (OCR) antes de enviarlo al modelo.
+    
+    A diferencia de clean_text conserva los saltos de línea y párrafos:
+    quita caracteres de control e invisibles, unifica saltos de línea,
+    une palabras cortadas con guion al final de línea, colapsa espacios
+    (incluidos los no separables), quita espacios en los bordes de cada
+    línea y deja como máximo una línea en blanco seguida.
+    
+    Returns:
+        Tuple con (texto normalizado, {chars_before, chars_after,
+        tokens_before, tokens_after})
+    """
+    if not text:
+        return "", {"chars_before": 0, "chars_after": 0, "tokens_before": 0, "tokens_after": 0}
+    
+    cleaned = _PROMPT_LINE_BREAK_RE.sub("\n", text)
+    cleaned = _PROMPT_CONTROL_RE.sub("", cleaned)
+    cleaned = _PROMPT_SPACES_RE.sub(" ", cleaned)
+    cleaned = _PROMPT_EDGE_SPACES_RE.sub("\n", cleaned)
+    cleaned = _PROMPT_HYPHENATION_RE.sub("", cleaned)
+    cleaned = _PROMPT_BLANK_LINES_RE.sub("\n\n", cleaned).strip()
+    
+    return cleaned, {
+        "chars_before": len(text),
+        "chars_after": len(cleaned),
+        "tokens_before": estimate_tokens(text),
+        "tokens_after": estimate_tokens(cleaned),
+    }
+
+
 def format_duration_ms(start_time: float, end_time: Optional[float] = None) -> int:
     """
     Calcula duración en milisegundos.
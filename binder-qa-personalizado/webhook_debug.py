@@ -50,7 +50,10 @@ def test_webhook_url(webhook_url: str, test_payload: Dict[str, Any] = None) -> N
     print(f"📦 Payload size: {len(json.dumps(test_payload))} bytes")
     print(f"⏱️  Timeout: {config.webhook_timeout}s")
     print(f"🔄 Reintentos: {config.webhook_retry_attempts}")
-    print(f"📈 Backoff base: {config.webhook_backoff_base}")
+    print(f"📈 Backoff base: {config.webhook_backoff_base}s (máx {config.webhook_backoff_max}s, jitter decorrelacionado)")
+    print(f"⏳ Presupuesto total: {config.max_total_timeout}s")
+    print(f"⛔ Breaker: {config.webhook_breaker_failures} fallos seguidos o éxito < "
+          f"{config.webhook_breaker_min_success_rate:.0%}, abierto {config.webhook_breaker_open_seconds}s")
     print(f"🔒 HTTPS requerido: {config.require_https_webhook}")
     print(f"🌐 Dominios permitidos: {config.allowed_webhook_domains}")
     print("-" * 50)
@@ -72,6 +75,8 @@ def test_webhook_url(webhook_url: str, test_payload: Dict[str, Any] = None) -> N
     else:
         print(f"❌ Webhook falló: {error}")
     
+    print_breaker_state(webhook_service)
+    
     # Probar envío asíncrono
     print("\n🚀 Probando envío asíncrono...")
     try:
@@ -81,13 +86,52 @@ def test_webhook_url(webhook_url: str, test_payload: Dict[str, Any] = None) -> N
         print(f"❌ Webhook asíncrono falló: {e}")
 
 
+def drain_deferred() -> None:
+    """Reintenta los webhooks estacionados en el spool de entregas diferidas"""
+    logger = get_app_logger(json_logs=True, level="DEBUG")
+    config = default_config()
+    webhook_service = WebhookService(config, logger)
+    
+    pending = webhook_service.deferred.pending()
+    print(f"📬 Entregas diferidas pendientes: {len(pending)} ({config.webhook_deferred_dir})")
+    if not pending:
+        return
+    
+    result = webhook_service.deferred.drain(webhook_service)
+    print(f"✅ Entregadas: {result['delivered']}  ❌ Fallidas: {result['failed']}  "
+          f"🗑️  Descartadas: {result['dropped']}  ⛔ Breaker abierto: {result['skipped']}  "
+          f"📬 Restantes: {result['remaining']}")
+    print_breaker_state(webhook_service)
+
+
+def print_breaker_state(webhook_service: WebhookService) -> None:
+    """Muestra la salud y el estado del circuit breaker de cada host contactado"""
+    snapshot = webhook_service.breakers.snapshot()
+    if not snapshot:
+        return
+    
+    icons = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+    print("\n🩺 Salud de hosts:")
+    for host, health in snapshot.items():
+        rate = health["success_rate"]
+        rate_text = f"{rate:.0%}" if rate is not None else "n/a"
+        print(f"  {icons.get(health['state'], '⚪')} {host}: {health['state']}  "
+              f"éxito {rate_text}  fallos seguidos {health['consecutive_failures']}  "
+              f"p50/p95/p99 {health['p50_ms']}/{health['p95_ms']}/{health['p99_ms']} ms")
+
+
 def main():
     """Función principal"""
     if len(sys.argv) < 2:
         print("Uso: python webhook_debug.py <webhook_url>")
+        print("     python webhook_debug.py --drain")
         print("Ejemplo: python webhook_debug.py https://webhook.site/12345678-1234-1234-1234-123456789012")
         sys.exit(1)
     
+    if sys.argv[1] == "--drain":
+        drain_deferred()
+        return
+    
     webhook_url = sys.argv[1]
     test_webhook_url(webhook_url)
 